@@ -0,0 +1,95 @@
+"""
+Atomic counters on UserProfile.
+Study time, XP, level and streaks used to be updated by loading the
+profile, adding to it in Python and saving every column back, so two tabs
+saving sessions at once could overwrite each other's increments. Here each
+change is a single UPDATE whose new values the database computes from the
+row as it stands (F() expressions, with level and streak worked out by
+Greatest() and CASE), so concurrent updates all count.
+
+The new values come back in the same statement (UPDATE ... RETURNING) on
+PostgreSQL and SQLite 3.35+; elsewhere they are read back inside the
+UPDATE's transaction.
+"""
+from datetime import date, timedelta
+
+from django.db import connections, models, router, transaction
+from django.db.models.functions import Greatest
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+
+# The counters study time changes, returned by update_counters() by default
+STUDY_FIELDS = (
+    'total_study_minutes', 'total_focus_sessions', 'total_xp', 'level',
+    'study_streak', 'longest_streak', 'last_study_date',
+)
+
+
+def xp_updates(amount):
+    """Add `amount` XP and level up at 100 XP per level (level never goes down)"""
+    return {
+        'total_xp': models.F('total_xp') + amount,
+        # Every right-hand side sees the row as it was before the UPDATE
+        'level': Greatest('level', (models.F('total_xp') + amount) / 100 + 1),
+    }
+
+
+def study_time_updates(minutes, sessions=1, today=None):
+    """
+    Add focus minutes and sessions: 1 XP per minute, and the streak goes up
+    if the last study day was yesterday, stays if it was today, else restarts
+    """
+    today = today or date.today()
+    streak = models.Case(
+        models.When(last_study_date=today, then=models.F('study_streak')),
+        models.When(last_study_date=today - timedelta(days=1), then=models.F('study_streak') + 1),
+        default=models.Value(1),
+        output_field=models.IntegerField(),
+    )
+    return {
+        'total_study_minutes': models.F('total_study_minutes') + minutes,
+        'total_focus_sessions': models.F('total_focus_sessions') + sessions,
+        **xp_updates(minutes),
+        'study_streak': streak,
+        'longest_streak': Greatest('longest_streak', streak),
+        'last_study_date': today,
+    }
+
+
+def _can_return_from_update(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
+
+def update_counters(user_id, updates, returning=STUDY_FIELDS):
+    """
+    Apply `updates` (field -> value or expression) to a user's profile in one
+    UPDATE. Returns the new values of the `returning` fields as a dict, or
+    None if the user has no profile.
+    """
+    from accounts.models import UserProfile
+
+    updates = {**updates, 'updated_at': timezone.now()}
+    db = router.db_for_write(UserProfile)
+    connection = connections[db]
+    queryset = UserProfile.objects.using(db).filter(user_id=user_id)
+    fields = [UserProfile._meta.get_field(name) for name in returning]
+
+    if not _can_return_from_update(connection):
+        with transaction.atomic(using=db):
+            if not queryset.update(**updates):
+                return None
+            return queryset.values(*returning).get()
+
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(updates)
+    sql, params = query.get_compiler(db).as_sql()
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {columns}', params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    # Raw rows skip the ORM's conversions (SQLite returns dates as text)
+    return {field.name: field.to_python(value) for field, value in zip(fields, row)}
@@ -0,0 +1,73 @@
+"""
+Dirty field tracking for models.
+UserProfile and UserPreferences used to be saved in full whenever their
+User was saved, including the last_login update on every login, so each
+login rewrote three rows and a stale profile in memory could overwrite
+counters another request had just updated. Models using DirtyFieldsMixin
+remember the values they were loaded (or last saved) with, so changes can
+be written field by field and unchanged objects not at all:
+
+    profile.bio = 'Studying'
+    profile.save_dirty()    # UPDATE ... SET bio, updated_at
+    profile.save_dirty()    # nothing changed: no query
+"""
+
+
+class DirtyFieldsMixin:
+    """
+    Model mixin tracking which fields changed since the instance was loaded
+    or saved. Fields that were never loaded (deferred) aren't tracked.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.mark_clean()
+        return instance
+
+    def _tracked_value(self, field):
+        # Compared in database form, so e.g. an avatar file compares by its name
+        return field.get_prep_value(field.value_from_object(self))
+
+    def mark_clean(self, fields=None):
+        """Treat the current values of `fields` (default: every loaded field) as saved"""
+        saved = self.__dict__.setdefault('_saved_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                saved[field.attname] = self._tracked_value(field)
+
+    def get_dirty_fields(self):
+        """Names of the fields changed since the instance was loaded or saved"""
+        saved = self.__dict__.get('_saved_values', {})
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in saved and self._tracked_value(field) != saved[field.attname]
+        ]
+
+    def save_dirty(self):
+        """
+        Save only the changed fields (and auto_now timestamps), or the whole
+        object if it's new. Returns True if anything was written.
+        """
+        if self._state.adding:
+            self.save()
+            return True
+        dirty = self.get_dirty_fields()
+        if not dirty:
+            return False
+        timestamps = [
+            field.name for field in self._meta.concrete_fields
+            if getattr(field, 'auto_now', False) and field.name not in dirty
+        ]
+        self.save(update_fields=dirty + timestamps)
+        return True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.mark_clean(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self.mark_clean(fields)
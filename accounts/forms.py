@@ -77,7 +77,7 @@ class SignUpForm(UserCreationForm):
             # Set gender on the user's profile
             if hasattr(user, 'profile'):
                 user.profile.gender = self.cleaned_data['gender']
-                user.profile.save()
+                user.profile.save_dirty()
         return user
 
 
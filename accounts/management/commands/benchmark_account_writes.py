@@ -0,0 +1,97 @@
+"""
+Management command to count the database writes of account actions
+Run with: python manage.py benchmark_account_writes --repeat 10
+Logs a user in, edits their profile (form and API) and changes a
+preference through the real views, --repeat times each, and reports the
+SQL statements and the writes (INSERT/UPDATE/DELETE) per action, broken
+down by table. All data is rolled back.
+"""
+import json
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+PASSWORD = 'bench-account-writes'
+
+WRITE = re.compile(r'^\s*(?:INSERT INTO|UPDATE|DELETE FROM)\s+"?(\w+)"?', re.IGNORECASE)
+
+
+class Rollback(Exception):
+    """Raised to undo the benchmark user once the writes are counted"""
+
+
+class Command(BaseCommand):
+    help = 'Count SQL writes per login, profile edit and preference change'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Times to run each action (default: 10)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user('bench-account-writes', 'bench@example.com', PASSWORD)
+                client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+                self.stdout.write(f'{"action":<20} {"statements":>10} {"writes":>7}  writes by table')
+                for name, action, prepare in self.actions(user, client):
+                    self.measure(name, action, prepare, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def actions(self, user, client):
+        """
+        (name, action, prepare) for each action, in order: both take the
+        repetition number, and only the action is measured
+        """
+        def logout(number):
+            client.logout()
+
+        def login(number):
+            client.post(reverse('login'), {'username': user.username, 'password': PASSWORD})
+
+        def edit_profile(number):
+            client.post(reverse('edit_profile'), {
+                'username': user.username, 'email': user.email, 'first_name': '', 'last_name': '',
+                'gender': 'prefer_not_to_say', 'bio': f'Edit {number}', 'timezone': 'UTC',
+            })
+
+        def update_profile_api(number):
+            client.post(reverse('api_update_profile'), json.dumps({'bio': f'API edit {number}'}),
+                        content_type='application/json')
+
+        def update_preferences(number):
+            client.post(reverse('solo:update_preferences'), json.dumps({'theme': ('light', 'dark')[number % 2]}),
+                        content_type='application/json')
+
+        return [
+            ('login', login, logout),
+            ('edit_profile', edit_profile, None),
+            ('update_profile_api', update_profile_api, None),
+            ('update_preferences', update_preferences, None),
+        ]
+
+    def measure(self, name, action, prepare, repeat):
+        statements, writes = 0, Counter()
+        for number in range(repeat):
+            if prepare:
+                prepare(number)
+            with CaptureQueriesContext(connection) as queries:
+                action(number)
+            statements += len(queries.captured_queries)
+            for query in queries.captured_queries:
+                match = WRITE.match(query['sql'])
+                if match:
+                    writes[match.group(1)] += 1
+
+        by_table = ', '.join(f'{table} {count / repeat:g}' for table, count in sorted(writes.items())) or '-'
+        self.stdout.write(
+            f'{name:<20} {statements / repeat:>10.1f} {sum(writes.values()) / repeat:>7.1f}  {by_table}'
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_alter_userprofile_gender'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='total_study_minutes',
+            field=models.IntegerField(db_index=True, default=0, help_text='Total minutes studied across all sessions'),
+        ),
+    ]
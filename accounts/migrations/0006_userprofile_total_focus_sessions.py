@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:15
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_focus_sessions(apps, schema_editor):
+    """Seed the counter from existing focus sessions"""
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    StudySession = apps.get_model('tracker', 'StudySession')
+
+    counts = StudySession.objects.filter(session_type='focus').values('user_id').annotate(
+        total=Count('id')
+    ).order_by()
+    for row in counts:
+        UserProfile.objects.filter(user_id=row['user_id']).update(total_focus_sessions=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_userprofile_total_study_minutes_index'),
+        ('tracker', '0004_dailystudyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_focus_sessions',
+            field=models.IntegerField(default=0, help_text='Number of focus sessions completed'),
+        ),
+        migrations.RunPython(count_focus_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_userprofile_total_focus_sessions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-total_study_minutes', 'user'], name='accounts_profile_rank_idx'),
+        ),
+    ]
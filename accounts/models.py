@@ -9,8 +9,28 @@ from django.utils import timezone
 from datetime import timedelta
 import uuid
 
+from . import counters
+from .dirty import DirtyFieldsMixin
 
-class UserProfile(models.Model):
+
+class UserProfileQuerySet(models.QuerySet):
+    """
+    All-time study rankings. The profile pages and the leaderboard
+    (tracker/leaderboard.py) both rank through these, so they agree.
+    """
+    
+    def ranked(self):
+        """Profiles of active users, most studied first, ties broken by user id"""
+        return self.filter(user__is_active=True).order_by('-total_study_minutes', 'user')
+    
+    def ahead_of(self, minutes, user_id):
+        """Ranked profiles placed above a user with this many minutes"""
+        return self.ranked().filter(
+            models.Q(total_study_minutes__gt=minutes) | models.Q(total_study_minutes=minutes, user_id__lt=user_id)
+        )
+
+
+class UserProfile(DirtyFieldsMixin, models.Model):
     """
     Extended user profile information
     Each user automatically gets a profile when they sign up
@@ -42,8 +62,10 @@ class UserProfile(models.Model):
                                help_text="Your timezone for scheduling")
     
     # Study tracking
-    total_study_minutes = models.IntegerField(default=0, 
+    total_study_minutes = models.IntegerField(default=0, db_index=True,  # Indexed for rank lookups
                                              help_text="Total minutes studied across all sessions")
+    total_focus_sessions = models.IntegerField(default=0,
+                                              help_text="Number of focus sessions completed")
     study_streak = models.IntegerField(default=0, 
                                       help_text="Consecutive days with study sessions")
     longest_streak = models.IntegerField(default=0,
@@ -67,10 +89,16 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = UserProfileQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'User Profile'
         verbose_name_plural = 'User Profiles'
         ordering = ['-created_at']
+        indexes = [
+            # All-time leaderboard order (tracker/leaderboard.py)
+            models.Index(fields=['-total_study_minutes', 'user'], name='accounts_profile_rank_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -96,44 +124,61 @@ class UserProfile(models.Model):
         """
         Update total study minutes and calculate streak
         Call this method whenever a study session is saved
+        The counters are updated in the database with one UPDATE (see
+        accounts/counters.py) and this profile is refreshed from the result.
+        Returns True if the user leveled up since this profile was loaded.
         """
-        from datetime import date
-        
-        self.total_study_minutes += minutes
-        
-        # Add XP: 1 minute = 1 XP
-        self.add_xp(minutes)
-        
-        # Check if user studied today
-        today = date.today()
-        if self.last_study_date:
-            # Calculate days since last study
-            days_diff = (today - self.last_study_date).days
-            
-            if days_diff == 0:
-                # Already studied today, don't change streak
-                pass
-            elif days_diff == 1:
-                # Studied yesterday, increment streak
-                self.study_streak += 1
-            else:
-                # Missed days, reset streak
-                self.study_streak = 1
-        else:
-            # First time studying
-            self.study_streak = 1
-        
-        # Update longest streak if needed
-        if self.study_streak > self.longest_streak:
-            self.longest_streak = self.study_streak
-        
-        self.last_study_date = today
-        self.save()
+        previous_level = self.level
+        self._set_counters(counters.update_counters(self.user_id, counters.study_time_updates(minutes)))
+        return self.level > previous_level
+    
+    @classmethod
+    def add_study_time(cls, user_id, minutes, sessions=1):
+        """
+        Add focus minutes and sessions to a user's profile with one UPDATE,
+        the same way as update_study_stats() but for a user whose profile
+        isn't loaded. Returns the number of profiles updated (0 if the user is gone).
+        """
+        return cls.objects.filter(user_id=user_id).update(
+            **counters.study_time_updates(minutes, sessions), updated_at=timezone.now()
+        )
+    
+    def award_xp(self, amount):
+        """
+        Add XP (e.g. an achievement bonus) in the database with one UPDATE
+        and refresh this profile's XP and level from the result.
+        """
+        self._set_counters(counters.update_counters(
+            self.user_id, counters.xp_updates(amount), returning=('total_xp', 'level')
+        ))
+    
+    def _set_counters(self, values):
+        """Copy counter values returned by the database onto this profile"""
+        if values is None:
+            raise UserProfile.DoesNotExist(f'No profile for user {self.user_id}')
+        for name, value in values.items():
+            setattr(self, name, value)
+        self.mark_clean(values)
+    
+    def get_study_rank(self):
+        """
+        Returns the user's rank by total study minutes (1 = most studied),
+        the same position as on the all-time leaderboard.
+        An indexed count of the profiles ahead of this one.
+        """
+        ahead = UserProfile.objects.ahead_of(self.total_study_minutes, self.user_id).count()
+        return ahead + 1
+    
+    async def aget_study_rank(self):
+        """Async version of get_study_rank()"""
+        ahead = await UserProfile.objects.ahead_of(self.total_study_minutes, self.user_id).acount()
+        return ahead + 1
     
     def add_xp(self, amount):
         """
         Add XP and check if user levels up
         Returns True if user leveled up, False otherwise
+        Only changes this instance; award_xp() saves XP atomically.
         """
         self.total_xp += amount
         
@@ -160,14 +205,16 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, created, **kwargs):
     """
-    Save the profile whenever the user is saved (but not on creation - 
-    create_user_profile handles that)
+    Save changes made to the user's profile when the user is saved (but not
+    on creation - create_user_profile handles that). Only a profile that is
+    already loaded and has changed fields is written, so e.g. the last_login
+    update on every login doesn't load and rewrite the profile.
     """
-    if not created and hasattr(instance, 'profile'):
-        instance.profile.save()
+    if not created and User.profile.is_cached(instance):
+        instance.profile.save_dirty()
 
 
-class UserPreferences(models.Model):
+class UserPreferences(DirtyFieldsMixin, models.Model):
     """
     User's customization preferences for the solo study room
     Stores theme, timer settings, sounds, backgrounds - everything the user customizes
@@ -226,12 +273,13 @@ def create_user_preferences(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_preferences(sender, instance, **kwargs):
+def save_user_preferences(sender, instance, created, **kwargs):
     """
-    Save preferences whenever the user is saved
+    Save changes made to the user's preferences when the user is saved
+    (only if they are loaded and changed, like save_user_profile)
     """
-    if hasattr(instance, 'preferences'):
-        instance.preferences.save()
+    if not created and User.preferences.is_cached(instance):
+        instance.preferences.save_dirty()
 
 
 class EmailVerification(models.Model):
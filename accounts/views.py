@@ -16,6 +16,7 @@ from django.utils.html import strip_tags
 from django.urls import reverse
 from .forms import SignUpForm, UserUpdateForm, ProfileUpdateForm
 from .models import UserProfile, EmailVerification
+from virtualcafe.query_budget import query_budget
 
 
 def signup_view(request):
@@ -125,6 +126,7 @@ def logout_view(request):
     return redirect('login')
 
 
+@query_budget(queries=9, time_ms=50)
 @login_required
 def profile_view(request, username=None):
     """
@@ -142,23 +144,28 @@ def profile_view(request, username=None):
     # Get or create profile (in case it doesn't exist)
     profile, created = UserProfile.objects.get_or_create(user=profile_user)
     
-    # Calculate additional stats
-    from tracker.models import StudySession
-    from django.db.models import Sum, Avg
-    from datetime import date, timedelta
+    # Calculate additional stats from the daily rollups
+    from tracker.models import DailyStudyRollup
+    from tracker.rollups import local_date
+    from django.db.models import Sum, F, Q
+    from datetime import timedelta
     
-    # Get study sessions for this user
-    sessions = StudySession.objects.filter(user=profile_user)
+    # Last 7 days activity
+    seven_days_ago = local_date(profile_user) - timedelta(days=7)
     
-    # Calculate stats
-    total_sessions = sessions.count()
-    avg_session_length = sessions.aggregate(avg=Avg('minutes'))['avg'] or 0
+    stats = DailyStudyRollup.objects.filter(user=profile_user).aggregate(
+        total_sessions=Sum('session_count'),
+        total_minutes=Sum(F('focus_minutes') + F('break_minutes')),
+        recent_minutes=Sum(
+            F('focus_minutes') + F('break_minutes'),
+            filter=Q(date__gte=seven_days_ago)
+        ),
+    )
     
-    # Last 7 days activity
-    seven_days_ago = date.today() - timedelta(days=7)
-    recent_minutes = sessions.filter(
-        created_at__date__gte=seven_days_ago
-    ).aggregate(total=Sum('minutes'))['total'] or 0
+    # Calculate stats
+    total_sessions = stats['total_sessions'] or 0
+    avg_session_length = (stats['total_minutes'] or 0) / total_sessions if total_sessions else 0
+    recent_minutes = stats['recent_minutes'] or 0
     
     # Get user's rooms
     from rooms.models import Room
@@ -177,6 +184,7 @@ def profile_view(request, username=None):
     return render(request, 'accounts/profile.html', context)
 
 
+@query_budget(queries=6, time_ms=50)
 @login_required
 def edit_profile_view(request):
     """
@@ -196,8 +204,10 @@ def edit_profile_view(request):
         )
         
         if user_form.is_valid() and profile_form.is_valid():
-            user_form.save()
-            profile_form.save()
+            # Only write what the user actually changed
+            if user_form.has_changed():
+                user_form.save()
+            profile_form.save(commit=False).save_dirty()
             messages.success(request, 'Your profile has been updated successfully!')
             return redirect('profile')  # Redirect to own profile
         else:
@@ -216,6 +226,7 @@ def edit_profile_view(request):
     return render(request, 'accounts/edit_profile.html', context)
 
 
+@query_budget(queries=8, time_ms=50)
 @login_required
 def notifications_view(request):
     """
@@ -240,6 +251,7 @@ def notifications_view(request):
     return render(request, 'accounts/notifications.html', context)
 
 
+@query_budget(queries=6, time_ms=50, method='POST')
 @login_required
 def mark_notification_read(request, notification_id):
     """
@@ -263,6 +275,7 @@ def mark_notification_read(request, notification_id):
     return JsonResponse({'success': False}, status=400)
 
 
+@query_budget(queries=5, time_ms=50, method='POST')
 @login_required
 def mark_all_notifications_read(request):
     """
@@ -290,6 +303,7 @@ def mark_all_notifications_read(request):
 # API ENDPOINTS FOR PROFILE
 # ========================================
 
+@query_budget(queries=7, time_ms=50)
 @login_required
 def api_get_profile(request):
     """
@@ -345,6 +359,7 @@ def api_get_profile(request):
         }, status=400)
 
 
+@query_budget(queries=10, time_ms=50, method='POST', json={'bio': 'Studying'})
 @login_required
 def api_update_profile(request):
     """
@@ -397,7 +412,9 @@ def api_update_profile(request):
         if 'last_name' in data:
             user.last_name = data['last_name'].strip()
         
-        user.save()
+        user_fields = [name for name in ('username', 'email', 'first_name', 'last_name') if name in data]
+        if user_fields:
+            user.save(update_fields=user_fields)
         
         # Update Profile model fields
         if 'bio' in data:
@@ -434,7 +451,7 @@ def api_update_profile(request):
             
             profile.avatar = avatar_file
         
-        profile.save()
+        profile.save_dirty()
         
         return JsonResponse({
             'success': True,
@@ -538,7 +555,7 @@ def verify_email_view(request, token):
             from django.utils import timezone
             user.profile.email_verified = True
             user.profile.email_verified_at = timezone.now()
-            user.profile.save()
+            user.profile.save_dirty()
         
         messages.success(
             request, 
@@ -599,6 +616,7 @@ def resend_verification_view(request):
     return render(request, 'accounts/resend_verification.html')
 
 
+@query_budget(queries=5, time_ms=50)
 @login_required
 def check_verification_status(request):
     """
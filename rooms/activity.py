@@ -0,0 +1,158 @@
+"""
+Buffered room activity tracking.
+Room.update_activity() used to count the room's members and save the room
+every time it was called - several times per page load, since membership
+signals and the view both call it. Activity is now recorded in memory and
+written in batches: at most two UPDATE statements per flush (rooms with
+members get expires_at cleared, empty rooms get a fresh 15 minute expiry),
+with member counts for every pending room fetched from the presence
+registry in one lookup.
+
+Pending activity is flushed ROOM_ACTIVITY_FLUSH_INTERVAL seconds after the
+first bump, or when the surrounding transaction commits if it was recorded
+inside one.
+
+Room.active_member_count is maintained here too: incremented/decremented
+with F() expressions when a user's first connection joins or last
+connection leaves, and periodically reconciled against the presence
+registry when it is shared through Redis (e.g. after a worker died
+without running its disconnects).
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import presence
+
+logger = logging.getLogger(__name__)
+
+# How long an empty room lives before it expires
+EMPTY_ROOM_TTL = timedelta(minutes=15)
+
+
+class ActivityTracker:
+    """
+    Per-process buffer of rooms with activity that hasn't been written yet.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval if interval is not None else getattr(
+            settings, 'ROOM_ACTIVITY_FLUSH_INTERVAL', 1.0
+        )
+        self._pending = {}   # room_id -> room_code
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def touch(self, room_id, room_code):
+        """Record activity in a room; it is written on the next flush"""
+        with self._lock:
+            self._pending[room_id] = room_code
+            if self._timer is None and self.interval > 0:
+                self._timer = threading.Timer(self.interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if self.interval <= 0:
+            self.flush()
+        elif connection.in_atomic_block:
+            # Write together with the transaction's other changes
+            transaction.on_commit(self.flush)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to write room activity: {str(e)}")
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """
+        Write all pending activity. Returns the number of rooms updated.
+        """
+        from .expiry import expiry_scheduler
+        from .models import Room
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+
+        now = timezone.now()
+        counts = presence.get_member_counts(pending.values())
+        occupied = [room_id for room_id, code in pending.items() if counts.get(code)]
+        empty = [room_id for room_id, code in pending.items() if not counts.get(code)]
+        expires_at = now + EMPTY_ROOM_TTL
+
+        with transaction.atomic():
+            if occupied:
+                # Clear expiration when room has members
+                Room.objects.filter(id__in=occupied).update(last_activity=now, expires_at=None)
+            if empty:
+                # Set expiration for 15 minutes from now if room is empty
+                Room.objects.filter(id__in=empty).update(last_activity=now, expires_at=expires_at)
+
+        for room_id in occupied:
+            expiry_scheduler.schedule(room_id, None)
+        for room_id in empty:
+            expiry_scheduler.schedule(room_id, expires_at)
+        return len(pending)
+
+
+activity_tracker = ActivityTracker()
+
+
+def change_member_count(room_id, delta):
+    """Atomically add `delta` to a room's active_member_count (never below zero)"""
+    from .models import Room
+    rooms = Room.objects.filter(id=room_id)
+    if delta < 0:
+        rooms = rooms.filter(active_member_count__gte=-delta)
+    rooms.update(active_member_count=F('active_member_count') + delta)
+
+
+def reconcile_member_counts():
+    """
+    Correct active_member_count for rooms where it drifted from the presence
+    registry. Checks rooms that claim members and rooms active recently.
+    Returns the number of rooms corrected.
+
+    Only runs when presence is shared through Redis: a per-process registry
+    only knows the sockets of this process (the scheduler's leader may not
+    hold any), so it would reset occupied rooms to 0.
+    """
+    from .cleanup import iter_candidate_chunks
+    from .models import Room
+
+    if not presence.is_shared():
+        logger.debug("Skipping member count reconciliation: presence isn't shared between workers")
+        return 0
+
+    interval = getattr(settings, 'ROOM_MEMBER_COUNT_RECONCILE_MINUTES', 5)
+    recently = timezone.now() - timedelta(minutes=interval * 2)
+    candidates = Room.objects.filter(
+        Q(active_member_count__gt=0) | Q(last_activity__gte=recently)
+    )
+
+    corrected = 0
+    for chunk in iter_candidate_chunks(candidates, fields=('id', 'room_code', 'active_member_count')):
+        counts = presence.get_member_counts(code for _, code, _ in chunk)
+        for room_id, code, stored in chunk:
+            actual = counts.get(code, 0)
+            if actual != stored:
+                # Skip rooms whose counter moved since we read it; the next pass gets them
+                corrected += Room.objects.filter(
+                    id=room_id, active_member_count=stored
+                ).update(active_member_count=actual)
+
+    if corrected:
+        logger.info(f"Corrected active member counts for {corrected} rooms")
+    return corrected
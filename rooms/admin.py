@@ -1,9 +1,9 @@
 """
 Admin configuration for rooms app.
-Register Room and RoomMembership models in Django admin panel.
+Register Room, RoomMembership, ChatMessage and SchedulerLease models in Django admin panel.
 """
 from django.contrib import admin
-from .models import Room, RoomMembership
+from .models import ChatMessage, Room, RoomMembership, SchedulerLease
 
 
 @admin.register(Room)
@@ -27,3 +27,27 @@ class RoomMembershipAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'joined_at']
     search_fields = ['user__username', 'room__name']
 
+
+
+@admin.register(ChatMessage)
+class ChatMessageAdmin(admin.ModelAdmin):
+    """
+    Admin interface for ChatMessage model.
+    """
+    list_display = ['user', 'room', 'message', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['user__username', 'room__name', 'room__room_code', 'message']
+    raw_id_fields = ['user', 'room']
+
+
+@admin.register(SchedulerLease)
+class SchedulerLeaseAdmin(admin.ModelAdmin):
+    """
+    Admin interface for SchedulerLease model (shows which worker runs background jobs).
+    """
+    list_display = ['name', 'holder', 'acquired_at', 'expires_at', 'is_held']
+    readonly_fields = ['name', 'holder', 'acquired_at', 'expires_at']
+    
+    @admin.display(boolean=True)
+    def is_held(self, obj):
+        return obj.is_held()
@@ -1,3 +1,6 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
@@ -11,8 +14,22 @@ class RoomsConfig(AppConfig):
         """
         import rooms.signals
         
-        # Only start scheduler under runserver/daphne, not during migrations/shell
-        import sys
-        if 'runserver' in sys.argv or 'daphne' in sys.argv[0] if sys.argv else False:
+        # Only start scheduler in the process serving requests, not during migrations/shell
+        if serves_requests():
             from rooms.scheduler import start_scheduler
             start_scheduler()
+
+
+def serves_requests():
+    """
+    Whether this process serves requests: daphne, or runserver's server
+    process. With autoreload, runserver's first process only watches the
+    files and restarts a child (marked by RUN_MAIN) that does the serving.
+    """
+    if not sys.argv:
+        return False
+    if 'daphne' in sys.argv[0]:
+        return True
+    if 'runserver' in sys.argv:
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    return False
@@ -1,61 +1,139 @@
 """
 Auto-cleanup service for inactive rooms.
-Removes rooms that are empty and older than 30 minutes.
+Removes rooms that are empty and older than 30 minutes, and rooms whose
+expires_at has passed.
+
+Each pass is set-based: candidate rooms are selected by one indexed query
+per chunk (keyset on id) and every chunk is removed with one
+QuerySet.delete(), instead of loading and deleting rooms (and their
+memberships) one at a time.
+
+Whether a room is empty is read from Room.active_member_count, which every
+worker keeps current in the database. The presence registry is only asked
+as well when it is shared through Redis; a per-process registry only
+knows the sockets of the process running the cleanup.
 """
+from django.conf import settings
+from django.db import router, transaction
 from django.utils import timezone
 from datetime import timedelta
 from rooms.models import Room
+from rooms import presence
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+def _chunk_size():
+    return getattr(settings, 'ROOM_CLEANUP_CHUNK_SIZE', 500)
+
+
+class CleanupStats:
+    """
+    Metrics for one cleanup pass.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.scanned = 0          # candidate rooms looked at
+        self.deleted = 0          # rooms deleted
+        self.related_deleted = 0  # memberships, chat messages, ... deleted with them
+        self.elapsed = 0.0        # wall time in seconds
+        self._started_at = time.monotonic()
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self._started_at
+        return self
+
+    def __str__(self):
+        return (
+            f"{self.name}: scanned {self.scanned} candidate rooms, deleted {self.deleted} "
+            f"(+{self.related_deleted} related rows) in {self.elapsed * 1000:.1f}ms"
+        )
+
+
+def iter_candidate_chunks(queryset, chunk_size=None, fields=('id', 'room_code')):
+    """
+    Yield lists of `fields` tuples (id first) for the rooms in `queryset`, chunk by chunk.
+    Uses keyset pagination on id, so deleting a chunk doesn't shift the next one.
+    """
+    chunk_size = chunk_size or _chunk_size()
+    last_id = 0
+    while True:
+        chunk = list(
+            queryset.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list(*fields)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def delete_rooms(room_ids):
+    """
+    Delete rooms and everything that depends on them.
+    Returns (rooms deleted, related rows deleted).
+
+    One QuerySet.delete() for the whole chunk, so on_delete rules and
+    signals apply as usual. Django still clears related tables without
+    delete signals (chat messages, favourites) with one statement each;
+    memberships are loaded for their post_delete receiver, which ignores
+    memberships deleted along with their room.
+    """
+    using = router.db_for_write(Room)
+    with transaction.atomic(using=using):
+        total, by_model = Room._base_manager.using(using).filter(id__in=room_ids).delete()
+    deleted = by_model.get(Room._meta.label, 0)
+    return deleted, total - deleted
+
+
 def cleanup_inactive_rooms():
     """
     Remove rooms that are:
-    1. Empty (no active members)
-    2. Older than 30 minutes from creation or last activity
-    
+    1. Empty (no one connected, per active_member_count and, when it is
+       shared, the presence registry)
+    2. Older than 30 minutes from creation and last activity
+
     This function is designed to be run periodically (every 5 minutes recommended)
     """
+    stats = CleanupStats('Auto-cleanup')
     try:
         # Calculate the cutoff time (30 minutes ago)
         cutoff_time = timezone.now() - timedelta(minutes=30)
-        
-        # Find rooms that are old and empty
+
+        # Rooms created and last active more than 30 minutes ago, with nobody counted in them
         old_rooms = Room.objects.filter(
-            created_at__lt=cutoff_time  # Created more than 30 minutes ago
+            created_at__lt=cutoff_time,
+            last_activity__lt=cutoff_time,
+            active_member_count=0
         )
-        
-        rooms_to_delete = []
-        
-        for room in old_rooms:
-            # Check if room is empty (no active members)
-            if room.is_empty():
-                # Also check last_activity if it exists
-                if room.last_activity and room.last_activity < cutoff_time:
-                    rooms_to_delete.append(room)
-                elif not room.last_activity:
-                    # If no last_activity, use created_at
-                    rooms_to_delete.append(room)
-        
-        # Delete the identified rooms
-        if rooms_to_delete:
-            deleted_count = len(rooms_to_delete)
-            room_codes = [room.room_code for room in rooms_to_delete]
-            
-            for room in rooms_to_delete:
-                room.delete()
-            
-            logger.info(f"Auto-cleanup: Deleted {deleted_count} inactive rooms: {', '.join(room_codes)}")
-            return deleted_count
-        else:
-            logger.debug("Auto-cleanup: No inactive rooms to delete")
-            return 0
-            
+
+        for chunk in iter_candidate_chunks(old_rooms):
+            stats.scanned += len(chunk)
+            empty_ids = [room_id for room_id, _ in chunk]
+
+            if presence.is_shared():
+                # Double-check with one presence round trip for the whole chunk
+                counts = presence.get_member_counts(code for _, code in chunk)
+                empty_ids = [room_id for room_id, code in chunk if not counts.get(code)]
+
+            if empty_ids:
+                deleted, related = delete_rooms(empty_ids)
+                stats.deleted += deleted
+                stats.related_deleted += related
+
     except Exception as e:
         logger.error(f"Error during room cleanup: {str(e)}")
-        return 0
+
+    stats.finish()
+    if stats.deleted:
+        logger.info(str(stats))
+    else:
+        logger.debug(str(stats))
+    return stats
 
 
 def cleanup_expired_rooms():
@@ -63,36 +141,42 @@ def cleanup_expired_rooms():
     Additional cleanup for rooms with explicit expiration times.
     This removes rooms that have an expires_at time in the past.
     """
+    stats = CleanupStats('Expired rooms cleanup')
     try:
-        expired_rooms = Room.objects.filter(
-            expires_at__lte=timezone.now(),
-            expires_at__isnull=False
-        )
-        
-        deleted_count = expired_rooms.count()
-        if deleted_count > 0:
-            room_codes = list(expired_rooms.values_list('room_code', flat=True))
-            expired_rooms.delete()
-            logger.info(f"Expired rooms cleanup: Deleted {deleted_count} rooms: {', '.join(room_codes)}")
-            return deleted_count
-        return 0
-        
+        expired_rooms = Room.objects.expired()
+
+        for chunk in iter_candidate_chunks(expired_rooms):
+            stats.scanned += len(chunk)
+            deleted, related = delete_rooms([room_id for room_id, _ in chunk])
+            stats.deleted += deleted
+            stats.related_deleted += related
+
     except Exception as e:
         logger.error(f"Error during expired rooms cleanup: {str(e)}")
-        return 0
+
+    stats.finish()
+    if stats.deleted:
+        logger.info(str(stats))
+    else:
+        logger.debug(str(stats))
+    return stats
 
 
 def run_all_cleanup():
     """
     Run all cleanup tasks.
     This is the main function to be scheduled.
+    Returns the number of rooms deleted.
     """
-    inactive_deleted = cleanup_inactive_rooms()
-    expired_deleted = cleanup_expired_rooms()
-    
-    total_deleted = inactive_deleted + expired_deleted
-    
+    inactive = cleanup_inactive_rooms()
+    expired = cleanup_expired_rooms()
+
+    total_deleted = inactive.deleted + expired.deleted
+
     if total_deleted > 0:
-        logger.info(f"Total rooms cleaned up: {total_deleted}")
-    
+        logger.info(
+            f"Total rooms cleaned up: {total_deleted} "
+            f"in {(inactive.elapsed + expired.elapsed) * 1000:.1f}ms"
+        )
+
     return total_deleted
@@ -2,8 +2,38 @@
 WebSocket consumers for real-time chat functionality.
 Handles WebSocket connections, messages, and room membership.
 """
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.utils import timezone
+
+from virtualcafe.async_views import run_in_pool
+
+from . import presence
+from .activity import activity_tracker, change_member_count
+from .history import chat_writer, get_replay
+from .frames import room_frame_event
+from .typing import typing_coalescer
+
+
+# Seconds to collect trickled ICE candidates before sending them to a peer in one frame
+ICE_BATCH_WINDOW = 0.05
+
+
+@run_in_pool
+def get_room_id(room_code):
+    """Primary key of the room, or None if it doesn't exist (any more)"""
+    from .models import Room
+    return Room.objects.filter(room_code=room_code).values_list('id', flat=True).first()
+
+
+@run_in_pool
+def can_read_history(room_id, user):
+    """Whether the user may read the room's chat history (members only, as room_messages_view)"""
+    from .models import RoomMembership
+    if not user.is_authenticated:
+        return False
+    return RoomMembership.objects.filter(room_id=room_id, user_id=user.id).exists()
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -17,13 +47,32 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.room_code = self.scope['url_route']['kwargs']['room_code']
         self.room_group_name = f'chat_{self.room_code}'
         self.user = self.scope['user']
+        self.room_id = await get_room_id(self.room_code)
         
-        # Join room group
+        # Join room group; messages sent from now on reach us live, not in the replay
+        self.joined_at = timezone.now()
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
         
+        # Join our own peer group so WebRTC signaling can be addressed to us
+        self.peer_group_name = None
+        self.ice_buffers = {}
+        self.ice_flush_task = None
+        if self.user.is_authenticated:
+            self.peer_group_name = self.get_peer_group_name(self.user.id)
+            await self.channel_layer.group_add(
+                self.peer_group_name,
+                self.channel_name
+            )
+        
+        # Register presence; the first connection brings the room back to life
+        if self.user.is_authenticated:
+            if await run_in_pool(presence.join_room)(self.room_code, self.user.id):
+                await self.update_member_count(1)
+                self.refresh_room_activity()
+        
         # Accept WebSocket connection
         await self.accept()
         
@@ -33,15 +82,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'message': 'Connected to chat room'
         }))
         
+        # Replay recent chat so late joiners can catch up
+        if self.room_id and await can_read_history(self.room_id, self.user):
+            messages, cursor = await get_replay(self.room_id, until=self.joined_at)
+            await self.send(text_data=json.dumps({
+                'type': 'chat_history',
+                'messages': messages,
+                'before': cursor,
+            }))
+        
         # Notify others that user joined (if authenticated)
         if self.user.is_authenticated:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_join',
-                    'username': self.user.username,
-                }
-            )
+            await self.send_to_room({
+                'type': 'user_join',
+                'username': self.user.username,
+                'user_id': self.user.id,
+            })
     
     async def disconnect(self, close_code):
         """
@@ -50,19 +106,35 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """
         # Notify others that user left (if authenticated)
         if self.user.is_authenticated:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_leave',
-                    'username': self.user.username,
-                }
+            # Clear any typing indicator the user left behind
+            await typing_coalescer.update(
+                self.channel_layer, self.room_group_name, self.user.username, False
             )
+            
+            # Drop presence; the last connection leaving starts the room's expiry clock
+            if await run_in_pool(presence.leave_room)(self.room_code, self.user.id):
+                await self.update_member_count(-1)
+                self.refresh_room_activity()
+            
+            await self.send_to_room({
+                'type': 'user_leave',
+                'username': self.user.username,
+            })
         
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
+        
+        # Leave our peer group and drop any ICE candidates still waiting to go out
+        if self.ice_flush_task:
+            self.ice_flush_task.cancel()
+        if self.peer_group_name:
+            await self.channel_layer.group_discard(
+                self.peer_group_name,
+                self.channel_name
+            )
     
     async def receive(self, text_data):
         """
@@ -86,6 +158,8 @@ from client.
                 await self.handle_webrtc_answer(data)
             elif message_type == 'timer':
                 await self.handle_timer_event(data)
+            elif message_type == 'heartbeat':
+                await self.handle_heartbeat()
                 
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
@@ -108,149 +182,147 @@ from client.
             return
         
         # Get current timestamp
-        from datetime import datetime
-        timestamp = datetime.now().isoformat()
+        timestamp = timezone.now()
         
         # Broadcast message to room group
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message,
-                'username': self.user.username,
-                'user_id': self.user.id,
-                'timestamp': timestamp,
-            }
-        )
+        await self.send_to_room({
+            'type': 'chat',
+            'message': message,
+            'username': self.user.username,
+            'user_id': self.user.id,
+            'timestamp': timestamp.isoformat(),
+        })
+        
+        # Save to history in the background (batched, off the event loop)
+        if self.room_id:
+            await chat_writer.add(self.room_id, self.user, message, timestamp)
     
     async def handle_typing(self, data):
-        """Handle typing indicators"""
+        """
+        Handle typing indicators.
+        Events are coalesced per room and broadcast at most once per interval.
+        """
         if self.user.is_authenticated:
-            await self.channel_layer.group_send(
+            await typing_coalescer.update(
+                self.channel_layer,
                 self.room_group_name,
-                {
-                    'type': 'user_typing',
-                    'username': self.user.username,
-                    'is_typing': data.get('is_typing', False),
-                }
+                self.user.username,
+                bool(data.get('is_typing', False))
             )
     
     async def handle_ice_candidate(self, data):
-        """Handle WebRTC ICE candidates for video chat"""
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'webrtc_ice_message',
-                'candidate': data.get('candidate'),
-                'username': self.user.username if self.user.is_authenticated else 'Anonymous',
-            }
-        )
+        """
+        Handle WebRTC ICE candidates for video chat.
+        Candidates for a target peer are batched for ICE_BATCH_WINDOW seconds
+        and delivered to that peer only; untargeted ones go to the whole room.
+        """
+        candidates = data.get('candidates') or [data.get('candidate')]
+        target = self.get_target(data)
+        
+        if target is None:
+            await self.send_to_room(self.signal_frame('webrtc_ice', candidates=candidates),
+                                    exclude=self.signal_username())
+            return
+        
+        self.ice_buffers.setdefault(target, []).extend(candidates)
+        if self.ice_flush_task is None:
+            self.ice_flush_task = asyncio.ensure_future(self.flush_ice_candidates())
+    
+    async def flush_ice_candidates(self):
+        """Send each peer the ICE candidates gathered during the batch window"""
+        await asyncio.sleep(ICE_BATCH_WINDOW)
+        buffers, self.ice_buffers = self.ice_buffers, {}
+        self.ice_flush_task = None
+        for target, candidates in buffers.items():
+            await self.send_to_peer(target, self.signal_frame('webrtc_ice', candidates=candidates))
     
     async def handle_webrtc_offer(self, data):
         """Handle WebRTC offers for video chat"""
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'webrtc_offer_message',
-                'offer': data.get('offer'),
-                'username': self.user.username if self.user.is_authenticated else 'Anonymous',
-            }
-        )
+        await self.send_signal(data, self.signal_frame('webrtc_offer', offer=data.get('offer')))
     
     async def handle_webrtc_answer(self, data):
         """Handle WebRTC answers for video chat"""
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'webrtc_answer_message',
-                'answer': data.get('answer'),
-                'username': self.user.username if self.user.is_authenticated else 'Anonymous',
-            }
-        )
+        await self.send_signal(data, self.signal_frame('webrtc_answer', answer=data.get('answer')))
     
     async def handle_timer_event(self, data):
         """Handle timer events"""
         if self.user.is_authenticated:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'timer_message',
-                    'action': data.get('action'),
-                    'username': self.user.username,
-                }
-            )
+            await self.send_to_room({
+                'type': 'timer',
+                'action': data.get('action'),
+                'username': self.user.username,
+            }, exclude=self.user.username)
     
-    # Group message handlers
-    async def chat_message(self, event):
-        """Send chat message to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'chat',
-            'message': event['message'],
-            'username': event['username'],
-            'user_id': event['user_id'],
-            'timestamp': event.get('timestamp', ''),
-        }))
+    async def handle_heartbeat(self):
+        """Keep the user's room presence alive (sent by the client every 30 seconds)"""
+        if self.user.is_authenticated:
+            await run_in_pool(presence.heartbeat)(self.room_code, self.user.id)
     
-    async def user_join(self, event):
-        """Send user join notification to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_join',
-            'username': event['username'],
-        }))
+    async def update_member_count(self, delta):
+        """Keep Room.active_member_count in step with presence"""
+        if self.room_id:
+            await run_in_pool(change_member_count)(self.room_id, delta)
     
-    async def user_leave(self, event):
-        """Send user leave notification to WebSocket"""
-        await self.send(text_data=json.dumps({
-            'type': 'user_leave',
-            'username': event['username'],
-        }))
+    def refresh_room_activity(self):
+        """Recompute the room's expiry after someone arrives or the last person leaves"""
+        if self.room_id:
+            activity_tracker.touch(self.room_id, self.room_code)
     
-    async def user_typing(self, event):
-        """Send typing indicator to WebSocket"""
-        # Don't send typing indicator back to the sender
-        if event['username'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'user_typing',
-                'username': event['username'],
-                'is_typing': event['is_typing'],
-            }))
+    async def send_to_room(self, payload, exclude=None):
+        """
+        Broadcast a frame to everyone in the room.
+        The frame is encoded once here; every receiving consumer just forwards
+        the text. Pass `exclude` (a username) to skip that user's sockets.
+        """
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            room_frame_event(payload, exclude)
+        )
     
-    async def webrtc_ice_message(self, event):
-        """Send ICE candidate to WebSocket"""
-        # Don't send back to sender
-        if event['username'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'webrtc_ice',
-                'candidate': event['candidate'],
-                'username': event['username'],
-            }))
+    # WebRTC signaling helpers
+    @staticmethod
+    def get_target(data):
+        """The user id a signaling message is addressed to, or None to broadcast"""
+        try:
+            return int(data['target'])
+        except (KeyError, TypeError, ValueError):
+            return None
     
-    async def webrtc_offer_message(self, event):
-        """Send WebRTC offer to WebSocket"""
-        # Don't send back to sender
-        if event['username'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'webrtc_offer',
-                'offer': event['offer'],
-                'username': event['username'],
-            }))
+    def get_peer_group_name(self, user_id):
+        """Group holding every socket a user has open in this room"""
+        return f'{self.room_group_name}_user_{user_id}'
     
-    async def webrtc_answer_message(self, event):
-        """Send WebRTC answer to WebSocket"""
-        # Don't send back to sender
-        if event['username'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'webrtc_answer',
-                'answer': event['answer'],
-                'username': event['username'],
-            }))
+    def signal_username(self):
+        """Name signaling frames are sent under"""
+        return self.user.username if self.user.is_authenticated else 'Anonymous'
     
-    async def timer_message(self, event):
-        """Send timer event to WebSocket"""
-        # Don't send back to sender
-        if event['username'] != self.user.username:
-            await self.send(text_data=json.dumps({
-                'type': 'timer',
-                'action': event['action'],
-                'username': event['username'],
-            }))
+    def signal_frame(self, frame_type, **fields):
+        """Build a signaling frame that identifies the sender"""
+        return {
+            'type': frame_type,
+            **fields,
+            'username': self.signal_username(),
+            'user_id': self.user.id if self.user.is_authenticated else None,
+        }
+    
+    async def send_signal(self, data, payload):
+        """Deliver an offer/answer to its target peer (or the whole room if untargeted)"""
+        target = self.get_target(data)
+        if target is None:
+            await self.send_to_room(payload, exclude=self.signal_username())
+        else:
+            await self.send_to_peer(target, payload)
+    
+    async def send_to_peer(self, user_id, payload):
+        """Send a frame point-to-point to one user's sockets in this room"""
+        await self.channel_layer.group_send(
+            self.get_peer_group_name(user_id),
+            room_frame_event(payload)
+        )
+    
+    # Group message handlers
+    async def room_frame(self, event):
+        """Forward a pre-encoded room broadcast to WebSocket"""
+        # Don't send back to the excluded user (usually the sender)
+        if event.get('exclude') != self.user.username:
+            await self.send(text_data=event['frame'])
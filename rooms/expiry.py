@@ -0,0 +1,183 @@
+"""
+Deadline-driven room expiry.
+Keeps a min-heap of room expiry deadlines and deletes each room when its
+deadline passes, instead of finding expired rooms with a periodic scan.
+
+The heap is seeded from Room.expires_at at startup and updated whenever
+rooms.activity writes room activity in this process. Changes made by
+other processes are picked up by a cheap incremental resync (rooms whose
+last_activity moved since the previous one, every
+ROOM_EXPIRY_RESYNC_SECONDS), and
+rooms.scheduler still runs the full cleanup as a reconciliation pass at
+a much lower frequency. The database is always re-checked before
+deleting, so a stale deadline never removes a room that came back to life.
+"""
+import heapq
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """
+    Background thread that fires room deletions at their expires_at.
+    """
+
+    def __init__(self, resync_interval=None):
+        self.resync_interval = resync_interval if resync_interval is not None else getattr(
+            settings, 'ROOM_EXPIRY_RESYNC_SECONDS', 60
+        )
+        self._heap = []        # (deadline, room_id); entries that disagree with _deadlines are stale
+        self._deadlines = {}   # room_id -> current deadline
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._last_sync = None
+        self._next_sync = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def schedule(self, room_id, deadline):
+        """Set (or with deadline=None, cancel) the expiry deadline of a room"""
+        if not self.running:
+            return
+        with self._condition:
+            self._set_deadline(room_id, deadline)
+
+    def _set_deadline(self, room_id, deadline):
+        if deadline is None:
+            self._deadlines.pop(room_id, None)
+            return
+        if self._deadlines.get(room_id) == deadline:
+            return
+        self._deadlines[room_id] = deadline
+        heapq.heappush(self._heap, (deadline, room_id))
+        if self._heap[0] == (deadline, room_id):
+            self._condition.notify()  # new earliest deadline: wake the thread up early
+
+        # Drop stale entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._deadlines) + 100:
+            self._heap = [(due, pk) for pk, due in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def seed(self):
+        """Load every room's expires_at from the database, replacing the heap"""
+        from .models import Room
+        now = timezone.now()
+        deadlines = dict(
+            Room.objects.filter(expires_at__isnull=False).order_by().values_list('id', 'expires_at')
+        )
+        with self._condition:
+            self._deadlines = deadlines
+            self._heap = [(due, pk) for pk, due in deadlines.items()]
+            heapq.heapify(self._heap)
+            self._last_sync = now
+            self._condition.notify()
+        logger.info(f"Room expiry scheduler tracking {len(deadlines)} deadlines")
+
+    def resync(self):
+        """Pick up expiry changes made by other processes since the last sync"""
+        from .models import Room
+        now = timezone.now()
+        changed = Room.objects.filter(
+            last_activity__gte=self._last_sync - timedelta(seconds=1)
+        ).order_by().values_list('id', 'expires_at')
+        with self._condition:
+            for room_id, expires_at in changed:
+                self._set_deadline(room_id, expires_at)
+            self._last_sync = now
+
+    def start(self):
+        """Seed the heap and start the expiry thread"""
+        if self.running:
+            return
+        self.seed()
+        self._stopping = False
+        self._next_sync = timezone.now() + timedelta(seconds=self.resync_interval)
+        self._thread = threading.Thread(target=self._run, name='room-expiry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _pop_due(self, now):
+        """Remove and return the rooms whose deadline has passed"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, room_id = heapq.heappop(self._heap)
+            if self._deadlines.get(room_id) == deadline:
+                del self._deadlines[room_id]
+                due.append(room_id)
+        return due
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                now = timezone.now()
+                wake_at = self._next_sync
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                if wake_at > now:
+                    self._condition.wait((wake_at - now).total_seconds())
+                    continue
+                due = self._pop_due(now)
+
+            try:
+                close_old_connections()
+                if due:
+                    self.expire(due)
+                if now >= self._next_sync:
+                    self._next_sync = now + timedelta(seconds=self.resync_interval)
+                    self.resync()
+            except Exception as e:
+                logger.error(f"Error in room expiry scheduler: {str(e)}")
+            finally:
+                close_old_connections()
+
+    def expire(self, room_ids):
+        """Delete the rooms that are still expired according to the database"""
+        from .cleanup import delete_rooms
+        from .models import Room
+
+        expired_ids = list(
+            Room.objects.expired().filter(id__in=room_ids).values_list('id', flat=True)
+        )
+        if expired_ids:
+            deleted, related = delete_rooms(expired_ids)
+            logger.info(f"Room expiry: deleted {deleted} rooms (+{related} related rows) at their deadline")
+
+        # Rooms that were reactivated elsewhere get their new deadline back
+        for room_id, expires_at in Room.objects.filter(
+            id__in=set(room_ids) - set(expired_ids)
+        ).values_list('id', 'expires_at'):
+            self.schedule(room_id, expires_at)
+
+
+expiry_scheduler = ExpiryScheduler()
+
+
+def reconcile_rooms():
+    """
+    Low-frequency reconciliation: the full cleanup pass, then reload the
+    deadlines in case any were missed.
+    """
+    from .cleanup import run_all_cleanup
+    deleted = run_all_cleanup()
+    if expiry_scheduler.running:
+        expiry_scheduler.seed()
+    return deleted
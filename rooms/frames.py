@@ -0,0 +1,31 @@
+"""
+WebSocket frame encoding for room broadcasts.
+Frames are serialized once when they are sent to the room group, and every
+consumer in the room forwards the same text to its socket. orjson is used
+when it is installed; otherwise the standard json module.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up
+    orjson = None
+
+
+def encode_frame(payload):
+    """Serialize a frame payload to JSON text"""
+    if orjson is not None:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload)
+
+
+def room_frame_event(payload, exclude=None):
+    """
+    Build the channel layer event for a room broadcast.
+    `exclude` is a username whose sockets should not receive the frame.
+    """
+    return {
+        'type': 'room_frame',
+        'frame': encode_frame(payload),
+        'exclude': exclude,
+    }
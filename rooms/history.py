@@ -0,0 +1,179 @@
+"""
+Chat history persistence.
+Messages are buffered in memory by each worker process and written with
+one bulk_create per batch from the sync worker pool, so sending a message
+never waits on the database. Recent history is read back with keyset
+pagination on (created_at, id), served by the (room, created_at) index,
+so older pages cost the same as the first one.
+
+Messages still in the buffer (at most CHAT_HISTORY_FLUSH_INTERVAL seconds
+worth) are lost if the worker process dies.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+from virtualcafe.async_views import run_in_pool
+from .models import ChatMessage, Room
+
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _page_size():
+    return getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 50)
+
+
+def encode_cursor(message):
+    """Opaque cursor pointing at a message: '<microseconds since epoch>-<id>'"""
+    micros = (message.created_at - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}-{message.pk}'
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor back into (created_at, id).
+    Raises ValueError for malformed cursors.
+    """
+    micros, pk = cursor.split('-')
+    return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+
+
+def get_recent_messages(room_id, before=None, limit=None):
+    """
+    Return (messages oldest first, cursor for the previous page or None).
+    `before` is a cursor from an earlier call; only older messages are returned.
+    """
+    limit = limit or _page_size()
+    messages = ChatMessage.objects.filter(room_id=room_id).select_related('user')
+    if before:
+        created_at, pk = decode_cursor(before)
+        messages = messages.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    # One extra row tells us whether there is an older page
+    page = list(messages.order_by('-created_at', '-id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    page.reverse()
+
+    cursor = encode_cursor(page[0]) if has_more else None
+    return page, cursor
+
+
+def serialize_message(message):
+    """Chat message in the same shape as a live 'chat' frame"""
+    return {
+        'message': message.message,
+        'username': message.user.username,
+        'user_id': message.user_id,
+        'timestamp': message.created_at.isoformat(),
+    }
+
+
+def _write_batch(messages):
+    """
+    Insert a batch, skipping messages for rooms or users deleted since they
+    were sent (one dangling foreign key would fail the whole insert)
+    """
+    rooms = set(Room.objects.filter(
+        id__in={message.room_id for message in messages}
+    ).values_list('id', flat=True))
+    users = set(User.objects.filter(
+        id__in={message.user_id for message in messages}
+    ).values_list('id', flat=True))
+    ChatMessage.objects.bulk_create([
+        message for message in messages
+        if message.room_id in rooms and message.user_id in users
+    ])
+
+
+class ChatHistoryWriter:
+    """
+    Per-process write buffer for chat messages.
+    """
+
+    def __init__(self, flush_interval=None, batch_size=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'CHAT_HISTORY_FLUSH_INTERVAL', 0.5
+        )
+        self.batch_size = batch_size if batch_size is not None else getattr(
+            settings, 'CHAT_HISTORY_BATCH_SIZE', 200
+        )
+        self._buffer = []    # unsaved ChatMessage instances
+        self._writing = []   # the batch currently being inserted
+        self._flush_task = None
+
+    async def add(self, room_id, user, message, created_at):
+        """Queue a message; it is written on the next flush"""
+        self._buffer.append(ChatMessage(
+            room_id=room_id,
+            user=user,
+            message=message,
+            created_at=created_at,
+        ))
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Write everything buffered so far in one bulk insert"""
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        self._writing.extend(batch)
+        try:
+            await run_in_pool(_write_batch)(batch)
+        except Exception:
+            logger.exception('Failed to save %d chat messages', len(batch))
+        finally:
+            written = {id(message) for message in batch}
+            self._writing = [message for message in self._writing if id(message) not in written]
+
+    def pending(self, room_id):
+        """Messages for a room that may not be in the database yet"""
+        return [
+            message for message in self._writing + self._buffer
+            if message.room_id == room_id
+        ]
+
+
+chat_writer = ChatHistoryWriter()
+
+
+def _message_key(message):
+    """What identifies a message both before and after it is saved (it has no pk until then)"""
+    return (message.user_id, message.created_at, message.message)
+
+
+async def get_replay(room_id, until=None):
+    """
+    The latest page of a room's history for a newly connected socket,
+    including messages this process hasn't written yet. Messages sent from
+    `until` on (when the socket joined the room group) are left out, as
+    they reach the socket live.
+    Returns (serialized messages, cursor for the previous page or None).
+    """
+    messages, cursor = await run_in_pool(get_recent_messages)(room_id)
+    # A batch being written can already be in the page and still be pending
+    saved = {_message_key(message) for message in messages}
+    messages += [
+        message for message in chat_writer.pending(room_id)
+        if _message_key(message) not in saved
+    ]
+    if until is not None:
+        messages = [message for message in messages if message.created_at < until]
+    return [serialize_message(message) for message in messages], cursor
@@ -0,0 +1,157 @@
+"""
+Lease-based leader election between worker processes.
+Every worker that would run background jobs competes for a SchedulerLease
+row. Taking or renewing the lease is a single conditional UPDATE (holder is
+us, or the lease has expired), so at most one worker holds it at a time.
+The leader renews it every SCHEDULER_LEASE_TTL / 3 seconds; if it dies or
+hangs, the lease runs out and the next worker to try takes over.
+
+Leases are timed with each worker's clock, so workers on different hosts
+need reasonably synchronised clocks (NTP).
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def worker_identity():
+    """Name a worker process uniquely: '<host>:<pid>'"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def get_leader_status(name):
+    """
+    Who currently leads `name`: a dict with holder, acquired_at, expires_at
+    and is_held (False once the lease has run out), or None if never held.
+    """
+    from .models import SchedulerLease
+    lease = SchedulerLease.objects.filter(name=name).first()
+    if lease is None:
+        return None
+    return {
+        'name': lease.name,
+        'holder': lease.holder,
+        'acquired_at': lease.acquired_at,
+        'expires_at': lease.expires_at,
+        'is_held': lease.is_held(),
+    }
+
+
+class LeaderElection:
+    """
+    Keep competing for a lease in a background thread, calling
+    `on_elected` when this worker becomes leader and `on_demoted` when it
+    stops being leader.
+    """
+
+    def __init__(self, name, on_elected, on_demoted, ttl=None):
+        self.name = name
+        self.identity = worker_identity()
+        self.ttl = ttl if ttl is not None else getattr(settings, 'SCHEDULER_LEASE_TTL', 30)
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def try_acquire(self):
+        """
+        Take the lease if it is free or expired, or renew it if we hold it.
+        Returns True if we hold the lease afterwards.
+        """
+        from .models import SchedulerLease
+        now = timezone.now()
+        updated = SchedulerLease.objects.filter(
+            Q(holder=self.identity) | Q(expires_at__lte=now),
+            name=self.name
+        ).update(
+            acquired_at=Case(
+                When(holder=self.identity, then=F('acquired_at')),
+                default=Value(now)
+            ),
+            holder=self.identity,
+            expires_at=now + timedelta(seconds=self.ttl),
+        )
+        if updated:
+            return True
+
+        if SchedulerLease.objects.filter(name=self.name).exists():
+            return False
+        try:
+            SchedulerLease.objects.create(
+                name=self.name,
+                holder=self.identity,
+                acquired_at=now,
+                expires_at=now + timedelta(seconds=self.ttl)
+            )
+            return True
+        except IntegrityError:
+            return False  # Another worker created it first
+
+    def release(self):
+        """Give the lease up so another worker can take over immediately"""
+        from .models import SchedulerLease
+        SchedulerLease.objects.filter(name=self.name, holder=self.identity).update(
+            holder='',
+            expires_at=timezone.now()
+        )
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'leader-{self.name}', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop competing; demote ourselves and release the lease if we hold it"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        if self.is_leader:
+            self._set_leader(False)
+            try:
+                self.release()
+            except Exception as e:
+                logger.error(f"Failed to release {self.name} lease: {str(e)}")
+            finally:
+                close_old_connections()
+
+    def _set_leader(self, is_leader):
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        if is_leader:
+            logger.info(f"{self.identity} is now the leader for {self.name}")
+            self.on_elected()
+        else:
+            logger.info(f"{self.identity} is no longer the leader for {self.name}")
+            self.on_demoted()
+
+    def _run(self):
+        # Renew well before the lease runs out
+        interval = self.ttl / 3
+        while not self._stop.is_set():
+            try:
+                close_old_connections()
+                self._set_leader(self.try_acquire())
+            except Exception as e:
+                # Can't reach the database: we can't prove we still hold the lease
+                logger.error(f"Leader election for {self.name} failed: {str(e)}")
+                self._set_leader(False)
+            finally:
+                close_old_connections()
+            self._stop.wait(interval)
@@ -0,0 +1,106 @@
+"""
+Keyset pagination for room listings.
+Listings are ordered most popular first on (active_member_count, created_at,
+id), all descending, which the rooms_room_popular_idx index serves directly.
+Each page continues from a cursor naming the last room of the previous page
+instead of an OFFSET. The cursor is applied as a row-value comparison,
+(active_member_count, created_at, id) < (...), which the database turns
+into an index seek, so every page costs the same however deep the user
+scrolls.
+
+Member counts change while people scroll, so a room whose count moves
+between two page loads may be skipped or shown twice; clients drop
+duplicates by room code.
+
+Search results are ranked by relevance rather than popularity and have no
+usable keyset, so they fall back to offset pagination (cursor 'o<offset>').
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+ROOM_ORDERING = ('-active_member_count', '-created_at', '-id')
+
+
+def _page_size():
+    return getattr(settings, 'ROOM_LIST_PAGE_SIZE', 24)
+
+
+def encode_cursor(room):
+    """Opaque cursor after a room: '<member count>-<microseconds since epoch>-<id>'"""
+    micros = (room.created_at - EPOCH) // timedelta(microseconds=1)
+    return f'{room.active_member_count}-{micros}-{room.pk}'
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor back into (active_member_count, created_at, id).
+    Raises ValueError for malformed cursors.
+    """
+    count, micros, pk = cursor.split('-')
+    return int(count), EPOCH + timedelta(microseconds=int(micros)), int(pk)
+
+
+def paginate_rooms(rooms, after=None, limit=None):
+    """
+    Return (page of rooms, cursor for the next page or None).
+    `rooms` must not be ordered yet; `after` is a cursor from an earlier call.
+    """
+    limit = limit or _page_size()
+    if after:
+        count, created_at, pk = decode_cursor(after)
+        # Same as (count < c) OR (count = c AND created_at < t) OR (... AND id < pk),
+        # but written so the database can seek the index instead of scanning it
+        ops = connections[rooms.db].ops
+        rooms = rooms.extra(
+            where=[
+                '(rooms_room.active_member_count, rooms_room.created_at, rooms_room.id) < (%s, %s, %s)'
+            ],
+            params=[count, ops.adapt_datetimefield_value(created_at), pk],
+        )
+
+    # One extra row tells us whether there is a next page
+    page = list(rooms.order_by(*ROOM_ORDERING)[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    cursor = encode_cursor(page[-1]) if has_more else None
+    return page, cursor
+
+
+def paginate_ranked_rooms(rooms, after=None, limit=None):
+    """
+    Offset pagination for querysets already ordered by search rank.
+    Same return value as paginate_rooms().
+    """
+    limit = limit or _page_size()
+    offset = 0
+    if after:
+        if not after.startswith('o'):
+            raise ValueError('Not a search cursor')
+        offset = int(after[1:])
+        if offset < 0:
+            raise ValueError('Negative offset')
+
+    page = list(rooms[offset:offset + limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    cursor = f'o{offset + limit}' if has_more else None
+    return page, cursor
+
+
+def serialize_room(room):
+    """Room card data for the listing and search endpoints"""
+    return {
+        'name': room.name,
+        'description': room.description,
+        'room_code': room.room_code,
+        'created_by': room.created_by.username,
+        'member_count': room.active_member_count,
+        'url': reverse('room_detail', args=[room.room_code]),
+    }
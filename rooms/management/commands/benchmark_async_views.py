@@ -0,0 +1,213 @@
+"""
+Management command to load test the hot HTTP endpoints under WebSocket load
+Run with: python manage.py benchmark_async_views --sockets 100 --concurrency 32 --duration 10
+Drives the ASGI application in-process, the same stack Daphne serves. First
+--sockets chat connections are opened into one room at once (their connect
+latency is reported), then while every socket heartbeats and chats,
+--concurrency clients request the room detail page, the stats API, the task
+APIs and the save-session beacon back to back for --duration seconds.
+Reports requests/sec and p50/p95/p99 latency per endpoint.
+
+Requests run on several threads, so the data can't be rolled back: the
+benchmark users (and everything that belongs to them) are created in the
+database and deleted again afterwards. Run it against a migrated database.
+"""
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict
+
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from rooms.activity import activity_tracker
+from rooms.history import chat_writer
+from rooms.models import Room, RoomMembership
+from tracker.ingest import session_ingestor
+from tracker.models import StudySession, Task
+
+USERNAME_PREFIX = 'bench-async-'
+
+# Seconds to wait for any single response before counting the request as failed
+RESPONSE_TIMEOUT = 60
+
+
+def percentiles(latencies):
+    """(p50, p95, p99) of a list of seconds, in milliseconds"""
+    if len(latencies) < 2:
+        value = latencies[0] * 1000 if latencies else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(latencies, n=100)
+    return cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000
+
+
+class Command(BaseCommand):
+    help = 'Benchmark requests/sec and tail latency of the hot endpoints under WebSocket load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=100, help='Open chat connections (default: 100)')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent HTTP clients (default: 32)')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of HTTP load (default: 10)')
+        parser.add_argument('--heartbeat', type=float, default=1.0,
+                            help='Seconds between heartbeats per socket (default: 1)')
+        parser.add_argument('--chat', type=float, default=5.0,
+                            help='Seconds between chat messages per socket (default: 5)')
+
+    def handle(self, *args, **options):
+        # Imported here so the ASGI application is only built when the benchmark runs
+        from virtualcafe.asgi import application
+
+        self.session_keys = []
+        self.cleanup()
+        try:
+            setup = self.seed(max(options['sockets'], options['concurrency']))
+            connects, results, elapsed = asyncio.run(self.run(application, setup, options))
+        finally:
+            activity_tracker.flush()
+            session_ingestor.flush()
+            self.cleanup()
+
+        p50, p95, p99 = percentiles(connects)
+        self.stdout.write(
+            f'{len(connects)} WebSocket connects: p50 {p50:.1f}ms  p95 {p95:.1f}ms  p99 {p99:.1f}ms'
+        )
+        self.stdout.write(f'{"endpoint":<20} {"requests":>9} {"errors":>7} {"req/s":>8} '
+                          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        everything, errors = [], 0
+        for name, (latencies, failed) in sorted(results.items()):
+            everything.extend(latencies)
+            errors += failed
+            self.write_row(name, latencies, failed, elapsed)
+        self.write_row('all', everything, errors, elapsed)
+
+    def write_row(self, name, latencies, failed, elapsed):
+        p50, p95, p99 = percentiles(latencies)
+        self.stdout.write(
+            f'{name:<20} {len(latencies):>9} {failed:>7} {len(latencies) / elapsed:>8.1f} '
+            f'{p50:>8.1f} {p95:>8.1f} {p99:>8.1f}'
+        )
+
+    def seed(self, user_count):
+        """Users with sessions, goals and study history, all members of one room"""
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        owner = User.objects.create(username=f'{USERNAME_PREFIX}owner')
+        room = Room.objects.create(name='Async benchmark room', created_by=owner)
+
+        people = []
+        for number in range(user_count):
+            user = User.objects.create(username=f'{USERNAME_PREFIX}{number}')
+            RoomMembership.objects.create(user=user, room=room)
+            for minutes in (25, 50):
+                StudySession.objects.create(user=user, room=room, minutes=minutes)
+            Task.objects.bulk_create(Task(user=user, title=f'Benchmark goal {goal}') for goal in range(5))
+            task_id = Task.objects.filter(user=user).values_list('id', flat=True).first()
+
+            client.force_login(user)
+            self.session_keys.append(client.session.session_key)
+            csrf_token = get_random_string(32)
+            cookie = (f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}; '
+                      f'{settings.CSRF_COOKIE_NAME}={csrf_token}')
+            people.append({
+                'headers': [
+                    (b'host', settings.ALLOWED_HOSTS[0].encode()),
+                    (b'cookie', cookie.encode()),
+                    (b'x-csrftoken', csrf_token.encode()),
+                ],
+                'task_id': task_id,
+            })
+            client.cookies.clear()
+
+        return {'room_code': room.room_code, 'people': people}
+
+    def cleanup(self):
+        """Delete everything the benchmark created"""
+        Session.objects.filter(session_key__in=self.session_keys).delete()
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        Room.objects.filter(created_by__in=users).delete()
+        users.delete()
+
+    def endpoints(self, room_code, person):
+        """(name, method, path, JSON body) for each request a client makes, in order"""
+        task_id = person['task_id']
+        return [
+            ('room_detail', 'GET', reverse('room_detail', args=[room_code]), None),
+            ('get_study_stats', 'GET', reverse('solo:get_study_stats') + '?period=week', None),
+            ('get_tasks', 'GET', reverse('solo:get_tasks'), None),
+            ('get_task', 'GET', reverse('solo:get_task', args=[task_id]), None),
+            ('create_task', 'POST', reverse('solo:create_task'), {'title': 'Benchmark goal'}),
+            ('toggle_task', 'POST', reverse('solo:toggle_task', args=[task_id]), None),
+            ('save_auto_session', 'POST', reverse('solo:save_auto_session'),
+             {'minutes': 1, 'room_code': room_code}),
+        ]
+
+    async def run(self, application, setup, options):
+        """Connect the sockets, then run the HTTP clients; returns (connects, results, seconds)"""
+        room_code, people = setup['room_code'], setup['people']
+        sockets = people[:options['sockets']]
+        stop = asyncio.Event()
+        results = defaultdict(lambda: [[], 0])
+
+        async def connect(person):
+            communicator = WebsocketCommunicator(application, f'/ws/rooms/{room_code}/', headers=person['headers'])
+            started = time.perf_counter()
+            connected, _ = await communicator.connect(timeout=RESPONSE_TIMEOUT)
+            assert connected, 'WebSocket connection was refused'
+            return communicator, time.perf_counter() - started
+
+        async def chatter(communicator, number):
+            heartbeats_per_chat = max(1, round(options['chat'] / options['heartbeat']))
+            # Spread the sockets' timers out instead of firing them in lockstep
+            await asyncio.sleep(options['heartbeat'] * number / len(sockets))
+            beats = 0
+            while not stop.is_set():
+                await communicator.send_to(text_data=json.dumps({'type': 'heartbeat'}))
+                beats += 1
+                if beats % heartbeats_per_chat == 0:
+                    await communicator.send_to(text_data=json.dumps({'type': 'chat', 'message': 'benchmark'}))
+                await asyncio.sleep(options['heartbeat'])
+
+        async def client(person):
+            endpoints = self.endpoints(room_code, person)
+            number = 0
+            while not stop.is_set():
+                name, method, path, payload = endpoints[number % len(endpoints)]
+                number += 1
+                body = json.dumps(payload).encode() if payload is not None else b''
+                headers = person['headers'] + [(b'content-type', b'application/json')]
+                started = time.perf_counter()
+                communicator = HttpCommunicator(application, method, path, body=body, headers=headers)
+                try:
+                    response = await communicator.get_response(timeout=RESPONSE_TIMEOUT)
+                    ok = response['status'] < 400
+                except Exception:
+                    ok = False
+                latency = time.perf_counter() - started
+                if ok:
+                    results[name][0].append(latency)
+                else:
+                    results[name][1] += 1
+
+        connected = await asyncio.gather(*(connect(person) for person in sockets))
+        communicators = [communicator for communicator, _ in connected]
+        chatters = [asyncio.ensure_future(chatter(communicator, number))
+                    for number, communicator in enumerate(communicators)]
+
+        started = time.perf_counter()
+        clients = [asyncio.ensure_future(client(person)) for person in people[:options['concurrency']]]
+        await asyncio.sleep(options['duration'])
+        stop.set()
+        await asyncio.gather(*clients)
+        elapsed = time.perf_counter() - started
+
+        await asyncio.gather(*chatters)
+        for communicator in communicators:
+            await communicator.disconnect(timeout=RESPONSE_TIMEOUT)
+        await chat_writer.flush()
+        return [latency for _, latency in connected], results, elapsed
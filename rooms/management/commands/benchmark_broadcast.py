@@ -0,0 +1,95 @@
+"""
+Management command to measure CPU spent fanning out one room broadcast
+Run with: python manage.py benchmark_broadcast --sizes 10 50 200 1000
+Compares re-encoding the event in every receiving consumer (the old
+handlers) with encoding once and forwarding the text (ChatConsumer.room_frame).
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from rooms import frames
+from rooms.consumers import ChatConsumer
+
+
+SAMPLE_EVENT = {
+    'type': 'chat_message',
+    'message': 'Anyone want to review chapter 4 together after the break? ' * 3,
+    'username': 'sender',
+    'user_id': 1,
+    'timestamp': '2026-01-01T12:00:00',
+}
+
+
+async def _discard(text_data=None, bytes_data=None, close=False):
+    """Stand-in for AsyncWebsocketConsumer.send"""
+
+
+def make_consumers(count):
+    """Consumers with a user attached and a no-op send"""
+    consumers = []
+    for number in range(count):
+        consumer = ChatConsumer()
+        consumer.user = SimpleNamespace(username=f'user{number}')
+        consumer.send = _discard
+        consumers.append(consumer)
+    return consumers
+
+
+async def per_consumer_encoding(consumers, event):
+    """The old path: each consumer builds and encodes its own frame"""
+    for consumer in consumers:
+        await consumer.send(text_data=json.dumps({
+            'type': 'chat',
+            'message': event['message'],
+            'username': event['username'],
+            'user_id': event['user_id'],
+            'timestamp': event.get('timestamp', ''),
+        }))
+
+
+async def encode_once(consumers, event):
+    """The new path: encode at group_send time, consumers forward the text"""
+    room_event = frames.room_frame_event({
+        'type': 'chat',
+        'message': event['message'],
+        'username': event['username'],
+        'user_id': event['user_id'],
+        'timestamp': event['timestamp'],
+    })
+    for consumer in consumers:
+        await consumer.room_frame(room_event)
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark CPU per room broadcast versus room size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200, 1000],
+                            help='Room sizes to test (default: 10 50 200 1000)')
+        parser.add_argument('--repeat', type=int, default=200,
+                            help='Broadcasts per measurement (default: 200)')
+
+    def handle(self, *args, **options):
+        codec = 'orjson' if frames.orjson is not None else 'json'
+        self.stdout.write(f'Frame codec: {codec}')
+        self.stdout.write(f'{"members":>8} {"per-consumer (us)":>18} {"encode-once (us)":>17} {"speed-up":>9}')
+
+        for size in options['sizes']:
+            consumers = make_consumers(size)
+            old = self.measure(per_consumer_encoding, consumers, options['repeat'])
+            new = self.measure(encode_once, consumers, options['repeat'])
+            self.stdout.write(f'{size:>8} {old:>18.1f} {new:>17.1f} {old / new:>8.1f}x')
+
+    def measure(self, fan_out, consumers, repeat):
+        """CPU microseconds per broadcast"""
+        async def run():
+            for _ in range(repeat):
+                await fan_out(consumers, SAMPLE_EVENT)
+
+        started = time.process_time()
+        asyncio.run(run())
+        return (time.process_time() - started) / repeat * 1_000_000
@@ -0,0 +1,159 @@
+"""
+Management command to measure group broadcast throughput across processes
+Run with: CHANNEL_LAYER_BACKEND=redis python manage.py benchmark_channel_layer --workers 4
+     or:   python manage.py benchmark_channel_layer --fake-redis --workers 4
+Each worker process joins the same group (like one Daphne worker holding
+sockets for a room) and counts the broadcasts it receives.
+Without a Redis server, --fake-redis starts fakeredis's TCP server in this
+process before the workers are forked and points the layer at it (install
+requirements-dev.txt). It uses the pub/sub layer unless CHANNEL_LAYER_BACKEND
+says otherwise; the core redis layer runs Lua scripts, which fakeredis only
+supports with its [lua] extra. The stand-in serves every worker from one
+Python thread, so absolute numbers are far below a real Redis.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+
+from channels.layers import channel_layers, get_channel_layer
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+GROUP_NAME = 'benchmark_fanout'
+
+
+def run_worker(expected, timeout, ready, results):
+    """
+    Join the benchmark group and receive until `expected` messages arrive
+    (or nothing arrives for `timeout` seconds)
+    """
+    async def receive_all():
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add(GROUP_NAME, channel)
+        ready.put(True)
+
+        received = 0
+        last_received_at = None
+        while received < expected:
+            try:
+                await asyncio.wait_for(layer.receive(channel), timeout)
+            except asyncio.TimeoutError:
+                break
+            received += 1
+            last_received_at = time.time()
+
+        await layer.group_discard(GROUP_NAME, channel)
+        results.put((received, last_received_at))
+
+    asyncio.run(receive_all())
+
+
+class Command(BaseCommand):
+    help = 'Benchmark channel layer group_send fan-out across several worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Receiving processes (default: 4)')
+        parser.add_argument('--messages', type=int, default=1000, help='Broadcasts to send (default: 1000)')
+        parser.add_argument('--timeout', type=float, default=5.0,
+                            help='Seconds a worker waits for the next message (default: 5)')
+        parser.add_argument('--fake-redis', action='store_true',
+                            help='Broker through an in-process fakeredis server instead of REDIS_URL')
+
+    def handle(self, *args, **options):
+        server = self.start_fake_redis() if options['fake_redis'] else None
+        try:
+            self.run(options)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    def start_fake_redis(self):
+        """Serve fakeredis over TCP from a thread and point the channel layer at it"""
+        try:
+            from fakeredis import TcpFakeServer
+        except ImportError:
+            raise CommandError('--fake-redis needs fakeredis: pip install -r requirements-dev.txt')
+
+        layer = dict(settings.CHANNEL_LAYERS['default'])
+        if layer['BACKEND'].endswith('InMemoryChannelLayer'):
+            layer = {'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer'}
+        elif layer['BACKEND'] == 'channels_redis.core.RedisChannelLayer':
+            try:
+                import lupa  # noqa: F401
+            except ImportError:
+                raise CommandError(
+                    'The core redis layer needs Lua scripting in fakeredis: pip install "fakeredis[lua]", '
+                    'or use CHANNEL_LAYER_BACKEND=redis_pubsub'
+                )
+
+        # Port 0 picks a free port; forked workers reach the server over TCP
+        server = TcpFakeServer(('127.0.0.1', 0), server_type='redis')
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        layer['CONFIG'] = {**layer.get('CONFIG', {}), 'hosts': [f'redis://{host}:{port}']}
+        settings.CHANNEL_LAYERS = {'default': layer}
+        channel_layers.backends.clear()
+        self.stdout.write(f'Using fakeredis at {host}:{port}')
+        return server
+
+    def run(self, options):
+        backend = settings.CHANNEL_LAYERS['default']['BACKEND']
+        if backend.endswith('InMemoryChannelLayer'):
+            raise CommandError(
+                'The in-memory channel layer cannot deliver across processes. '
+                'Set CHANNEL_LAYER_BACKEND=redis (or redis_pubsub) and REDIS_URL first, or pass --fake-redis.'
+            )
+
+        workers = options['workers']
+        messages = options['messages']
+
+        # Fork so the workers inherit the configured Django settings
+        context = multiprocessing.get_context('fork')
+        ready = context.Queue()
+        results = context.Queue()
+        processes = [
+            context.Process(target=run_worker, args=(messages, options['timeout'], ready, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.get(timeout=30)
+
+        started_at = time.time()
+        asyncio.run(self.send_all(messages))
+        sent_at = time.time()
+
+        worker_results = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        delivered = sum(received for received, _ in worker_results)
+        finished_at = max((last for _, last in worker_results if last), default=sent_at)
+        elapsed = max(finished_at - started_at, 1e-9)
+
+        self.stdout.write(f'Backend: {backend}')
+        self.stdout.write(f'Workers: {workers}, broadcasts: {messages}')
+        self.stdout.write(f'Send rate: {messages / max(sent_at - started_at, 1e-9):,.0f} group_send/sec')
+        self.stdout.write(
+            f'Delivered: {delivered}/{messages * workers} messages in {elapsed:.3f}s '
+            f'({delivered / elapsed:,.0f} messages/sec)'
+        )
+        if delivered < messages * workers:
+            self.stdout.write(self.style.WARNING(
+                'Some messages were dropped (channel capacity reached or worker timed out)'
+            ))
+
+    async def send_all(self, messages):
+        """Broadcast `messages` small chat-sized events to the group"""
+        layer = get_channel_layer()
+        for number in range(messages):
+            await layer.group_send(GROUP_NAME, {
+                'type': 'chat_message',
+                'message': f'benchmark message {number}',
+                'username': 'benchmark',
+            })
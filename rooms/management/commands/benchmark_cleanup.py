@@ -0,0 +1,116 @@
+"""
+Management command to benchmark the inactive-room cleanup pass
+Run with: python manage.py benchmark_cleanup --rooms 100000
+Creates synthetic stale rooms (each with a membership, a few with someone
+still connected), runs rooms.cleanup.cleanup_inactive_rooms over them and
+rolls everything back afterwards. The old per-room loop (is_empty() and
+room.delete() for every candidate) is timed on a smaller set for comparison.
+"""
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from rooms import presence
+from rooms.cleanup import cleanup_inactive_rooms
+from rooms.models import Room, RoomMembership
+
+
+class Rollback(Exception):
+    """Raised to undo the synthetic data once a run is measured"""
+
+
+def legacy_cleanup():
+    """The cleanup loop this subsystem replaced"""
+    cutoff_time = timezone.now() - timedelta(minutes=30)
+    deleted = 0
+    for room in Room.objects.filter(created_at__lt=cutoff_time):
+        if room.is_empty() and room.last_activity < cutoff_time:
+            room.delete()
+            deleted += 1
+    return deleted
+
+
+class Command(BaseCommand):
+    help = 'Benchmark set-based room cleanup against the old per-room loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=100_000,
+                            help='Synthetic rooms for the set-based pass (default: 100000)')
+        parser.add_argument('--legacy-rooms', type=int, default=2_000,
+                            help='Synthetic rooms for the old loop, 0 to skip (default: 2000)')
+        parser.add_argument('--present-every', type=int, default=10,
+                            help='Every Nth room has someone connected and must survive (default: 10)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Set-based cleanup over {options['rooms']:,} rooms")
+        self.run(options['rooms'], options['present_every'], self.set_based)
+
+        if options['legacy_rooms']:
+            self.stdout.write(f"Per-room loop over {options['legacy_rooms']:,} rooms")
+            self.run(options['legacy_rooms'], options['present_every'], self.legacy)
+
+    def run(self, count, present_every, cleanup):
+        """Seed `count` rooms, time `cleanup`, then roll the data back"""
+        try:
+            with transaction.atomic():
+                present_codes = self.seed(count, present_every)
+                try:
+                    cleanup()
+                finally:
+                    for code in present_codes:
+                        presence.leave_room(code, 0)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def set_based(self):
+        stats = cleanup_inactive_rooms()
+        self.stdout.write(
+            f'  scanned {stats.scanned:,}, deleted {stats.deleted:,} rooms '
+            f'(+{stats.related_deleted:,} related rows) in {stats.elapsed:.2f}s '
+            f'({stats.scanned / max(stats.elapsed, 1e-9):,.0f} rooms/sec)'
+        )
+
+    def legacy(self):
+        started_at = time.monotonic()
+        deleted = legacy_cleanup()
+        elapsed = time.monotonic() - started_at
+        scanned = Room.objects.count() + deleted
+        self.stdout.write(
+            f'  deleted {deleted:,} rooms in {elapsed:.2f}s '
+            f'({scanned / max(elapsed, 1e-9):,.0f} rooms/sec)'
+        )
+
+    def seed(self, count, present_every):
+        """
+        Create `count` stale rooms with one membership each and mark every
+        `present_every`th one as occupied. Returns the occupied room codes.
+        """
+        owner = User.objects.create_user('cleanup-benchmark')
+        stale = timezone.now() - timedelta(hours=2)
+
+        rooms = Room.objects.bulk_create(
+            [
+                Room(name=f'Benchmark room {number}', created_by=owner,
+                     room_code=f'BC{number:08d}', last_activity=stale)
+                for number in range(count)
+            ],
+            batch_size=5000,
+        )
+        Room.objects.filter(created_by=owner).update(created_at=stale)
+        RoomMembership.objects.bulk_create(
+            [RoomMembership(user=owner, room=room) for room in rooms],
+            batch_size=5000,
+        )
+
+        # Connected rooms are counted in the database by every worker, and in the presence registry
+        present = rooms[::present_every]
+        Room.objects.filter(id__in=[room.id for room in present]).update(active_member_count=1)
+        present_codes = [room.room_code for room in present]
+        for code in present_codes:
+            presence.join_room(code, 0)
+        return present_codes
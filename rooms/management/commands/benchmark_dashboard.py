@@ -0,0 +1,102 @@
+"""
+Management command to measure dashboard latency with many expired rooms present
+Run with: python manage.py benchmark_dashboard --expired 20000 --requests 50
+Seeds expired rooms that the background cleanup hasn't removed yet, requests
+the dashboard and browse pages as a logged-in user and reports p50/p95
+latency. Also times the inline purge (COUNT plus cascading DELETE) those
+views used to run before rendering. All data is rolled back afterwards.
+"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from rooms.models import Room, RoomMembership
+
+
+class Rollback(Exception):
+    """Raised to undo the synthetic data once the run is measured"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark home/browse latency with many expired rooms in the table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expired', type=int, default=20_000,
+                            help='Expired rooms waiting for cleanup (default: 20000)')
+        parser.add_argument('--live', type=int, default=50,
+                            help='Live rooms the user belongs to (default: 50)')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Requests per page (default: 50)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = self.seed(options['expired'], options['live'])
+                client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+                client.force_login(user)
+
+                for name in ('home', 'browse_rooms'):
+                    self.report(name, self.measure(client, reverse(name), options['requests']))
+
+                started_at = time.perf_counter()
+                with transaction.atomic():
+                    expired = Room.objects.expired()
+                    if expired.count():
+                        expired.delete()
+                self.stdout.write(
+                    f'Old inline purge of {options["expired"]:,} expired rooms: '
+                    f'{(time.perf_counter() - started_at) * 1000:,.1f}ms '
+                    f'(paid by whichever dashboard request came first)'
+                )
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, client, url, count):
+        """Milliseconds per request, after one warm-up request"""
+        client.get(url)
+        timings = []
+        for _ in range(count):
+            started_at = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started_at) * 1000)
+            assert response.status_code == 200, response.status_code
+        return timings
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f'{name}: p50 {statistics.median(timings):.1f}ms, p95 {p95:.1f}ms, '
+            f'max {timings[-1]:.1f}ms over {len(timings)} requests'
+        )
+
+    def seed(self, expired, live):
+        """Create a user who belongs to `live` rooms and to `expired` expired ones"""
+        user = User.objects.create_user('dashboard-benchmark')
+        past = timezone.now() - timedelta(minutes=5)
+
+        rooms = Room.objects.bulk_create(
+            [
+                Room(name=f'Expired room {number}', created_by=user,
+                     room_code=f'BX{number:08d}', expires_at=past)
+                for number in range(expired)
+            ] + [
+                Room(name=f'Live room {number}', created_by=user, room_code=f'BL{number:08d}')
+                for number in range(live)
+            ],
+            batch_size=5000,
+        )
+        RoomMembership.objects.bulk_create(
+            [RoomMembership(user=user, room=room) for room in rooms],
+            batch_size=5000,
+        )
+        return user
@@ -0,0 +1,96 @@
+"""
+Management command to compare full-text room search with the old icontains search
+Run with: python manage.py benchmark_room_search --rooms 100000
+Seeds synthetic public rooms, indexes them and times the browse page query
+(first 50 results) for a few searches both ways. All data is rolled back.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from rooms import search
+from rooms.models import Room
+
+
+WORDS = [
+    'calculus', 'chemistry', 'biology', 'history', 'physics', 'statistics', 'algebra',
+    'literature', 'economics', 'programming', 'python', 'exam', 'revision', 'quiet',
+    'group', 'morning', 'evening', 'pomodoro', 'finals', 'homework', 'essay', 'lab',
+    'reading', 'thesis', 'language', 'spanish', 'french', 'music', 'theory', 'law',
+]
+
+# One room in RARE_EVERY mentions this, so the search is selective
+RARE_WORD = 'cryptography'
+RARE_EVERY = 1000
+
+QUERIES = ['calculus', 'stat', 'python exam', 'quiet evening reading', 'crypto']
+
+
+class Rollback(Exception):
+    """Raised to undo the synthetic data once the run is measured"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FTS room search against icontains over many rooms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=100_000, help='Rooms to seed (default: 100000)')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query (default: 20)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Search backend: {search.search_backend()}')
+        try:
+            with transaction.atomic():
+                self.seed(options['rooms'])
+                rooms = Room.objects.live().filter(is_public=True)
+
+                self.stdout.write(f'{"query":<24} {"icontains (ms)":>15} {"indexed (ms)":>13} {"hits":>7}')
+                for query in QUERIES:
+                    old = self.measure(lambda: self.icontains(rooms, query), options['repeat'])
+                    new = self.measure(lambda: search.search_rooms(rooms, query), options['repeat'])
+                    hits = search.search_rooms(rooms, query).count()
+                    self.stdout.write(f'{query:<24} {old:>15.2f} {new:>13.2f} {hits:>7,}')
+                raise Rollback
+        except Rollback:
+            pass
+
+    def icontains(self, rooms, query):
+        """The search the views used before rooms.search"""
+        return rooms.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        ).order_by('-active_member_count', '-created_at')
+
+    def measure(self, build_queryset, repeat):
+        """Median milliseconds to fetch the first page (50 rooms)"""
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            list(build_queryset()[:50])
+            timings.append((time.perf_counter() - started_at) * 1000)
+        return statistics.median(timings)
+
+    def seed(self, count):
+        """Create `count` public rooms with random study-ish names and index them"""
+        owner = User.objects.create_user('search-benchmark')
+        rng = random.Random(42)
+        Room.objects.bulk_create(
+            [
+                Room(
+                    name=' '.join(rng.sample(WORDS, 3)).title(),
+                    description=' '.join(
+                        rng.choices(WORDS, k=12) + ([RARE_WORD] if number % RARE_EVERY == 0 else [])
+                    ),
+                    created_by=owner,
+                    room_code=f'BS{number:08d}',
+                )
+                for number in range(count)
+            ],
+            batch_size=5000,
+        )
+        # bulk_create skips the signals that normally keep the index in sync
+        search.rebuild_index()
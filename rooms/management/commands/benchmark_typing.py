@@ -0,0 +1,96 @@
+"""
+Management command to compare typing-indicator traffic with and without coalescing
+Run with: python manage.py benchmark_typing --members 50 --typists 5
+Simulates a room on an in-memory channel layer and counts the frames that
+would be written to WebSockets when every keystroke is broadcast (the old
+behaviour) versus when events go through rooms.typing.TypingCoalescer.
+"""
+import asyncio
+import random
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from rooms.frames import room_frame_event
+from rooms.typing import TypingCoalescer
+
+
+GROUP_NAME = 'chat_BENCH'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark typing indicator frames/sec before and after coalescing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=50, help='People in the room (default: 50)')
+        parser.add_argument('--typists', type=int, default=5, help='People typing at once (default: 5)')
+        parser.add_argument('--keystrokes', type=float, default=8.0,
+                            help='Typing events per second per typist (default: 8)')
+        parser.add_argument('--duration', type=float, default=3.0, help='Seconds to simulate (default: 3)')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Coalescing interval in seconds (default: 0.5)')
+
+    def handle(self, *args, **options):
+        for label, coalesce in (('Per-keystroke broadcast', False), ('Coalesced', True)):
+            frames, elapsed = asyncio.run(self.simulate(coalesce, options))
+            self.stdout.write(
+                f'{label}: {frames} frames in {elapsed:.2f}s ({frames / elapsed:,.0f} frames/sec)'
+            )
+
+    async def simulate(self, coalesce, options):
+        """
+        Run one simulation and return (frames delivered to sockets, seconds)
+        """
+        layer = InMemoryChannelLayer(capacity=1_000_000)
+        members = [f'user{number}' for number in range(options['members'])]
+        channels = {}
+        for name in members:
+            channels[name] = await layer.new_channel()
+            await layer.group_add(GROUP_NAME, channels[name])
+
+        coalescer = TypingCoalescer(interval=options['interval'], idle_timeout=5.0)
+        typists = members[:options['typists']]
+        pause = 1.0 / options['keystrokes']
+
+        async def type_for(username):
+            deadline = time.monotonic() + options['duration']
+            while time.monotonic() < deadline:
+                # Mostly keystrokes, with the occasional pause in typing
+                is_typing = random.random() > 0.1
+                if coalesce:
+                    await coalescer.update(layer, GROUP_NAME, username, is_typing)
+                else:
+                    await layer.group_send(GROUP_NAME, room_frame_event({
+                        'type': 'user_typing',
+                        'started': [username] if is_typing else [],
+                        'stopped': [] if is_typing else [username],
+                    }, exclude=username))
+                await asyncio.sleep(pause)
+            if coalesce:
+                await coalescer.update(layer, GROUP_NAME, username, False)
+
+        started_at = time.monotonic()
+        await asyncio.gather(*(type_for(name) for name in typists))
+        elapsed = time.monotonic() - started_at
+        if coalesce:
+            await asyncio.sleep(options['interval'] * 2)  # let the last flush go out
+
+        frames = 0
+        for name, channel in channels.items():
+            frames += await self.count_frames(layer, channel, name)
+        return frames, elapsed
+
+    async def count_frames(self, layer, channel, username):
+        """
+        Drain a member's channel, counting the frames ChatConsumer.room_frame
+        would actually send (it skips frames excluded for the receiver)
+        """
+        frames = 0
+        while True:
+            try:
+                event = await asyncio.wait_for(layer.receive(channel), 0.01)
+            except asyncio.TimeoutError:
+                return frames
+            if event['exclude'] != username:
+                frames += 1
@@ -0,0 +1,101 @@
+"""
+Management command to enforce the views' query budgets
+Run with: python manage.py check_query_budgets
+Finds every URL whose view declares a budget with @query_budget
+(virtualcafe/query_budget.py), populates the fixture dataset, requests each
+view as the fixture user and fails if any request runs more SQL queries (or
+more SQL time) than its budget. Views that go over are listed with the
+queries they repeat, which is usually the N+1. All data is rolled back.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import URLResolver, get_resolver, reverse
+
+from tracker.achievements import invalidate_catalogue
+from tracker.ingest import session_ingestor
+from virtualcafe import budget_fixtures
+from virtualcafe.query_budget import QueryLog, describe
+
+
+class Rollback(Exception):
+    """Raised to undo the fixture data once the budgets are checked"""
+
+
+def iter_budgeted_urls(patterns=None, namespace=''):
+    """Yield (url name, URLPattern) for every named URL whose view has a query budget"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from iter_budgeted_urls(pattern.url_patterns, prefix)
+        elif pattern.name and hasattr(pattern.callback, 'query_budget'):
+            yield f'{namespace}{pattern.name}', pattern
+
+
+class Command(BaseCommand):
+    help = 'Fail if any view runs more SQL than its declared query budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=40, help='Fixture users (default: 40)')
+
+    def handle(self, *args, **options):
+        over_budget = []
+        try:
+            with transaction.atomic():
+                fixtures = budget_fixtures.populate(users=options['users'])
+                client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+                client.force_login(fixtures['user'])
+
+                self.stdout.write(f'{"view":<36} {"queries":>12} {"sql ms":>14}')
+                for name, pattern in iter_budgeted_urls():
+                    budget = pattern.callback.query_budget
+                    kwargs = {key: fixtures['url_kwargs'][key] for key in pattern.pattern.converters}
+                    url = reverse(name, kwargs=kwargs)
+
+                    # Warm per-process caches first, then measure against the same data.
+                    # Write-behind work is done off the request, so it isn't counted,
+                    # but it is written before the rollback rather than by a timer later.
+                    with transaction.atomic():
+                        self.request(client, url, budget)
+                        session_ingestor.flush()
+                        transaction.set_rollback(True)
+                    with transaction.atomic():
+                        with QueryLog(connection) as log:
+                            response = self.request(client, url, budget)
+                        session_ingestor.flush()
+                        transaction.set_rollback(True)
+
+                    if response.status_code >= 400:
+                        raise CommandError(f'{budget.method} {url} returned {response.status_code}')
+
+                    problems = budget.overruns(log)
+                    time_budget = f'/{budget.time_ms}' if budget.time_ms is not None else ''
+                    self.stdout.write(
+                        f'{name:<36} {len(log):>5}/{budget.queries:<6} '
+                        f'{log.time_ms:>7.1f}{time_budget:<7}'
+                        f'{"  OVER" if problems else ""}'
+                    )
+                    if problems:
+                        over_budget.append((f'{budget.method} {url} ({name})', describe(log, problems)))
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # The fixture achievements are gone; don't leave them cached
+            invalidate_catalogue()
+
+        if over_budget:
+            for view, details in over_budget:
+                self.stderr.write(f'{view}: {details}')
+            raise CommandError(f'{len(over_budget)} views are over their query budget')
+        self.stdout.write(self.style.SUCCESS('All views are within their query budgets'))
+
+    def request(self, client, url, budget):
+        if budget.method == 'GET':
+            return client.get(url, budget.params)
+        if budget.json is not None:
+            return client.post(url, budget.json, content_type='application/json')
+        return client.post(url, budget.data or {})
@@ -0,0 +1,189 @@
+"""
+Management command to check that the hot views' queries use indexes
+Run with: python manage.py check_query_plans
+Seeds a small data set, requests each read-only hot view as a signed-in user,
+captures the SQL it runs and EXPLAINs every SELECT. Exits with an error if any
+query reads a table with a full table scan, so a dropped index or a query
+rewrite that can no longer use one is caught before it ships (run it in CI
+after migrate). The background jobs' queries are checked the same way. All
+data is rolled back.
+
+On SQLite a bare "SCAN <table>" in EXPLAIN QUERY PLAN is a full scan. On
+PostgreSQL sequential scans are disabled for the check, so a "Seq Scan"
+left in the plan means no index could serve the query.
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rooms.activity import reconcile_member_counts
+from rooms.cleanup import iter_candidate_chunks
+from rooms.expiry import ExpiryScheduler
+from rooms.history import encode_cursor as encode_message_cursor
+from rooms.listing import encode_cursor as encode_room_cursor
+from rooms.models import ChatMessage, Room, RoomMembership
+from tracker.heartbeats import close_idle_sessions
+from tracker.models import StudySchedule, StudySession, Task
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+class Rollback(Exception):
+    """Raised to undo the seeded data once the plans are checked"""
+
+
+class Command(BaseCommand):
+    help = 'Fail if any hot view query falls back to a full table scan'
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Query plan checks are not supported on {connection.vendor}')
+
+        self.verbosity = options['verbosity']
+        self.failures = []
+        try:
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                seeded = self.seed()
+                self.check_views(seeded)
+                self.check_background_jobs()
+                raise Rollback
+        except Rollback:
+            pass
+
+        if self.failures:
+            for label, table, sql in self.failures:
+                self.stderr.write(f'{label}: full scan of {table}\n    {sql}')
+            raise CommandError(f'{len(self.failures)} queries fall back to a full table scan')
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index'))
+
+    def seed(self):
+        """A user with rooms, memberships, sessions, goals, schedules and chat history"""
+        user = User.objects.create_user('plan-check', password='plan-check')
+        partner = User.objects.create_user('plan-check-partner')
+        now = timezone.now()
+
+        own_room = Room.objects.create(name='Plan check own room', created_by=user)
+        other_room = Room.objects.create(
+            name='Plan check statistics room', created_by=partner, expires_at=now + timedelta(minutes=15)
+        )
+        for room in (own_room, other_room):
+            RoomMembership.objects.create(user=user, room=room)
+            RoomMembership.objects.create(user=partner, room=room)
+
+        for owner in (user, partner):
+            StudySession.objects.create(user=owner, room=other_room, minutes=25)
+            StudySession.objects.create(user=owner, minutes=5, session_type='break')
+        Task.objects.create(user=user, title='Plan check goal')
+        StudySchedule.objects.create(
+            user=user, title='Plan check', date=now.date(),
+            start_time=now.time(), end_time=now.time()
+        )
+        message = ChatMessage.objects.create(room=other_room, user=partner, message='hello')
+
+        return {
+            'user': user,
+            'room': other_room,
+            'room_cursor': encode_room_cursor(other_room),
+            'message_cursor': encode_message_cursor(message),
+            'today': now.date().isoformat(),
+        }
+
+    def check_views(self, seeded):
+        """Request every hot view and check the queries it ran"""
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        client.force_login(seeded['user'])
+
+        # (url name, args, query string, tables allowed a full scan and why)
+        views = [
+            ('home', [], {}),
+            ('home', [], {'search': 'statistics'}),
+            ('browse_rooms', [], {}),
+            ('room_list', [], {'section': 'global', 'after': seeded['room_cursor']}),
+            ('room_list', [], {'section': 'dashboard', 'after': seeded['room_cursor']}),
+            ('search_rooms', [], {'q': 'stat'}),
+            ('room_messages', [seeded['room'].room_code], {'before': seeded['message_cursor']}),
+            ('ready_for_study', [], {}),
+            ('all_study_partners', [], {}),
+            ('tracker:progress', [], {}),
+            # Pages and ranks come from indexes; only the count of active users reads them all
+            ('tracker:leaderboard', [], {}, {'auth_user'}),
+            ('tracker:leaderboard', [], {'period': 'week'}),
+            ('tracker:get_schedules', [], {'start': seeded['today'], 'end': seeded['today']}),
+            ('solo:study_room', [], {}),
+            ('solo:get_study_stats', [], {}),
+            ('solo:study_goals', [], {}),
+            ('solo:get_tasks', [], {'completed': 'true'}),
+            ('profile', [], {}),
+            ('api_get_profile', [], {}),
+            ('notifications', [], {}),
+        ]
+        for name, args, params, *allowed in views:
+            url = reverse(name, args=args)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, params)
+            if response.status_code != 200:
+                raise CommandError(f'GET {url} returned {response.status_code}')
+            self.check_queries(f'GET {url}', queries, allowed=allowed[0] if allowed else ())
+
+    def check_background_jobs(self):
+        """Queries the expiry scheduler, cleanup, reconcile and heartbeat jobs run on a schedule"""
+        scheduler = ExpiryScheduler()  # never started, only its queries are run
+        with CaptureQueriesContext(connection) as queries:
+            scheduler.seed()
+            scheduler.resync()
+            for _ in iter_candidate_chunks(Room.objects.expired()):
+                pass
+            reconcile_member_counts()
+            close_idle_sessions()
+        self.check_queries('background jobs', queries)
+
+    def check_queries(self, label, queries, allowed=()):
+        tables = set(connection.introspection.table_names()) - set(allowed)
+        seen = set()
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'WITH')) or sql in seen:
+                continue
+            seen.add(sql)
+
+            plan = self.explain(sql)
+            if self.verbosity >= 2:
+                self.stdout.write(f'{label}: {sql}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+            for table in self.full_scans(plan):
+                # Subqueries and CTEs are scanned by design; only real tables matter
+                if table in tables:
+                    self.failures.append((label, table, sql))
+
+        if self.verbosity >= 1:
+            self.stdout.write(f'{label}: {len(seen)} queries checked')
+
+    def explain(self, sql):
+        """Plan lines for a query"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[3] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+
+    def full_scans(self, plan):
+        """Tables read with a full table scan"""
+        if connection.vendor == 'sqlite':
+            matches = (SQLITE_FULL_SCAN.match(line.strip()) for line in plan)
+        else:
+            matches = (POSTGRES_FULL_SCAN.search(line) for line in plan)
+        return [match.group(1) for match in matches if match]
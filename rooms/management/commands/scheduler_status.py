@@ -0,0 +1,32 @@
+"""
+Management command to show which worker runs the background room jobs
+Run with: python manage.py scheduler_status
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rooms.leader import get_leader_status
+from rooms.scheduler import LEASE_NAME
+
+
+class Command(BaseCommand):
+    help = 'Show the current leader for the room cleanup jobs'
+
+    def handle(self, *args, **options):
+        status = get_leader_status(LEASE_NAME)
+        if status is None:
+            self.stdout.write(f'{LEASE_NAME}: no worker has been elected yet')
+            return
+
+        if not status['is_held']:
+            self.stdout.write(self.style.WARNING(
+                f'{LEASE_NAME}: no leader (lease expired at {status["expires_at"]:%Y-%m-%d %H:%M:%S})'
+            ))
+            return
+
+        now = timezone.now()
+        self.stdout.write(
+            f'{LEASE_NAME}: led by {status["holder"]} for '
+            f'{(now - status["acquired_at"]).total_seconds():.0f}s, '
+            f'lease valid for another {(status["expires_at"] - now).total_seconds():.0f}s'
+        )
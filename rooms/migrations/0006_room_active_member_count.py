@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0005_schedulerlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='active_member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-active_member_count', '-created_at', 'expires_at'], name='rooms_room_popular_idx'),
+        ),
+    ]
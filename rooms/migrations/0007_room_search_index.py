@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:40
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Build the full-text index used by rooms.search:
+    an FTS5 table on SQLite, a generated tsvector column on PostgreSQL.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return  # rooms.search falls back to icontains
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE rooms_room_fts USING fts5("
+            "name, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        # Rank with bm25, name matches weighted 10x description matches
+        schema_editor.execute(
+            "INSERT INTO rooms_room_fts (rooms_room_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')"
+        )
+        schema_editor.execute(
+            "INSERT INTO rooms_room_fts (rowid, name, description) "
+            "SELECT id, name, description FROM rooms_room"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE rooms_room ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX rooms_room_search_idx ON rooms_room USING GIN (search_vector)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS rooms_room_fts")
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS rooms_room_search_idx")
+        schema_editor.execute("ALTER TABLE rooms_room DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0006_room_active_member_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
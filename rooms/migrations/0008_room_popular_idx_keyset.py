@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0007_room_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='room',
+            name='rooms_room_popular_idx',
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-active_member_count', '-created_at', '-id'], name='rooms_room_popular_idx'),
+        ),
+    ]
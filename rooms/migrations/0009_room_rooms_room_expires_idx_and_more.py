@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0008_room_popular_idx_keyset'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['expires_at'], name='rooms_room_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['last_activity'], name='rooms_room_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roommembership',
+            index=models.Index(fields=['room', 'is_active'], name='rooms_member_room_active_idx'),
+        ),
+    ]
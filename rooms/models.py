@@ -1,14 +1,30 @@
 """
 Rooms app models.
-Defines Room and RoomMembership models for study rooms.
+Defines Room, RoomMembership and ChatMessage models for study rooms,
+plus SchedulerLease for electing the worker that runs background jobs.
 """
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import timedelta
 import uuid
 
 
+class RoomQuerySet(models.QuerySet):
+    """
+    Expiry-aware room queries.
+    Expired rooms stay in the table until the background cleanup removes
+    them, so listings should go through live().
+    """
+    
+    def live(self):
+        """Rooms that haven't expired"""
+        return self.filter(models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=timezone.now()))
+    
+    def expired(self):
+        """Rooms past their expiry time, waiting to be cleaned up"""
+        return self.filter(expires_at__lte=timezone.now())
+
+
 class Room(models.Model):
     """
     Represents a study room where users can join, chat, and video call.
@@ -21,6 +37,9 @@ class Room(models.Model):
     last_activity = models.DateTimeField(default=timezone.now)  # Track last activity in room
     expires_at = models.DateTimeField(null=True, blank=True)  # When room will expire if empty
     is_public = models.BooleanField(default=True)  # Whether room is visible in public listing
+    active_member_count = models.PositiveIntegerField(default=0)  # Users connected right now (see rooms/activity.py)
+    
+    objects = RoomQuerySet.as_manager()
     
     def save(self, *args, **kwargs):
         
@@ -34,9 +53,9 @@ class Room(models.Model):
     
     def get_member_count(self):
         """
-        Returns the count of active members in this room
+        Returns the count of members currently connected to this room
         """
-        return self.memberships.filter(is_active=True).count()
+        return self.active_member_count
     
     def is_empty(self):
         """
@@ -54,19 +73,28 @@ class Room(models.Model):
     
     def update_activity(self):
         """
-        Update last activity time and clear expiration if room has members.
+        Update last activity time and clear expiration if room has members
+        (or start the 15 minute expiry if it is empty).
+        Buffered by rooms.activity and written in a batch shortly afterwards.
         """
-        self.last_activity = timezone.now()
-        
-        if not self.is_empty():
-            self.expires_at = None  # Clear expiration when room has members
-        else:
-            # Set expiration for 15 minutes from now if room is empty
-            self.expires_at = timezone.now() + timedelta(minutes=15)
-        self.save(update_fields=['last_activity', 'expires_at'])
+        from .activity import activity_tracker
+        activity_tracker.touch(self.id, self.room_code)
     
     class Meta:
         ordering = ['-created_at']  # Newest rooms first
+        indexes = [
+            # Public listings sorted by popularity straight from the index,
+            # id last so keyset pagination (rooms/listing.py) needs no sort
+            models.Index(
+                fields=['-active_member_count', '-created_at', '-id'],
+                condition=models.Q(is_public=True),
+                name='rooms_room_popular_idx'
+            ),
+            # Expired rooms for the cleanup pass and expiry scheduler
+            models.Index(fields=['expires_at'], name='rooms_room_expires_idx'),
+            # Recently active rooms (expiry resync, member count reconcile)
+            models.Index(fields=['last_activity'], name='rooms_room_activity_idx'),
+        ]
 
 
 class RoomMembership(models.Model):
@@ -86,4 +114,50 @@ class RoomMembership(models.Model):
         # Each user can only have one membership per room
         unique_together = ['user', 'room']
         ordering = ['-joined_at']
+        indexes = [
+            # Who is (still) a member of a room
+            models.Index(fields=['room', 'is_active'], name='rooms_member_room_active_idx'),
+        ]
+
+
 
+class ChatMessage(models.Model):
+    """
+    A chat message sent in a room, kept so people joining later can catch up.
+    Written in batches by rooms.history.ChatHistoryWriter.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='chat_messages')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
+    message = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)  # When the message was sent, not written
+    
+    def __str__(self):
+        return f"{self.user.username} in {self.room.name}: {self.message[:50]}"
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            # Backs the "latest messages in this room" keyset queries
+            models.Index(fields=['room', 'created_at'], name='rooms_chat_room_created_idx'),
+        ]
+
+
+class SchedulerLease(models.Model):
+    """
+    Time-limited lease used to elect one worker process to run background jobs.
+    The holder renews it regularly; when it stops doing so the lease expires
+    and another worker takes over (see rooms/leader.py).
+    """
+    name = models.CharField(max_length=100, unique=True)  # Which set of jobs the lease is for
+    holder = models.CharField(max_length=255, blank=True)  # "<host>:<pid>" of the current leader
+    acquired_at = models.DateTimeField(null=True, blank=True)  # When the holder became leader
+    expires_at = models.DateTimeField(default=timezone.now)  # Leader must renew before this
+    
+    def __str__(self):
+        return f"{self.name} held by {self.holder or 'nobody'}"
+    
+    def is_held(self):
+        """
+        Check if a worker currently holds the lease
+        """
+        return bool(self.holder) and self.expires_at > timezone.now()
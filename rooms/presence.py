@@ -0,0 +1,237 @@
+"""
+Room presence registry.
+Tracks which users currently have a WebSocket open in each room. Entries
+are added on connect, refreshed by client heartbeats and removed on
+disconnect; entries whose heartbeat is older than PRESENCE_TTL seconds
+are ignored, so crashed workers don't leave ghosts behind.
+
+Two stores are available (settings.PRESENCE_BACKEND):
+- 'local': an in-process dict (single worker / development)
+- 'redis': sorted sets in Redis, shared by every Daphne worker
+"""
+import threading
+import time
+
+from django.conf import settings
+
+
+def _ttl():
+    return getattr(settings, 'PRESENCE_TTL', 90)
+
+
+def is_shared():
+    """Whether presence is shared by all workers (Redis) rather than per process"""
+    return getattr(settings, 'PRESENCE_BACKEND', 'local') == 'redis'
+
+
+class LocalPresenceStore:
+    """
+    In-process presence store.
+    room_code -> {user_id: [open_connections, expires_at]}
+    """
+
+    def __init__(self):
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def _live_members(self, room_code, now):
+        """Drop expired entries and return the room's member dict"""
+        members = self._rooms.get(room_code, {})
+        expired = [user_id for user_id, (_, expires_at) in members.items() if expires_at <= now]
+        for user_id in expired:
+            del members[user_id]
+        if not members:
+            self._rooms.pop(room_code, None)
+        return members
+
+    def join(self, room_code, user_id):
+        now = time.time()
+        with self._lock:
+            members = self._live_members(room_code, now)
+            is_new = user_id not in members
+            connections = 0 if is_new else members[user_id][0]
+            self._rooms.setdefault(room_code, members)[user_id] = [connections + 1, now + _ttl()]
+            return is_new
+
+    def leave(self, room_code, user_id):
+        now = time.time()
+        with self._lock:
+            members = self._live_members(room_code, now)
+            if user_id not in members:
+                return False
+            members[user_id][0] -= 1
+            if members[user_id][0] > 0:
+                return False
+            del members[user_id]
+            if not members:
+                self._rooms.pop(room_code, None)
+            return True
+
+    def touch(self, room_code, user_id):
+        now = time.time()
+        with self._lock:
+            members = self._live_members(room_code, now)
+            entry = members.get(user_id)
+            if entry is None:
+                self._rooms.setdefault(room_code, members)[user_id] = [1, now + _ttl()]
+            else:
+                entry[1] = now + _ttl()
+
+    def counts(self, room_codes):
+        now = time.time()
+        with self._lock:
+            return {code: len(self._live_members(code, now)) for code in room_codes}
+
+    def members(self, room_codes):
+        now = time.time()
+        with self._lock:
+            return {code: set(self._live_members(code, now)) for code in room_codes}
+
+
+class RedisPresenceStore:
+    """
+    Redis-backed presence store shared by all workers.
+    presence:<room>        sorted set of user ids scored by expiry time
+    presence:<room>:conns  hash of user id -> open connection count
+    A user's first connection is decided by the sorted set alone: a user
+    whose entry expired starts counting connections from 1 again.
+    """
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _keys(room_code):
+        key = f'presence:{room_code}'
+        return key, f'{key}:conns'
+
+    def join(self, room_code, user_id):
+        now = time.time()
+        key, conns_key = self._keys(room_code)
+
+        def apply(pipe):
+            # Reads run immediately while WATCHing; the writes only if neither key changed
+            expired = pipe.zrangebyscore(key, '-inf', now)
+            score = pipe.zscore(key, user_id)
+            present = score is not None and score > now
+
+            pipe.multi()
+            if expired:
+                # Connections of workers that died without leaving: forget their counts too
+                pipe.zrem(key, *expired)
+                pipe.hdel(conns_key, *expired)
+            pipe.zadd(key, {user_id: now + _ttl()})
+            if present:
+                pipe.hincrby(conns_key, user_id, 1)
+            else:
+                pipe.hset(conns_key, user_id, 1)
+            pipe.expire(key, _ttl() * 2)
+            pipe.expire(conns_key, _ttl() * 2)
+            return not present
+
+        return self._redis.transaction(apply, key, conns_key, value_from_callable=True)
+
+    def leave(self, room_code, user_id):
+        key, conns_key = self._keys(room_code)
+
+        def apply(pipe):
+            # Like join(): a connection opened meanwhile retries this instead of being removed with us
+            remaining = int(pipe.hget(conns_key, user_id) or 0) - 1
+            listed = pipe.zscore(key, user_id) is not None
+
+            pipe.multi()
+            if remaining > 0:
+                pipe.hset(conns_key, user_id, remaining)
+                return False
+            pipe.hdel(conns_key, user_id)
+            pipe.zrem(key, user_id)
+            return listed
+
+        return self._redis.transaction(apply, key, conns_key, value_from_callable=True)
+
+    def touch(self, room_code, user_id):
+        key, conns_key = self._keys(room_code)
+        pipe = self._redis.pipeline()
+        pipe.zadd(key, {user_id: time.time() + _ttl()})
+        pipe.expire(key, _ttl() * 2)
+        pipe.expire(conns_key, _ttl() * 2)
+        pipe.execute()
+
+    def counts(self, room_codes):
+        room_codes = list(room_codes)
+        now = time.time()
+        pipe = self._redis.pipeline()
+        for code in room_codes:
+            pipe.zcount(self._keys(code)[0], now, '+inf')
+        return dict(zip(room_codes, pipe.execute()))
+
+    def members(self, room_codes):
+        room_codes = list(room_codes)
+        now = time.time()
+        pipe = self._redis.pipeline()
+        for code in room_codes:
+            pipe.zrangebyscore(self._keys(code)[0], now, '+inf')
+        return {
+            code: {int(user_id) for user_id in user_ids}
+            for code, user_ids in zip(room_codes, pipe.execute())
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the configured presence store (created on first use)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if is_shared():
+                    _store = RedisPresenceStore(settings.REDIS_URL)
+                else:
+                    _store = LocalPresenceStore()
+    return _store
+
+
+def join_room(room_code, user_id):
+    """
+    Register a new connection. Returns True if the user was not present before.
+    """
+    return get_store().join(room_code, user_id)
+
+
+def leave_room(room_code, user_id):
+    """
+    Drop a connection. Returns True if this was the user's last connection.
+    """
+    return get_store().leave(room_code, user_id)
+
+
+def heartbeat(room_code, user_id):
+    """Keep the user's presence alive for another PRESENCE_TTL seconds"""
+    get_store().touch(room_code, user_id)
+
+
+def get_member_count(room_code):
+    """Number of users currently present in a room"""
+    return get_store().counts([room_code])[room_code]
+
+
+def get_member_counts(room_codes):
+    """{room_code: present user count} for several rooms in one round trip"""
+    return get_store().counts(room_codes)
+
+
+def get_online_user_ids(room_codes):
+    """Set of user ids present in any of the given rooms"""
+    online = set()
+    for user_ids in get_store().members(room_codes).values():
+        online |= user_ids
+    return online
+
+
+def get_room_user_ids(room_code):
+    """Set of user ids present in a single room"""
+    return get_store().members([room_code])[room_code]
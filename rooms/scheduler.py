@@ -1,59 +1,129 @@
 """
 Background scheduler for automatic room cleanup.
-Runs cleanup every 5 minutes to remove inactive rooms.
+Expired rooms are deleted at their deadline by rooms.expiry; the full
+cleanup runs every ROOM_CLEANUP_RECONCILE_MINUTES as a reconciliation pass.
+Study sessions whose pages stopped sending heartbeats are closed here too
+(see tracker/heartbeats.py).
+With several workers, only the one holding the cleanup lease runs the jobs.
+Jobs that compare against room presence only run when presence is shared
+through Redis (see rooms/presence.py).
 """
+from django.conf import settings
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Name of the lease the workers compete for (see rooms/leader.py)
+LEASE_NAME = 'room-cleanup'
+
 scheduler = None
+election = None
 
 
 def start_scheduler():
     """
-    Start the background scheduler for room cleanup.
-    Only starts in production or if DEBUG is True.
+    Join the leader election for the room cleanup jobs.
+    Every web worker calls this; only the elected one runs the jobs, and
+    another takes over if it goes away.
+    """
+    global election
+    
+    # Prevent multiple elections in one process
+    if election is not None:
+        logger.info("Scheduler already running, skipping initialization")
+        return
+    
+    from rooms.leader import LeaderElection
+    
+    election = LeaderElection(LEASE_NAME, on_elected=start_jobs, on_demoted=stop_jobs)
+    election.start()
+
+
+def start_jobs():
+    """
+    Start the background jobs for room cleanup (called on becoming leader).
     Prevents multiple schedulers from starting.
     """
     global scheduler
     
     # Prevent multiple schedulers
     if scheduler is not None:
-        logger.info("Scheduler already running, skipping initialization")
         return
     
-    # Only run scheduler if not already running
     try:
-        from rooms.cleanup import run_all_cleanup
+        from rooms import presence
+        from rooms.activity import reconcile_member_counts
+        from rooms.expiry import expiry_scheduler, reconcile_rooms
+        from tracker.heartbeats import close_idle_sessions, interval as heartbeat_interval
+        
+        # Delete rooms the moment they expire
+        expiry_scheduler.start()
         
         scheduler = BackgroundScheduler()
         
-        # Add cleanup job - runs every 5 minutes
+        # Add reconciliation job - full cleanup at a low frequency
+        interval = getattr(settings, 'ROOM_CLEANUP_RECONCILE_MINUTES', 30)
         scheduler.add_job(
-            run_all_cleanup,
-            trigger=IntervalTrigger(minutes=5),
+            reconcile_rooms,
+            trigger=IntervalTrigger(minutes=interval),
             id='room_cleanup_job',
             name='Clean up inactive rooms',
             replace_existing=True,
             max_instances=1  # Prevent overlapping executions
         )
         
+        # Fix active member counters left behind by workers that died. Needs
+        # presence shared by every worker: a per-process registry only knows
+        # this process's sockets.
+        if presence.is_shared():
+            scheduler.add_job(
+                reconcile_member_counts,
+                trigger=IntervalTrigger(minutes=getattr(settings, 'ROOM_MEMBER_COUNT_RECONCILE_MINUTES', 5)),
+                id='room_member_count_job',
+                name='Reconcile room member counts',
+                replace_existing=True,
+                max_instances=1
+            )
+        
+        # Save the study sessions of pages that stopped sending heartbeats
+        scheduler.add_job(
+            close_idle_sessions,
+            trigger=IntervalTrigger(seconds=heartbeat_interval()),
+            id='study_heartbeat_job',
+            name='Close idle study sessions',
+            replace_existing=True,
+            max_instances=1
+        )
+        
         scheduler.start()
-        logger.info("Room cleanup scheduler started (runs every 5 minutes)")
+        logger.info(f"Room cleanup scheduler started (reconciles every {interval} minutes)")
         
     except Exception as e:
         logger.error(f"Failed to start room cleanup scheduler: {str(e)}")
 
 
-def stop_scheduler():
+def stop_jobs():
     """
-    Stop the background scheduler.
+    Stop the background jobs (called on losing leadership).
     """
     global scheduler
     
     if scheduler is not None:
-        scheduler.shutdown()
+        from rooms.expiry import expiry_scheduler
+        expiry_scheduler.stop()
+        scheduler.shutdown(wait=False)
         scheduler = None
         logger.info("Room cleanup scheduler stopped")
+
+
+def stop_scheduler():
+    """
+    Leave the election, stopping the jobs and handing over leadership if we had it.
+    """
+    global election
+    
+    if election is not None:
+        election.stop()
+        election = None
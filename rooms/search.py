@@ -0,0 +1,116 @@
+"""
+Full-text room search.
+Room names and descriptions are indexed so searches don't scan the whole
+rooms table with LIKE '%term%':
+- SQLite: the rooms_room_fts FTS5 table (rowid = room id), kept in sync by
+  the Room signals in rooms/signals.py and by rooms.cleanup.delete_rooms
+- PostgreSQL: a generated, GIN-indexed tsvector column (search_vector) on
+  rooms_room, which the database keeps up to date itself
+Other databases, or a SQLite build without FTS5, fall back to icontains.
+
+Every search term is matched as a prefix ("stat" finds "statistics"), all
+terms must match, and results are ranked with name matches weighted above
+description matches.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'rooms_room_fts'
+
+_fts_available = None
+
+
+def search_backend():
+    """'fts5', 'postgres' or 'icontains' for the default database"""
+    global _fts_available
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite':
+        if _fts_available is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                _fts_available = cursor.fetchone() is not None
+        if _fts_available:
+            return 'fts5'
+    return 'icontains'
+
+
+def search_terms(query):
+    """Split a search box query into words (punctuation can't break the match syntax)"""
+    return re.findall(r'\w+', query.lower())
+
+
+def search_rooms(rooms, query):
+    """
+    Filter a Room queryset down to rooms matching `query`, best matches first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return rooms.none() if query.strip() else rooms
+
+    backend = search_backend()
+    if backend == 'fts5':
+        # Join the FTS table so the MATCH drives the query and every hit is ranked
+        # in the same pass. rank is bm25() with name weighted 10x description
+        # (configured when the table is created); lower is better.
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return rooms.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = rooms_room.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+        ).order_by('search_rank', '-active_member_count', '-created_at')
+
+    if backend == 'postgres':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return rooms.alias(
+            search_match=RawSQL(
+                "rooms_room.search_vector @@ to_tsquery('simple', %s)",
+                (tsquery,), output_field=BooleanField()
+            )
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(
+                "ts_rank(rooms_room.search_vector, to_tsquery('simple', %s))",
+                (tsquery,), output_field=FloatField()
+            )
+        ).order_by('-search_rank', '-active_member_count', '-created_at')
+
+    for term in terms:
+        rooms = rooms.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return rooms
+
+
+def index_room(room):
+    """Add or refresh a room in the SQLite search index"""
+    if search_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [room.id])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+            [room.id, room.name, room.description]
+        )
+
+
+def remove_rooms(room_ids):
+    """Drop deleted rooms from the SQLite search index"""
+    if not room_ids or search_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        placeholders = ', '.join(['%s'] * len(room_ids))
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', list(room_ids))
+
+
+def rebuild_index():
+    """Re-index every room (e.g. after rooms were bulk-created without signals)"""
+    if search_backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+            f'SELECT id, name, description FROM rooms_room'
+        )
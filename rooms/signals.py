@@ -1,10 +1,12 @@
 """
 Signals for the rooms app.
-Handles automatic room expiration updates when members leave.
+Handles automatic room expiration updates when members leave,
+and keeps the room search index in sync.
 """
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import RoomMembership
+from .models import Room, RoomMembership
+from . import search
 
 
 @receiver(post_save, sender=RoomMembership)
@@ -17,14 +19,34 @@ def update_room_on_membership_change(sender, instance, created, **kwargs):
 
 
 @receiver(post_delete, sender=RoomMembership)
-def update_room_on_member_leave(sender, instance, **kwargs):
+def update_room_on_member_leave(sender, instance, origin=None, **kwargs):
     """
     Update room activity when a member leaves (membership deleted).
     Sets expiration if room becomes empty.
     """
+    # Deleted along with the room itself (origin is the deleted room or queryset)
+    if isinstance(origin, Room) or getattr(origin, 'model', None) is Room:
+        return
     if instance.room:
         try:
             instance.room.update_activity()
         except Exception:
             # Room might have been deleted
             pass
+
+
+@receiver(post_save, sender=Room)
+def index_room_for_search(sender, instance, update_fields=None, **kwargs):
+    """
+    Re-index the room's name and description when they may have changed.
+    """
+    if update_fields is None or {'name', 'description'} & set(update_fields):
+        search.index_room(instance)
+
+
+@receiver(post_delete, sender=Room)
+def remove_room_from_search(sender, instance, **kwargs):
+    """
+    Drop a deleted room from the search index.
+    """
+    search.remove_rooms([instance.id])
@@ -0,0 +1,60 @@
+"""
+Tests for the inactive room cleanup pass (rooms/cleanup.py).
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rooms.activity import activity_tracker
+from rooms.cleanup import cleanup_inactive_rooms
+from rooms.models import ChatMessage, Room, RoomMembership
+from tracker.models import StudySession
+
+
+@override_settings(PRESENCE_BACKEND='local')
+class CleanupInactiveRoomsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cleanup-owner')
+
+    def stale_room(self, name, members=0):
+        room = Room.objects.create(name=name, created_by=self.user)
+        self.make_stale(room, members)
+        return room
+
+    def make_stale(self, room, members=0):
+        stale = timezone.now() - timedelta(hours=1)
+        Room.objects.filter(id=room.id).update(created_at=stale, last_activity=stale, active_member_count=members)
+
+    def test_occupied_rooms_survive_without_shared_presence(self):
+        # Nobody is connected to this process, but another worker counted a member
+        occupied = self.stale_room('Occupied', members=1)
+        empty = self.stale_room('Empty')
+
+        stats = cleanup_inactive_rooms()
+
+        self.assertEqual(stats.deleted, 1)
+        self.assertTrue(Room.objects.filter(id=occupied.id).exists())
+        self.assertFalse(Room.objects.filter(id=empty.id).exists())
+
+    def test_related_rows_follow_their_on_delete_rules(self):
+        room = Room.objects.create(name='Empty', created_by=self.user)
+        RoomMembership.objects.create(user=self.user, room=room)
+        ChatMessage.objects.create(user=self.user, room=room, message='Hello')
+        session = StudySession.objects.create(user=self.user, room=room, minutes=25)
+        self.user.profile.favorite_rooms.add(room)
+        activity_tracker.flush()
+        self.make_stale(room)
+
+        stats = cleanup_inactive_rooms()
+
+        self.assertEqual((stats.deleted, stats.related_deleted), (1, 3))
+        self.assertFalse(RoomMembership.objects.filter(room_id=room.id).exists())
+        self.assertFalse(ChatMessage.objects.filter(room_id=room.id).exists())
+        self.assertFalse(self.user.profile.favorite_rooms.exists())
+        session.refresh_from_db()
+        self.assertIsNone(session.room_id)
+        # The memberships went with their room: no activity left to write for it
+        self.assertEqual(activity_tracker.flush(), 0)
@@ -0,0 +1,96 @@
+"""
+Tests for reading chat history (rooms/history.py and room_messages_view).
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rooms.history import _write_batch, chat_writer, get_replay
+from rooms.models import ChatMessage, Room, RoomMembership
+
+
+class RoomMessagesViewTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('history-owner')
+        self.room = Room.objects.create(name='Quiet room', created_by=self.owner, is_public=False)
+        RoomMembership.objects.create(user=self.owner, room=self.room)
+        ChatMessage.objects.create(user=self.owner, room=self.room, message='Members only')
+        self.url = reverse('room_messages', args=[self.room.room_code])
+
+    def get_as(self, username):
+        user, _ = User.objects.get_or_create(username=username)
+        self.client.force_login(user)
+        return self.client.get(self.url)
+
+    def test_members_read_the_history(self):
+        response = self.get_as('history-owner')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message['message'] for message in response.json()['messages']], ['Members only'])
+
+    def test_non_members_are_refused(self):
+        response = self.get_as('passer-by')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('messages', response.json())
+
+    def test_expired_rooms_are_not_found(self):
+        Room.objects.filter(id=self.room.id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.get_as('history-owner').status_code, 404)
+
+
+class WriteBatchTests(TestCase):
+
+    def test_messages_of_deleted_users_and_rooms_are_skipped(self):
+        sender = User.objects.create_user('sender')
+        gone = User.objects.create_user('gone')
+        room = Room.objects.create(name='Kept', created_by=sender)
+        deleted_room = Room.objects.create(name='Deleted', created_by=sender)
+        now = timezone.now()
+        batch = [
+            ChatMessage(room_id=room.id, user_id=sender.id, message='kept', created_at=now),
+            ChatMessage(room_id=room.id, user_id=gone.id, message='from a deleted user', created_at=now),
+            ChatMessage(room_id=deleted_room.id, user_id=sender.id, message='to a deleted room', created_at=now),
+        ]
+        gone.delete()
+        deleted_room.delete()
+
+        _write_batch(batch)
+
+        self.assertEqual(list(ChatMessage.objects.values_list('message', flat=True)), ['kept'])
+
+
+class ReplayTests(TransactionTestCase):
+    """The replay reads the database from the worker pool, so the rows are committed"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('replayer')
+        self.room = Room.objects.create(name='Replayed', created_by=self.user)
+        self.addCleanup(setattr, chat_writer, '_writing', [])
+        self.addCleanup(setattr, chat_writer, '_buffer', [])
+
+    def message(self, text, created_at):
+        return ChatMessage(room_id=self.room.id, user=self.user, message=text, created_at=created_at)
+
+    async def test_message_being_written_is_replayed_once(self):
+        sent_at = timezone.now()
+        await ChatMessage.objects.acreate(room=self.room, user=self.user, message='in flight', created_at=sent_at)
+        # The batch is committed but its instances haven't left the writer yet (and have no pk)
+        chat_writer._writing = [self.message('in flight', sent_at)]
+
+        messages, _ = await get_replay(self.room.id)
+
+        self.assertEqual([message['message'] for message in messages], ['in flight'])
+
+    async def test_messages_sent_after_joining_are_left_to_the_live_stream(self):
+        joined_at = timezone.now()
+        chat_writer._buffer = [
+            self.message('before joining', joined_at - timedelta(seconds=1)),
+            self.message('after joining', joined_at + timedelta(seconds=1)),
+        ]
+
+        messages, _ = await get_replay(self.room.id, until=joined_at)
+
+        self.assertEqual([message['message'] for message in messages], ['before joining'])
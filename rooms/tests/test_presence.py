@@ -0,0 +1,73 @@
+"""
+Tests for the Redis presence store (rooms/presence.py), run against fakeredis
+(requirements-dev.txt).
+"""
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from rooms.presence import RedisPresenceStore
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+ROOM = 'ABC123'
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis is not installed')
+class RedisPresenceStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        # Two workers, each with its own connection to the same Redis
+        self.first, self.second = self.worker(server), self.worker(server)
+
+    @staticmethod
+    def worker(server):
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis(server=server)):
+            return RedisPresenceStore('redis://presence-test')
+
+    def race(self, store, interleaved):
+        """Run `interleaved` once between store's next transaction's reads and its writes"""
+        transaction = store._redis.transaction
+        pending = [interleaved]
+
+        def racing_transaction(func, *keys, **kwargs):
+            def apply(pipe):
+                result = func(pipe)
+                if pending:
+                    pending.pop()()
+                return result
+            return transaction(apply, *keys, **kwargs)
+
+        store._redis.transaction = racing_transaction
+
+    def test_connections_are_counted_across_workers(self):
+        self.assertTrue(self.first.join(ROOM, 1))
+        self.assertFalse(self.second.join(ROOM, 1))
+
+        self.assertFalse(self.first.leave(ROOM, 1))
+        self.assertEqual(self.second.members([ROOM]), {ROOM: {1}})
+        self.assertTrue(self.second.leave(ROOM, 1))
+        self.assertEqual(self.first.counts([ROOM]), {ROOM: 0})
+
+    def test_join_during_a_leave_keeps_the_member(self):
+        self.first.join(ROOM, 1)
+        # The user's last socket closes on one worker while a new one opens on another
+        self.race(self.first, lambda: self.second.join(ROOM, 1))
+
+        self.assertFalse(self.first.leave(ROOM, 1))
+        self.assertEqual(self.first.members([ROOM]), {ROOM: {1}})
+        self.assertTrue(self.second.leave(ROOM, 1))
+
+    def test_leave_during_a_join_is_not_lost(self):
+        self.first.join(ROOM, 1)
+        self.race(self.second, lambda: self.first.leave(ROOM, 1))
+
+        # The other socket left first, so this is the user's first connection again
+        self.assertTrue(self.second.join(ROOM, 1))
+        self.assertTrue(self.second.leave(ROOM, 1))
+        self.assertEqual(self.first.counts([ROOM]), {ROOM: 0})
@@ -0,0 +1,135 @@
+"""
+Tests for electing the worker that runs the background jobs
+(rooms/leader.py) and for which processes take part (rooms/apps.py).
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from rooms.apps import serves_requests
+from rooms.leader import LeaderElection, get_leader_status
+
+LEASE_TTL = 30
+
+
+class Worker:
+    """
+    One worker process taking part in the election, as its election thread
+    would drive it, counting how often it runs the jobs.
+    """
+
+    def __init__(self, identity):
+        self.election = LeaderElection(
+            'test-jobs', on_elected=self.start_jobs, on_demoted=self.stop_jobs, ttl=LEASE_TTL
+        )
+        self.election.identity = identity
+        self.running = False
+        self.elected = 0
+        self.job_runs = 0
+
+    def start_jobs(self):
+        self.running = True
+        self.elected += 1
+
+    def stop_jobs(self):
+        self.running = False
+
+    def tick(self):
+        """One pass of the election loop, then the jobs if we lead"""
+        self.election._set_leader(self.election.try_acquire())
+        if self.running:
+            self.job_runs += 1
+
+
+class LeaderElectionTests(TestCase):
+    """Two workers competing for one lease on the shared database"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        patcher = mock.patch('django.utils.timezone.now', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.first = Worker('host-a:1')
+        self.second = Worker('host-b:2')
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+    def test_one_worker_runs_the_jobs(self):
+        for _ in range(10):
+            self.first.tick()
+            self.second.tick()
+            self.advance(LEASE_TTL / 3)
+
+        self.assertTrue(self.first.running)
+        self.assertFalse(self.second.running)
+        self.assertEqual((self.first.elected, self.second.elected), (1, 0))
+        self.assertEqual((self.first.job_runs, self.second.job_runs), (10, 0))
+
+    def test_lease_is_taken_over_when_the_leader_stops_renewing(self):
+        self.first.tick()
+        self.second.tick()
+        self.assertTrue(self.first.running)
+
+        # The leader hangs: nothing renews the lease, but it hasn't run out yet
+        self.advance(LEASE_TTL - 1)
+        self.second.tick()
+        self.assertFalse(self.second.running)
+
+        self.advance(1)
+        self.second.tick()
+        self.assertTrue(self.second.running)
+        self.assertEqual(get_leader_status('test-jobs')['holder'], 'host-b:2')
+
+        # The old leader comes back and finds it lost the lease
+        self.first.tick()
+        self.assertFalse(self.first.running)
+        self.assertTrue(self.second.running)
+
+    def test_jobs_run_once_per_round_across_a_handover(self):
+        workers = [self.first, self.second]
+        runs_per_round = []
+        for round_number in range(12):
+            if round_number == 4:
+                workers.remove(self.first)  # the leader's process dies
+            before = sum(worker.job_runs for worker in (self.first, self.second))
+            for worker in workers:
+                worker.tick()
+            runs_per_round.append(sum(worker.job_runs for worker in (self.first, self.second)) - before)
+            self.advance(LEASE_TTL / 3)
+
+        # Nobody runs the jobs while the dead leader's lease runs out, and never two workers at once
+        self.assertEqual(runs_per_round, [1, 1, 1, 1, 0, 0, 1, 1, 1, 1, 1, 1])
+        self.assertEqual((self.first.elected, self.second.elected), (1, 1))
+
+    def test_released_lease_is_taken_immediately(self):
+        self.first.tick()
+        self.first.election.release()
+        self.second.tick()
+        self.assertTrue(self.second.running)
+
+
+class ServesRequestsTests(SimpleTestCase):
+    """Only the process serving requests joins the election"""
+
+    def check(self, argv, run_main=None):
+        environ = {'RUN_MAIN': run_main} if run_main else {}
+        with mock.patch('sys.argv', argv), mock.patch.dict('os.environ', environ, clear=True):
+            return serves_requests()
+
+    def test_runserver_autoreloader_parent_does_not_serve(self):
+        self.assertFalse(self.check(['manage.py', 'runserver']))
+
+    def test_runserver_child_serves(self):
+        self.assertTrue(self.check(['manage.py', 'runserver'], run_main='true'))
+
+    def test_runserver_without_reloader_serves(self):
+        self.assertTrue(self.check(['manage.py', 'runserver', '--noreload']))
+
+    def test_daphne_serves(self):
+        self.assertTrue(self.check(['/usr/bin/daphne', 'virtualcafe.asgi:application']))
+
+    def test_management_commands_do_not_serve(self):
+        self.assertFalse(self.check(['manage.py', 'migrate']))
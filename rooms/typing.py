@@ -0,0 +1,118 @@
+"""
+Typing indicator coalescing.
+Keystroke-level typing events are collected per room and flushed as at
+most one "who started/stopped typing" broadcast per interval, instead of
+one group_send per event. Redundant transitions (typing -> typing, or a
+start and stop within the same interval) are dropped, and users who stop
+sending typing events are expired automatically.
+
+Each worker process coalesces the events of its own connections; frames
+carry deltas (started/stopped) so receivers can merge frames from
+several workers. A frame may list the receiving user too, which clients
+should ignore.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+
+from .frames import room_frame_event
+
+
+class TypingCoalescer:
+    """
+    Per-process typing state for every room group.
+    """
+
+    def __init__(self, interval=None, idle_timeout=None):
+        self.interval = interval if interval is not None else getattr(
+            settings, 'TYPING_COALESCE_INTERVAL', 0.5
+        )
+        self.idle_timeout = idle_timeout if idle_timeout is not None else getattr(
+            settings, 'TYPING_IDLE_TIMEOUT', 5.0
+        )
+        self._typing = {}    # group -> {username: last typing event time} (as last broadcast)
+        self._pending = {}   # group -> {username: is_typing} since the last flush
+        self._flushes = {}   # group -> (scheduled flush task, due time)
+
+    async def update(self, channel_layer, group, username, is_typing):
+        """
+        Record a typing event; the broadcast happens on the next flush
+        """
+        typing = self._typing.setdefault(group, {})
+        pending = self._pending.setdefault(group, {})
+
+        if is_typing and username in typing:
+            typing[username] = time.monotonic()
+
+        if username not in pending and (username in typing) == is_typing:
+            # Same state as last broadcast - nothing to send
+            return
+
+        if self.interval <= 0:
+            # Coalescing disabled: broadcast every transition straight away
+            pending[username] = is_typing
+            await self.flush(channel_layer, group)
+            return
+
+        pending[username] = is_typing
+        self._schedule(channel_layer, group, self.interval)
+
+    def _schedule(self, channel_layer, group, delay):
+        """Make sure a flush for the group happens within `delay` seconds"""
+        due = time.monotonic() + delay
+        scheduled = self._flushes.get(group)
+        if scheduled is not None:
+            task, scheduled_due = scheduled
+            if scheduled_due <= due:
+                return
+            task.cancel()  # e.g. an idle check further out than the next interval
+        task = asyncio.ensure_future(self._flush_later(channel_layer, group, delay))
+        self._flushes[group] = (task, due)
+
+    async def _flush_later(self, channel_layer, group, delay):
+        await asyncio.sleep(delay)
+        del self._flushes[group]
+        await self.flush(channel_layer, group)
+
+    async def flush(self, channel_layer, group):
+        """
+        Broadcast the net typing changes for a group since the last flush
+        """
+        now = time.monotonic()
+        typing = self._typing.setdefault(group, {})
+        pending = self._pending.pop(group, {})
+
+        started, stopped = [], []
+        for username, is_typing in pending.items():
+            if is_typing:
+                if username not in typing:
+                    started.append(username)
+                typing[username] = now
+            elif typing.pop(username, None) is not None:
+                stopped.append(username)
+
+        # Expire users who went quiet without sending is_typing=False
+        for username, last_seen in list(typing.items()):
+            if now - last_seen >= self.idle_timeout:
+                del typing[username]
+                stopped.append(username)
+
+        if typing:
+            # Check again later so idle typists get expired
+            self._schedule(channel_layer, group, self.idle_timeout)
+        else:
+            self._typing.pop(group, None)
+
+        if started or stopped:
+            names = set(started) | set(stopped)
+            # A frame that only concerns one user isn't sent back to them
+            exclude = next(iter(names)) if len(names) == 1 else None
+            await channel_layer.group_send(group, room_frame_event({
+                'type': 'user_typing',
+                'started': started,
+                'stopped': stopped,
+            }, exclude))
+
+
+typing_coalescer = TypingCoalescer()
@@ -5,13 +5,26 @@ Handles room listing, creation, and detail pages.
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Q, Count
-from django.utils import timezone
+from django.db.models import Q
+from asgiref.sync import sync_to_async
 from datetime import timedelta
 from .models import Room, RoomMembership
+from . import presence
+from .listing import ROOM_ORDERING, paginate_rooms, paginate_ranked_rooms, serialize_room
+from .search import search_rooms
+from tracker import heartbeats
+from virtualcafe.async_views import aget_object_or_404, aget_user, async_login_required, run_in_pool
+from virtualcafe.query_budget import query_budget
 import json
 
+# Results per page of the room search endpoint
+ROOM_SEARCH_PAGE_SIZE = 20
+
+# Listings served by room_list_view
+ROOM_LIST_SECTIONS = ('dashboard', 'global', 'mine')
+
 
 def landing_view(request):
     """
@@ -25,75 +38,40 @@ def landing_view(request):
     return render(request, 'landing.html')
 
 
+@query_budget(queries=8, time_ms=50)
 @login_required
 def home_view(request):
     """
     Home dashboard showing rooms created by the current user.
     Users must be logged in to see this page.
     """
-    from tracker.models import StudySession
-    from django.db.models import Sum
-    from datetime import datetime, timedelta
+    from tracker.rollups import get_daily_totals, local_date
     
-    # Clean up expired rooms
-    expired_rooms = Room.objects.filter(
-        expires_at__lte=timezone.now()
-    )
-    expired_count = expired_rooms.count()
-    if expired_count > 0:
-        expired_rooms.delete()
-        messages.info(request, f'{expired_count} empty room(s) expired and removed.')
-    
-    # Get rooms that meet any of these criteria:
+    # Get live (not expired) rooms that meet any of these criteria:
     # 1. Created by current user
     # 2. User is a member of (joined)
-    rooms = Room.objects.filter(
-        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
-    ).filter(
-        Q(created_by=request.user) |  # Rooms created by user
-        Q(memberships__user=request.user)  # Rooms user has joined
-    ).distinct()
-    
+    # Expired rooms are removed by the background cleanup (rooms/cleanup.py)
     # Get search query from GET parameters
     search_query = request.GET.get('search', '').strip()
     
-    # Apply search filter if provided
-    if search_query:
-        # Search in room name and description
-        rooms = rooms.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
-    
-    # Annotate with member count for display and order by popularity
-    rooms = rooms.annotate(
-        member_count=Count('memberships', filter=Q(memberships__is_active=True))
-    ).select_related('created_by').order_by('-member_count', '-created_at')
+    # Only the first page is rendered; room_list_view serves the rest
+    rooms, rooms_next = _paginate_listing(
+        _listing_rooms(request, 'dashboard'), search_query
+    )
     
     # Get rooms the current user is a member of
     user_rooms = Room.objects.filter(
         memberships__user=request.user, 
         memberships__is_active=True
-    ).annotate(
-        member_count=Count('memberships', filter=Q(memberships__is_active=True))
     ).select_related('created_by')
     
-    # Get active study sessions (users who studied in the last 24 hours)
-    today = timezone.now()
-    yesterday = today - timedelta(days=1)
-    
-    # Get recent study sessions grouped by user (removed - not displayed)
-    # active_sessions = []
-    
-    # Get current user's weekly statistics
-    week_ago = today - timedelta(days=7)
-    user_week_sessions = StudySession.objects.filter(
-        user=request.user,
-        created_at__gte=week_ago
-    )
+    # Get current user's weekly statistics from the daily rollups (one range scan)
+    today = local_date(request.user)
+    week_start = today - timedelta(days=6)
+    daily_totals = get_daily_totals(request.user, week_start, today)
     
     # Calculate weekly total
-    week_total = user_week_sessions.aggregate(total=Sum('minutes'))['total'] or 0
+    week_total = sum(rollup.total_minutes for rollup in daily_totals.values())
     
     # Calculate completion percentage (40 hours = 2400 minutes = 100%)
     weekly_goal = 2400  # 40 hours in minutes
@@ -102,15 +80,9 @@ def home_view(request):
     # Get daily breakdown for the last 7 days
     daily_stats = []
     for i in range(7):
-        day = today - timedelta(days=6-i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        day_sessions = user_week_sessions.filter(
-            created_at__gte=day_start,
-            created_at__lt=day_end
-        )
-        day_total = day_sessions.aggregate(total=Sum('minutes'))['total'] or 0
+        day = week_start + timedelta(days=i)
+        rollup = daily_totals.get(day)
+        day_total = rollup.total_minutes if rollup else 0
         
         daily_stats.append({
             'day': day.strftime('%a'),  # Mon, Tue, etc.
@@ -132,6 +104,7 @@ def home_view(request):
     
     context = {
         'rooms': rooms,
+        'rooms_next': rooms_next,
         'user_rooms': user_rooms,
         'search_query': search_query,
         'week_total_minutes': week_total,
@@ -143,71 +116,57 @@ def home_view(request):
     return render(request, 'rooms/home.html', context)
 
 
+@query_budget(queries=7, time_ms=50)
 @login_required
 def browse_rooms_view(request):
     """
     Browse all available study rooms.
     Shows global rooms (all public rooms) and rooms created by the user in separate sections.
     """
-    # Clean up expired rooms
-    expired_rooms = Room.objects.filter(
-        expires_at__lte=timezone.now()
-    )
-    expired_count = expired_rooms.count()
-    if expired_count > 0:
-        expired_rooms.delete()
-    
-    # Base queryset for public rooms
-    base_query = Room.objects.filter(
-        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
-        is_public=True
-    ).annotate(
-        member_count=Count('memberships', filter=Q(memberships__is_active=True))
-    ).select_related('created_by')
-    
     # Get search query
     search_query = request.GET.get('search', '').strip()
-    if search_query:
-        base_query = base_query.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
     
-    # Separate global rooms from user-created rooms
+    # Separate global rooms from user-created rooms, first page of each;
+    # the page scrolls further through room_list_view
     # Global rooms: all public rooms created by other users
-    global_rooms = base_query.exclude(created_by=request.user).order_by('-member_count', '-created_at')
+    global_rooms, global_next = _paginate_listing(
+        _listing_rooms(request, 'global'), search_query
+    )
     # User rooms: rooms created by current user
-    user_rooms = base_query.filter(created_by=request.user).order_by('-member_count', '-created_at')
+    user_rooms, user_next = _paginate_listing(
+        _listing_rooms(request, 'mine'), search_query
+    )
     
     context = {
         'global_rooms': global_rooms,
+        'global_next': global_next,
         'user_rooms': user_rooms,
+        'user_next': user_next,
         'search_query': search_query,
     }
     return render(request, 'rooms/browse_rooms.html', context)
 
 
+@query_budget(queries=6, time_ms=50)
 @login_required
 def ready_for_study_view(request):
     """
     View all users who are online and ready for study.
     Shows users who share rooms with the current user and are currently online.
     """
-    # Find users who share rooms with the current user
-    user_room_ids = RoomMembership.objects.filter(
+    # Find rooms the current user is a member of
+    user_room_codes = RoomMembership.objects.filter(
         user=request.user,
         is_active=True
-    ).values_list('room_id', flat=True)
+    ).values_list('room__room_code', flat=True)
     
-    # Consider users online if they've been active in the last 10 minutes
-    time_threshold = timezone.now() - timedelta(minutes=10)
+    # Users are online if they're connected to one of those rooms right now
+    online_user_ids = presence.get_online_user_ids(user_room_codes)
+    online_user_ids.discard(request.user.id)
     
-    # Get all study partners (users in same rooms) who are currently online
     study_partners = User.objects.filter(
-        room_memberships__room_id__in=user_room_ids,
-        room_memberships__is_active=True,
-        last_login__gte=time_threshold  # Only show users active in last 10 minutes
-    ).exclude(id=request.user.id).distinct().select_related('profile')
+        id__in=online_user_ids
+    ).select_related('profile')
     
     # Get search query if provided
     search_query = request.GET.get('search', '').strip()
@@ -225,6 +184,7 @@ def ready_for_study_view(request):
     return render(request, 'rooms/ready_for_study.html', context)
 
 
+@query_budget(queries=6, time_ms=50)
 @login_required
 def all_study_partners_view(request):
     """
@@ -266,6 +226,7 @@ def all_study_partners_view(request):
     return render(request, 'rooms/all_study_partners.html', context)
 
 
+@query_budget(queries=5, time_ms=50)
 @login_required
 def create_room_view(request):
     """
@@ -306,6 +267,16 @@ def create_room_view(request):
     return render(request, 'rooms/create_room.html')
 
 
+def expired_room_redirect(request):
+    """
+    Response for a direct link to a room that has expired but hasn't been
+    cleaned up yet: treat it as gone without deleting it in the request.
+    """
+    messages.error(request, 'This room has expired due to inactivity.')
+    return redirect('home')
+
+
+@query_budget(queries=5, time_ms=50)
 @login_required
 def join_room_by_code_view(request, room_code=None):
     """
@@ -321,11 +292,9 @@ def join_room_by_code_view(request, room_code=None):
         try:
             room = Room.objects.get(room_code=room_code)
             
-            # Check if room has expired
+            # Expired rooms are kept until the background cleanup deletes them
             if room.is_expired():
-                room.delete()
-                messages.error(request, 'This room has expired due to inactivity.')
-                return redirect('home')
+                return expired_room_redirect(request)
             
             # Redirect to room detail (which handles membership creation)
             messages.success(request, f'Joining room "{room.name}"...')
@@ -348,11 +317,9 @@ def join_room_by_code_view(request, room_code=None):
         try:
             room = Room.objects.get(room_code=room_code)
             
-            # Check if room has expired
+            # Expired rooms are kept until the background cleanup deletes them
             if room.is_expired():
-                room.delete()
-                messages.error(request, 'This room has expired due to inactivity.')
-                return redirect('home')
+                return expired_room_redirect(request)
             
             # Redirect to room detail (which handles membership creation)
             messages.success(request, f'Joining room "{room.name}"...')
@@ -366,68 +333,77 @@ def join_room_by_code_view(request, room_code=None):
     return redirect('home')
 
 
-@login_required
-def room_detail_view(request, room_code):
+@query_budget(queries=10, time_ms=50)
+@async_login_required
+async def room_detail_view(request, room_code):
     """
     Room detail page with chat, video call, timer, and members list.
     This is the main study room interface.
     Checks room capacity and permissions before allowing entry.
+    An async view: the queries go through the async ORM and the template
+    only gets already-loaded data to render.
     """
+    user = await aget_user(request)
+    
     # Get the room or return 404 if not found
-    room = get_object_or_404(Room, room_code=room_code)
+    room = await aget_object_or_404(Room.objects.select_related('created_by'), room_code=room_code)
     
-    # Check if room has expired
+    # Expired rooms are kept until the background cleanup deletes them
     if room.is_expired():
-        room.delete()
-        messages.error(request, 'This room has expired due to inactivity.')
-        return redirect('home')
+        return await sync_to_async(expired_room_redirect)(request)
     
     # Check if user is already a member
-    existing_membership = RoomMembership.objects.filter(
-        user=request.user,
+    existing_membership = await RoomMembership.objects.filter(
+        user=user,
         room=room
-    ).first()
+    ).afirst()
     
     # If already a member, reactivate if needed
     if existing_membership:
         if not existing_membership.is_active:
             existing_membership.is_active = True
-            existing_membership.save()
+            await existing_membership.asave()
     else:
         # Create new membership
-        RoomMembership.objects.create(
-            user=request.user,
+        await RoomMembership.objects.acreate(
+            user=user,
             room=room,
             is_active=True
         )
         
         # Create notification for room owner (if not the owner joining)
-        if room.created_by != request.user:
+        if room.created_by != user:
             from notifications.models import Notification
-            Notification.create_new_member_notification(
+            await sync_to_async(Notification.create_new_member_notification)(
                 room_owner=room.created_by,
-                new_member=request.user,
+                new_member=user,
                 room=room
             )
     
     # Update room activity (clears expiration since user just joined)
-    room.update_activity()
+    await sync_to_async(room.update_activity)()
     
-    # Get all active members in the room
-    active_members = RoomMembership.objects.filter(
-        room=room,
-        is_active=True
-    ).select_related('user')
+    # Get all members currently connected to the room (plus the user who is joining now)
+    present_user_ids = await run_in_pool(presence.get_room_user_ids)(room.room_code)
+    present_user_ids.add(user.id)
+    active_members = [
+        membership async for membership in RoomMembership.objects.filter(
+            room=room,
+            user_id__in=present_user_ids
+        ).select_related('user')
+    ]
     
     context = {
         'room': room,
         'active_members': active_members,
-        'members_count': active_members.count(),
-        'is_owner': room.created_by == request.user,
+        'members_count': len(active_members),
+        'is_owner': room.created_by == user,
+        'heartbeat_interval': heartbeats.interval(),
     }
-    return render(request, 'rooms/room_detail.html', context)
+    return await sync_to_async(render)(request, 'rooms/room_detail.html', context)
 
 
+@query_budget(queries=14, time_ms=100, method='POST')
 @login_required
 def delete_room_view(request, room_code):
     """
@@ -457,3 +433,142 @@ def delete_room_view(request, room_code):
         'success': True,
         'message': f'Room "{room_name}" has been deleted successfully.'
     })
+
+
+@query_budget(queries=6, time_ms=50)
+@login_required
+def room_messages_view(request, room_code):
+    """
+    Older chat history for a room, newest page first.
+    Pass the `before` cursor from the previous response (or the chat_history
+    WebSocket frame) to page further back. Returns JSON.
+    Only members of a room that hasn't expired can read it, as on the room page.
+    """
+    from django.http import JsonResponse
+    from .history import get_recent_messages, serialize_message
+    
+    room = get_object_or_404(Room.objects.live(), room_code=room_code)
+    
+    # room_detail_view makes everyone who enters the room a member
+    if not RoomMembership.objects.filter(user=request.user, room=room).exists():
+        return JsonResponse({
+            'success': False,
+            'error': 'Join this room to read its messages.'
+        }, status=403)
+    
+    try:
+        limit = min(int(request.GET.get('limit', settings.CHAT_HISTORY_PAGE_SIZE)), 100)
+        chat_messages, cursor = get_recent_messages(
+            room.id,
+            before=request.GET.get('before'),
+            limit=max(limit, 1)
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor or limit'}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'messages': [serialize_message(message) for message in chat_messages],
+        'before': cursor,
+    })
+
+
+@query_budget(queries=5, time_ms=50, params={'q': 'study'})
+@login_required
+def search_rooms_view(request):
+    """
+    Full-text search over the rooms the user can browse (public rooms and
+    their own), best matches first. Paginated with ?page=N. Returns JSON.
+    """
+    from django.http import JsonResponse
+    
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid page'}, status=400)
+    
+    if not query:
+        return JsonResponse({'success': False, 'error': 'Search query required'}, status=400)
+    
+    rooms = Room.objects.live().filter(
+        Q(is_public=True) | Q(created_by=request.user)
+    ).select_related('created_by')
+    
+    # Fetch one extra row to know whether there is a next page
+    offset = (page - 1) * ROOM_SEARCH_PAGE_SIZE
+    results = list(search_rooms(rooms, query)[offset:offset + ROOM_SEARCH_PAGE_SIZE + 1])
+    has_next = len(results) > ROOM_SEARCH_PAGE_SIZE
+    
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'page': page,
+        'has_next': has_next,
+        'results': [serialize_room(room) for room in results[:ROOM_SEARCH_PAGE_SIZE]],
+    })
+
+
+def _listing_rooms(request, section):
+    """
+    Unordered queryset behind a room listing:
+    'dashboard' - live rooms the user created or joined (home page)
+    'global' - live public rooms created by other users (browse page)
+    'mine' - live public rooms created by the user (browse page)
+    """
+    if section == 'dashboard':
+        # A subquery rather than a join, so both branches can use an index and no DISTINCT is needed
+        joined_room_ids = RoomMembership.objects.filter(user=request.user).values('room_id')
+        rooms = Room.objects.live().filter(
+            Q(created_by=request.user) |  # Rooms created by user
+            Q(id__in=joined_room_ids)  # Rooms user has joined
+        )
+    elif section == 'global':
+        rooms = Room.objects.live().filter(is_public=True).exclude(created_by=request.user)
+    else:
+        rooms = Room.objects.live().filter(is_public=True, created_by=request.user)
+    return rooms.select_related('created_by')
+
+
+def _paginate_listing(rooms, search_query, after=None):
+    """
+    One page of a listing, most popular first (keyset paginated on the
+    rooms_room_popular_idx order), or best matches first when searching.
+    Returns (rooms, cursor for the next page or None).
+    """
+    if search_query:
+        # Full-text index on name and description; ties keep the popularity order
+        ranked = search_rooms(rooms.order_by(*ROOM_ORDERING), search_query)
+        return paginate_ranked_rooms(ranked, after)
+    return paginate_rooms(rooms, after)
+
+
+@query_budget(queries=5, time_ms=50, params={'section': 'global'})
+@login_required
+def room_list_view(request):
+    """
+    Next page of a room listing for infinite scroll on the dashboard and
+    browse pages. Pass ?section=dashboard|global|mine, the page's ?search=
+    and the `next` cursor from the previous page as ?after=. Returns JSON.
+    """
+    from django.http import JsonResponse
+    
+    section = request.GET.get('section', 'global')
+    if section not in ROOM_LIST_SECTIONS:
+        return JsonResponse({'success': False, 'error': 'Unknown section'}, status=400)
+    
+    search_query = request.GET.get('search', '').strip()
+    try:
+        rooms, cursor = _paginate_listing(
+            _listing_rooms(request, section),
+            search_query,
+            after=request.GET.get('after')
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'rooms': [serialize_room(room) for room in rooms],
+        'next': cursor,
+    })
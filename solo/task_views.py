@@ -2,17 +2,20 @@
 """
 Task/Goals API Views
 Simple CRUD operations for tasks
+The JSON APIs are async views on the async ORM (see virtualcafe/async_views.py).
 """
-from django.shortcuts import get_object_or_404, render
+from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST, require_http_methods
 from django.utils import timezone
 import json
 
 from tracker.models import Task
+from virtualcafe.async_views import aget_object_or_404, aget_user, async_login_required, async_require_POST
+from virtualcafe.query_budget import query_budget
 
 
+@query_budget(queries=6, time_ms=50)
 @login_required
 def study_goals_page(request):
     """
@@ -22,9 +25,10 @@ def study_goals_page(request):
     return render(request, 'tracker/study_goals.html', {'goals': goals})
 
 
-@login_required
-@require_POST
-def create_task(request):
+@query_budget(queries=5, time_ms=50, method='POST', json={'title': 'Read chapter 3'})
+@async_login_required
+@async_require_POST
+async def create_task(request):
     """
     Create a new task/goal
     """
@@ -36,8 +40,8 @@ def create_task(request):
             return JsonResponse({'success': False, 'error': 'Title is required'}, status=400)
         
         # Create task
-        task = Task.objects.create(
-            user=request.user,
+        task = await Task.objects.acreate(
+            user=await aget_user(request),
             title=title,
             notes=data.get('notes', ''),
             priority=data.get('priority', 'medium'),
@@ -60,14 +64,15 @@ def create_task(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@login_required
-@require_POST
-def update_task(request, task_id):
+@query_budget(queries=6, time_ms=50, method='POST', json={'title': 'Read chapter 4'})
+@async_login_required
+@async_require_POST
+async def update_task(request, task_id):
     """
     Update an existing task
     """
     try:
-        task = get_object_or_404(Task, id=task_id, user=request.user)
+        task = await aget_object_or_404(Task.objects, id=task_id, user=await aget_user(request))
         data = json.loads(request.body)
         
         # Update fields if provided
@@ -80,7 +85,7 @@ def update_task(request, task_id):
         if 'due_date' in data:
             task.due_date = data['due_date']
         
-        task.save()
+        await task.asave()
         
         return JsonResponse({
             'success': True,
@@ -98,14 +103,15 @@ def update_task(request, task_id):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@login_required
-@require_POST
-def toggle_task(request, task_id):
+@query_budget(queries=7, time_ms=50, method='POST')
+@async_login_required
+@async_require_POST
+async def toggle_task(request, task_id):
     """
     Mark task as complete or incomplete (toggle)
     """
     try:
-        task = get_object_or_404(Task, id=task_id, user=request.user)
+        task = await aget_object_or_404(Task.objects, id=task_id, user=await aget_user(request))
         
         if task.completed:
             # Mark as incomplete
@@ -113,9 +119,10 @@ def toggle_task(request, task_id):
             task.completed_at = None
         else:
             # Mark as complete
-            task.mark_complete()
+            task.completed = True
+            task.completed_at = timezone.now()
         
-        task.save()
+        await task.asave()
         
         return JsonResponse({
             'success': True,
@@ -126,15 +133,16 @@ def toggle_task(request, task_id):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@login_required
-@require_POST
-def delete_task(request, task_id):
+@query_budget(queries=7, time_ms=50, method='POST')
+@async_login_required
+@async_require_POST
+async def delete_task(request, task_id):
     """
     Delete a task
     """
     try:
-        task = get_object_or_404(Task, id=task_id, user=request.user)
-        task.delete()
+        task = await aget_object_or_404(Task.objects, id=task_id, user=await aget_user(request))
+        await task.adelete()
         
         return JsonResponse({'success': True})
     
@@ -142,8 +150,9 @@ def delete_task(request, task_id):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@login_required
-def get_tasks(request):
+@query_budget(queries=5, time_ms=50)
+@async_login_required
+async def get_tasks(request):
     """
     Get all user's tasks (both active and completed)
     """
@@ -151,10 +160,9 @@ def get_tasks(request):
         # Get completed parameter (show completed tasks or not)
         show_completed = request.GET.get('completed', 'false').lower() == 'true'
         
-        if show_completed:
-            tasks = Task.objects.filter(user=request.user)
-        else:
-            tasks = Task.objects.filter(user=request.user, completed=False)
+        tasks = Task.objects.filter(user=await aget_user(request))
+        if not show_completed:
+            tasks = tasks.filter(completed=False)
         
         tasks_data = [{
             'id': task.id,
@@ -164,7 +172,7 @@ def get_tasks(request):
             'due_date': task.due_date.strftime('%Y-%m-%d') if task.due_date else None,
             'completed': task.completed,
             'created_at': task.created_at.strftime('%Y-%m-%d %H:%M')
-        } for task in tasks]
+        } async for task in tasks]
         
         return JsonResponse({
             'success': True,
@@ -175,13 +183,14 @@ def get_tasks(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@login_required
-def get_task(request, task_id):
+@query_budget(queries=5, time_ms=50)
+@async_login_required
+async def get_task(request, task_id):
     """
     Get a single task by ID
     """
     try:
-        task = get_object_or_404(Task, id=task_id, user=request.user)
+        task = await aget_object_or_404(Task.objects, id=task_id, user=await aget_user(request))
         
         return JsonResponse({
             'success': True,
@@ -17,6 +17,7 @@ urlpatterns = [
     # Session management
     path('save-session/', views.save_study_session, name='save_session'),
     path('api/save-session/', views.save_auto_session, name='save_auto_session'),
+    path('api/heartbeat/', views.session_heartbeat, name='session_heartbeat'),
     path('update-preferences/', views.update_preferences, name='update_preferences'),
     
     # Stats API
@@ -8,15 +8,26 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.utils import timezone
 from django.views.decorators.http import require_POST
-from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Sum
+from django.db.models import Count, Q, Sum
+from asgiref.sync import sync_to_async
 from datetime import timedelta
 import json
+import re
 
-from tracker.models import Task, StudySession, Achievement, UserAchievement
+from tracker.models import Task, StudySession
+from tracker.achievements import evaluate_achievements
+from tracker.heartbeats import interval as heartbeat_interval, record_heartbeat
+from tracker.ingest import session_event, session_ingestor, write_sessions
+from tracker.rollups import aget_daily_totals, local_date, local_day_start
 from accounts.models import UserProfile, UserPreferences
+from virtualcafe.async_views import aget_user, async_csrf_exempt, async_login_required, async_require_POST
+from virtualcafe.query_budget import query_budget
 
+# Tracking session ids are chosen by the page (crypto.randomUUID())
+TRACKING_SESSION_ID = re.compile(r'[\w-]{8,64}')
 
+
+@query_budget(queries=8, time_ms=50)
 @login_required
 def solo_study_room(request):
     """
@@ -44,11 +55,13 @@ def solo_study_room(request):
         'preferences': preferences,
         'user_tasks': active_tasks,
         'today_minutes': today_minutes,
+        'heartbeat_interval': heartbeat_interval(),
     }
     
     return render(request, 'solo/study_room.html', context)
 
 
+@query_budget(queries=10, time_ms=50, method='POST', json={'minutes': 25})
 @login_required
 @require_POST
 def save_study_session(request):
@@ -93,7 +106,7 @@ def save_study_session(request):
             leveled_up = profile.update_study_stats(minutes)
             
             # Check for achievements
-            new_achievements = check_achievements(request.user)
+            new_achievements = evaluate_achievements(request.user, session=session)
             
             return JsonResponse({
                 'success': True,
@@ -114,16 +127,20 @@ def save_study_session(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@csrf_exempt
-@require_POST
-def save_auto_session(request):
+@query_budget(queries=4, time_ms=50, method='POST', json={'minutes': 25})
+@async_csrf_exempt
+@async_require_POST
+async def save_auto_session(request):
     """
     Save auto-tracked study session from solo room or group room
     Called automatically when user leaves the room or periodically
     Uses sendBeacon API for reliable delivery
     Note: No @login_required — sendBeacon can't follow redirects.
+    The session is queued and written in the background (tracker/ingest.py),
+    so the beacon is acknowledged without waiting on the database.
     """
-    if not request.user.is_authenticated:
+    user = await aget_user(request)
+    if not user.is_authenticated:
         return JsonResponse({'success': False, 'error': 'Not authenticated'}, status=401)
 
     try:
@@ -133,71 +150,70 @@ def save_auto_session(request):
         session_type = data.get('session_type','focus')
         completed = data.get('completed', True)
         room_code = data.get('room_code', None)  # Optional room code for group study
-        
-        # Validate minutes (at least 1 minute to save)
-        if minutes < 1:
-            return JsonResponse({'success': True, 'message': 'Session too short to save'})
-        
-        # Get room if room_code provided
-        room = None
-        if room_code:
-            try:
-                from rooms.models import Room
-                room = Room.objects.get(room_code=room_code)
-            except Room.DoesNotExist:
-                pass
-        
-        # Create the session
-        session = StudySession.objects.create(
-            user=request.user,
-            minutes=minutes,
-            session_type=session_type,
-            completed=completed,
-            room=room,  # Link to room if provided
-            started_at=timezone.now() - timedelta(minutes=minutes),
-            ended_at=timezone.now()
-        )
-        
-        # Update profile stats (only for focus sessions)
-        if session_type == 'focus':
-            profile = request.user.profile
-            profile.update_study_stats(minutes)
-            
-            return JsonResponse({
-                'success': True,
-                'total_minutes': profile.total_study_minutes,
-                'message': f'Saved {minutes} minutes to your profile'
-            })
-        
-        return JsonResponse({'success': True})
-        
     except json.JSONDecodeError:
         # Handle sendBeacon data format
         try:
             # Try to parse as form data
             minutes = int(request.POST.get('minutes', 0))
-            if minutes < 1:
-                return JsonResponse({'success': True})
-            
-            session = StudySession.objects.create(
-                user=request.user,
-                minutes=minutes,
-                session_type='focus',
-                completed=True,
-                started_at=timezone.now() - timedelta(minutes=minutes),
-                ended_at=timezone.now()
-            )
-            
-            profile = request.user.profile
-            profile.update_study_stats(minutes)
-            
-            return JsonResponse({'success': True})
-        except Exception as inner_e:
-            return JsonResponse({'success': False, 'error': str(inner_e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        session_type, completed, room_code = 'focus', True, None
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    # Validate minutes (at least 1 minute to save)
+    if minutes < 1:
+        return JsonResponse({'success': True, 'message': 'Session too short to save'})
+    if session_type not in ('focus', 'break'):
+        return JsonResponse({'success': False, 'error': 'Invalid session type'}, status=400)
+    
+    event = session_event(user.id, minutes, session_type, completed, room_code)
+    if not session_ingestor.submit(event):
+        # Queue full: write this one ourselves
+        await sync_to_async(write_sessions)([event])
+    
+    return JsonResponse({'success': True, 'message': f'Saved {minutes} minutes to your profile'}, status=202)
+
+
+@query_budget(queries=6, time_ms=50, method='POST', json={'session_id': 'budget-check', 'seq': 1, 'final': True})
+@async_csrf_exempt
+@async_require_POST
+async def session_heartbeat(request):
+    """
+    Heartbeat from an open solo or group study page (static/js/study_tracker.js)
+    The server adds up the time between heartbeats and saves one session
+    when the page sends its final heartbeat or goes quiet (tracker/heartbeats.py).
+    Sent with sendBeacon too, so no @login_required, like save_auto_session.
+    """
+    user = await aget_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Not authenticated'}, status=401)
+
+    try:
+        data = json.loads(request.body)
+        session_id = str(data['session_id'])
+        seq = int(data['seq'])
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'session_id and seq are required'}, status=400)
+    
+    session_type = data.get('session_type', 'focus')
+    room_code = data.get('room_code') or None
+    if not TRACKING_SESSION_ID.fullmatch(session_id):
+        return JsonResponse({'success': False, 'error': 'Invalid session id'}, status=400)
+    if session_type not in ('focus', 'break'):
+        return JsonResponse({'success': False, 'error': 'Invalid session type'}, status=400)
+    if room_code is not None and (not isinstance(room_code, str) or len(room_code) > 10):
+        return JsonResponse({'success': False, 'error': 'Invalid room code'}, status=400)
+    
+    accepted, seconds = await sync_to_async(record_heartbeat)(
+        user.id, session_id, seq,
+        final=bool(data.get('final')), discard=bool(data.get('discard')),
+        session_type=session_type, room_code=room_code
+    )
+    return JsonResponse({'success': True, 'accepted': accepted, 'seconds': int(seconds)}, status=202)
 
 
+@query_budget(queries=6, time_ms=50, method='POST', json={'theme': 'dark'})
 @login_required
 @require_POST
 def update_preferences(request):
@@ -229,107 +245,40 @@ def update_preferences(request):
         if 'show_goals_panel' in data:
             preferences.show_goals_panel = data['show_goals_panel']
         
-        preferences.save()
+        preferences.save_dirty()
         
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-def check_achievements(user):
-    """
-    Check if user unlocked any new achievements
-    Returns list of newly unlocked achievements
-    """
-    profile = user.profile
-    new_achievements = []
-    
-    # Get all achievements
-    all_achievements = Achievement.objects.all()
-    
-    for achievement in all_achievements:
-        # Check if already unlocked
-        if UserAchievement.objects.filter(user=user, achievement=achievement).exists():
-            continue
-        
-        # Check criteria
-        unlocked = False
-        
-        if achievement.criteria_type == 'first_session':
-            if StudySession.objects.filter(user=user).exists():
-                unlocked = True
-        
-        elif achievement.criteria_type == 'total_minutes':
-            if profile.total_study_minutes >= achievement.criteria_value:
-                unlocked = True
-        
-        elif achievement.criteria_type == 'streak_days':
-            if profile.study_streak >= achievement.criteria_value:
-                unlocked = True
-        
-        elif achievement.criteria_type == 'total_sessions':
-            session_count = StudySession.objects.filter(user=user, session_type='focus').count()
-            if session_count >= achievement.criteria_value:
-                unlocked = True
-        
-        elif achievement.criteria_type == 'level_reached':
-            if profile.level >= achievement.criteria_value:
-                unlocked = True
-        
-        elif achievement.criteria_type == 'deep_focus':
-            deep_session = StudySession.objects.filter(
-                user=user, 
-                minutes__gte=achievement.criteria_value
-            ).exists()
-            if deep_session:
-                unlocked = True
-        
-        # Unlock achievement
-        if unlocked:
-            user_achievement = UserAchievement.objects.create(
-                user=user,
-                achievement=achievement
-            )
-            # Award XP bonus
-            profile.add_xp(achievement.xp_reward)
-            profile.save()
-            new_achievements.append(user_achievement)
-    
-    return new_achievements
-
-
-@login_required
-def get_study_stats(request):
+@query_budget(queries=9, time_ms=50)
+@async_login_required
+async def get_study_stats(request):
     """
     API endpoint to get study statistics for the Study Stats panel
     Supports filtering by period: today, week, month
     """
     period = request.GET.get('period', 'month')
-    user = request.user
-    now = timezone.now()
+    user = await aget_user(request)
+    # Load the profile up front so local_date() and the rank don't query it lazily
+    user.profile = await UserProfile.objects.aget(user=user)
+    today = local_date(user)
     
-    # Determine date range based on period
+    # Determine date range based on period (in the user's timezone)
     if period == 'today':
-        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_date = today
         period_label = 'Today'
     elif period == 'week':
-        start_date = now - timedelta(days=now.weekday())  # Start of week (Monday)
-        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_date = today - timedelta(days=today.weekday())  # Start of week (Monday)
         period_label = 'This week'
     else:  # month
-        start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        start_date = today.replace(day=1)
         period_label = 'This month'
     
-    # Get study sessions in the period (only focus sessions)
-    sessions = StudySession.objects.filter(
-        user=user,
-        created_at__gte=start_date,
-        session_type='focus',
-        completed=True
-    )
-    
-    # Calculate total study time in minutes
-    total_minutes = sessions.aggregate(Sum('minutes'))['minutes__sum'] or 0
+    # Calculate total study time in minutes (completed focus sessions only) from the daily rollups
+    daily_totals = await aget_daily_totals(user, start_date, today)
+    total_minutes = sum(rollup.completed_focus_minutes for rollup in daily_totals.values())
     study_hours = round(total_minutes / 60, 1)
     
     # Calculate level based on hours
@@ -354,35 +303,27 @@ def get_study_stats(request):
         progress_percentage = ((study_hours - 3) / 3) * 100
         hours_left = round(6 - study_hours, 1)
     
-    # Get goals data
-    total_goals = Task.objects.filter(user=user).count()
-    open_goals = Task.objects.filter(user=user, completed=False).count()
-    completed_goals = Task.objects.filter(user=user, completed=True).count()
+    # Get goals data (one aggregate instead of three counts)
+    goals = await Task.objects.filter(user=user).aaggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    total_goals = goals['total']
+    completed_goals = goals['completed']
+    open_goals = total_goals - completed_goals
     
     # Get leaderboard rank (based on total study time)
-    user_total_minutes = StudySession.objects.filter(
+    # total_study_minutes is kept current by save_study_session/save_auto_session
+    # and indexed, so this is a cheap count instead of an aggregate over all users
+    rank = await user.profile.aget_study_rank()
+    
+    # Get recent sessions (last 5 focus sessions in the period)
+    recent_sessions = StudySession.objects.filter(
         user=user,
+        created_at__gte=local_day_start(user, start_date),
         session_type='focus',
         completed=True
-    ).aggregate(Sum('minutes'))['minutes__sum'] or 0
-    
-    # Count users with more study time
-    from django.contrib.auth.models import User
-    from django.db.models import Q
-    
-    users_with_more_time = User.objects.filter(
-        study_sessions__session_type='focus',
-        study_sessions__completed=True
-    ).annotate(
-        total_time=Sum('study_sessions__minutes')
-    ).filter(
-        total_time__gt=user_total_minutes
-    ).distinct().count()
-    
-    rank = users_with_more_time + 1
-    
-    # Get recent sessions (last 5 sessions in the period)
-    recent_sessions = sessions.order_by('-created_at')[:5].values(
+    ).order_by('-created_at')[:5].values(
         'minutes',
         'created_at',
         'completed'
@@ -390,7 +331,7 @@ def get_study_stats(request):
     
     # Format recent sessions for JSON
     recent_sessions_list = []
-    for session in recent_sessions:
+    async for session in recent_sessions:
         # Format the date/time
         session_date = session['created_at']
         if timezone.now().date() == session_date.date():
@@ -1,5 +1,6 @@
 let chatSocket = null;
 let peerConnection = null;
+let remotePeerId = null;  // user id our signaling is addressed to (null = whole room)
 let localStream = null;
 let remoteStream = null;
 let isCallActive = false;
@@ -12,6 +13,15 @@ let timerMinutes = 25;
 let timerSeconds = 0;
 let timerRunning = false;
 
+// Presence heartbeat (server drops members not heard from in 90 seconds)
+const HEARTBEAT_INTERVAL_MS = 30000;
+let heartbeatInterval = null;
+
+// Chat history
+let lastMessageTime = 0;     // newest chat message shown, so replays after a reconnect aren't duplicated
+let historyCursor = null;    // cursor for the next page of older messages (null = no more)
+let historyLoaded = false;   // whether the replay sent on the first connection has been shown
+
 // WebRTC configuration
 const rtcConfig = {
     iceServers: [
@@ -34,6 +44,14 @@ function initWebSocket() {
     chatSocket.onopen = function(e) {
         console.log('WebSocket connected');
         updateVideoStatus('Connected - Ready for video call');
+        
+        // Keep our presence in the room alive
+        clearInterval(heartbeatInterval);
+        heartbeatInterval = setInterval(() => {
+            if (chatSocket && chatSocket.readyState === WebSocket.OPEN) {
+                chatSocket.send(JSON.stringify({ type: 'heartbeat' }));
+            }
+        }, HEARTBEAT_INTERVAL_MS);
     };
     
     // When message received from server
@@ -46,6 +64,7 @@ function initWebSocket() {
     chatSocket.onclose = function(e) {
         console.log('WebSocket disconnected');
         updateVideoStatus('Disconnected');
+        clearInterval(heartbeatInterval);
         setTimeout(initWebSocket, 3000); // Reconnect after 3 seconds
     };
     
@@ -67,6 +86,10 @@ function handleWebSocketMessage(data) {
             displayChatMessage(data);
             break;
         
+        case 'chat_history':
+            displayChatHistory(data);
+            break;
+        
         case 'user_join':
             displayNotification(`${data.username} joined the room`);
             updateMembersList();
@@ -74,7 +97,7 @@ function handleWebSocketMessage(data) {
             // This ensures the existing user initiates the connection
             if (isCallActive && localStream && !peerConnection && data.username !== USERNAME) {
                 console.log('Creating peer connection for new user:', data.username);
-                setTimeout(() => createPeerConnection(), 1500);
+                setTimeout(() => createPeerConnection(data.user_id), 1500);
             }
             break;
         
@@ -85,6 +108,7 @@ function handleWebSocketMessage(data) {
             if (peerConnection) {
                 peerConnection.close();
                 peerConnection = null;
+                remotePeerId = null;
                 const remoteVideo = document.getElementById('remote-video');
                 const remotePlaceholder = document.getElementById('remote-placeholder');
                 const remoteOverlay = document.getElementById('remote-overlay');
@@ -116,10 +140,9 @@ function handleWebSocketMessage(data) {
 // ===== CHAT FUNCTIONALITY =====
 
 /**
- * Display a chat message in the chat box
+ * Build the element for one chat message
  */
-function displayChatMessage(data) {
-    const chatMessages = document.getElementById('chat-messages');
+function createChatMessageElement(data) {
     const messageDiv = document.createElement('div');
     messageDiv.className = 'chat-message';
     
@@ -137,8 +160,97 @@ function displayChatMessage(data) {
         <div class="message-time">${timestamp}</div>
     `;
     
-    chatMessages.appendChild(messageDiv);
+    return messageDiv;
+}
+
+/**
+ * Display a chat message in the chat box
+ */
+function displayChatMessage(data) {
+    const chatMessages = document.getElementById('chat-messages');
+    chatMessages.appendChild(createChatMessageElement(data));
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+    lastMessageTime = Math.max(lastMessageTime, Date.parse(data.timestamp) || 0);
+}
+
+/**
+ * Display the recent messages the server replays when we connect
+ */
+function displayChatHistory(data) {
+    if (historyLoaded) {
+        // After a reconnect only show what we missed
+        data.messages
+            .filter(message => Date.parse(message.timestamp) > lastMessageTime)
+            .forEach(message => displayChatMessage(message));
+        return;
+    }
+    
+    // The replay stops where the live messages start, but some may have arrived first
+    const chatMessages = document.getElementById('chat-messages');
+    const anchor = chatMessages.querySelector('.chat-message');
+    data.messages.forEach(message => {
+        chatMessages.insertBefore(createChatMessageElement(message), anchor);
+        lastMessageTime = Math.max(lastMessageTime, Date.parse(message.timestamp) || 0);
+    });
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    
+    historyLoaded = true;
+    historyCursor = data.before;
+    updateLoadEarlierButton();
+}
+
+/**
+ * Show the "Load earlier messages" button while there is older history
+ */
+function updateLoadEarlierButton() {
+    const chatMessages = document.getElementById('chat-messages');
+    let button = document.getElementById('load-earlier-btn');
+    
+    if (!historyCursor) {
+        if (button) button.remove();
+        return;
+    }
+    
+    if (!button) {
+        button = document.createElement('button');
+        button.type = 'button';
+        button.id = 'load-earlier-btn';
+        button.className = 'load-earlier-btn';
+        button.textContent = 'Load earlier messages';
+        button.addEventListener('click', loadEarlierMessages);
+        chatMessages.prepend(button);
+    }
+}
+
+/**
+ * Fetch the previous page of chat history and insert it above the current messages
+ */
+async function loadEarlierMessages() {
+    if (!historyCursor) return;
+    
+    try {
+        const response = await fetch(`/rooms/${ROOM_CODE}/messages/?before=${encodeURIComponent(historyCursor)}`);
+        const data = await response.json();
+        if (!data.success) {
+            console.error('Error loading earlier messages:', data.error);
+            return;
+        }
+        
+        // Insert below the button, keeping the visible messages where they are
+        const chatMessages = document.getElementById('chat-messages');
+        const button = document.getElementById('load-earlier-btn');
+        const anchor = button.nextSibling;
+        const previousHeight = chatMessages.scrollHeight;
+        data.messages.forEach(message => {
+            chatMessages.insertBefore(createChatMessageElement(message), anchor);
+        });
+        chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+        
+        historyCursor = data.before;
+        updateLoadEarlierButton();
+    } catch (error) {
+        console.error('Error loading earlier messages:', error);
+    }
 }
 
 /**
@@ -256,13 +368,16 @@ async function startCall() {
 /**
  * Create peer connection and send offer
  */
-async function createPeerConnection() {
+async function createPeerConnection(targetId = null) {
     // Prevent creating multiple peer connections
     if (peerConnection) {
         console.log('Peer connection already exists');
         return;
     }
     
+    // Address the offer to the new user; without one it goes to the whole room
+    remotePeerId = targetId;
+    
     try {
         console.log('Creating new peer connection...');
         // Create peer connection
@@ -299,7 +414,8 @@ async function createPeerConnection() {
                 // Send ICE candidate to other peer via WebSocket
                 chatSocket.send(JSON.stringify({
                     type: 'webrtc_ice',
-                    candidate: event.candidate
+                    candidate: event.candidate,
+                    target: remotePeerId
                 }));
             }
         };
@@ -311,7 +427,8 @@ async function createPeerConnection() {
         // Send offer through WebSocket
         chatSocket.send(JSON.stringify({
             type: 'webrtc_offer',
-            offer: offer
+            offer: offer,
+            target: remotePeerId
         }));
         
         updateVideoStatus('Calling...');
@@ -333,6 +450,9 @@ async function handleWebRTCOffer(data) {
     
     console.log('Received WebRTC offer from:', data.username);
     
+    // Reply to the caller directly from now on
+    remotePeerId = data.user_id;
+    
     try {
         // Get user media if not already have it
         if (!localStream) {
@@ -393,7 +513,8 @@ async function handleWebRTCOffer(data) {
                     console.log('Sending ICE candidate');
                     chatSocket.send(JSON.stringify({
                         type: 'webrtc_ice',
-                        candidate: event.candidate
+                        candidate: event.candidate,
+                        target: remotePeerId
                     }));
                 }
             };
@@ -412,7 +533,8 @@ async function handleWebRTCOffer(data) {
         console.log('Sending answer back');
         chatSocket.send(JSON.stringify({
             type: 'webrtc_answer',
-            answer: answer
+            answer: answer,
+            target: remotePeerId
         }));
         
         isCallActive = true;
@@ -447,6 +569,8 @@ async function handleWebRTCAnswer(data) {
     
     try {
         if (peerConnection) {
+            // An untargeted offer is answered by one peer; talk to them directly now
+            remotePeerId = data.user_id;
             console.log('Setting remote description (answer)');
             await peerConnection.setRemoteDescription(new RTCSessionDescription(data.answer));
             updateVideoStatus('Call connected');
@@ -460,7 +584,7 @@ async function handleWebRTCAnswer(data) {
 }
 
 /**
- * Handle incoming ICE candidate
+ * Handle incoming ICE candidates (the server batches trickled candidates into one frame)
  */
 async function handleWebRTCICE(data) {
     // Don't handle own ICE candidates
@@ -468,11 +592,15 @@ async function handleWebRTCICE(data) {
         return;
     }
     
+    const candidates = data.candidates || (data.candidate ? [data.candidate] : []);
+    
     try {
-        if (peerConnection && data.candidate) {
-            console.log('Adding ICE candidate from:', data.username);
-            await peerConnection.addIceCandidate(new RTCIceCandidate(data.candidate));
-        } else if (!peerConnection) {
+        if (peerConnection) {
+            console.log(`Adding ${candidates.length} ICE candidate(s) from:`, data.username);
+            for (const candidate of candidates) {
+                await peerConnection.addIceCandidate(new RTCIceCandidate(candidate));
+            }
+        } else {
             console.warn('Received ICE candidate but no peer connection exists yet');
         }
     } catch (error) {
@@ -500,6 +628,7 @@ function endCall() {
         peerConnection.close();
         peerConnection = null;
     }
+    remotePeerId = null;
     
     // Clear video elements and show placeholders
     const localVideo = document.getElementById('local-video');
@@ -0,0 +1,88 @@
+/**
+ * Study time tracking for the solo and group study pages.
+ * While the page is visible it sends numbered heartbeats to the server,
+ * which adds up the time itself and saves one study session when the page
+ * is hidden or closed, or stops sending heartbeats (tracker/heartbeats.py).
+ * Resent or reordered heartbeats are ignored by the server, so a beacon
+ * delivered twice can't count the same minutes twice.
+ *
+ *   const studyTracker = StudyTracker.track({ intervalSeconds: 60, roomCode: 'ABC123' });
+ *   studyTracker.restart();  // the time so far was saved another way
+ */
+class StudyTracker {
+    constructor({ intervalSeconds = 60, roomCode = null, url = '/study/api/heartbeat/' } = {}) {
+        this.intervalMs = intervalSeconds * 1000;
+        this.roomCode = roomCode;
+        this.url = url;
+        this.sessionId = null;
+        this.seq = 0;
+        this.timer = null;
+    }
+
+    // Track while the page is visible: close the session when it's hidden or left
+    static track(options) {
+        const tracker = new StudyTracker(options);
+        document.addEventListener('visibilitychange', () => {
+            if (document.hidden) {
+                tracker.stop();
+            } else {
+                tracker.start();
+            }
+        });
+        window.addEventListener('pagehide', () => tracker.stop());
+        if (!document.hidden) tracker.start();
+        return tracker;
+    }
+
+    static newSessionId() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    start() {
+        if (this.sessionId) return;
+        this.sessionId = StudyTracker.newSessionId();
+        this.seq = 0;
+        this.send({});
+        this.timer = setInterval(() => this.send({}), this.intervalMs);
+    }
+
+    // Close the session: the server saves it, unless it's discarded
+    stop({ discard = false } = {}) {
+        if (!this.sessionId) return;
+        clearInterval(this.timer);
+        this.timer = null;
+        this.send(discard ? { discard: true } : { final: true });
+        this.sessionId = null;
+    }
+
+    // Drop the time tracked so far (e.g. a timer session saved it) and start over
+    restart() {
+        if (!this.sessionId) return;
+        this.stop({ discard: true });
+        this.start();
+    }
+
+    send(flags) {
+        this.seq += 1;
+        const data = JSON.stringify({
+            session_id: this.sessionId,
+            seq: this.seq,
+            session_type: 'focus',
+            room_code: this.roomCode,
+            ...flags
+        });
+
+        // sendBeacon survives the page closing; fall back to a keepalive fetch if it's refused
+        const blob = new Blob([data], { type: 'application/json' });
+        if (!navigator.sendBeacon(this.url, blob)) {
+            fetch(this.url, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: data,
+                keepalive: true,
+                credentials: 'same-origin'
+            }).catch(error => console.log('Study heartbeat failed:', error));
+        }
+    }
+}
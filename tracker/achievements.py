@@ -0,0 +1,129 @@
+"""
+Achievement engine.
+Evaluates unlock criteria against the counters kept on UserProfile (and the
+session that was just saved) so a check costs the same few queries no
+matter how many achievements exist.
+
+The catalogue is cached in Django's cache and dropped whenever an
+Achievement changes. With the Redis cache (PRESENCE_BACKEND='redis') that
+reaches every worker and the scheduler; with the local cache it only
+reaches the process that made the change, so other processes (and every
+server process after `manage.py create_achievements`) see the change when
+their copy expires, after ACHIEVEMENT_CATALOGUE_TTL seconds.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from tracker.models import Achievement, UserAchievement
+
+
+CATALOGUE_CACHE_KEY = 'tracker:achievement_catalogue'
+
+
+def get_catalogue():
+    """
+    Return all achievements, cached until the catalogue changes
+    """
+    catalogue = cache.get(CATALOGUE_CACHE_KEY)
+    if catalogue is None:
+        catalogue = list(Achievement.objects.all())
+        cache.set(CATALOGUE_CACHE_KEY, catalogue, getattr(settings, 'ACHIEVEMENT_CATALOGUE_TTL', 60))
+    return catalogue
+
+
+def invalidate_catalogue():
+    """Drop the cached catalogue (called when an Achievement changes)"""
+    cache.delete(CATALOGUE_CACHE_KEY)
+
+
+def is_unlocked(achievement, profile, longest_session=0):
+    """
+    Check a single achievement's criteria against the user's counters.
+    `longest_session` is the longest session length (in minutes) known
+    for the user, e.g. the session just saved.
+    """
+    criteria = achievement.criteria_type
+    value = achievement.criteria_value
+
+    if criteria == 'first_session':
+        return profile.total_focus_sessions >= 1
+    if criteria == 'total_minutes':
+        return profile.total_study_minutes >= value
+    if criteria == 'streak_days':
+        return profile.study_streak >= value
+    if criteria == 'total_sessions':
+        return profile.total_focus_sessions >= value
+    if criteria == 'level_reached':
+        return profile.level >= value
+    if criteria == 'deep_focus':
+        return longest_session >= value
+    return False
+
+
+def find_new_achievements(profile, unlocked_ids, longest_session=0):
+    """
+    Return achievements newly earned by the profile, awarding their XP on
+    the (unsaved) profile. Repeats while XP bonuses unlock further
+    level-based achievements.
+    """
+    earned = []
+    unlocked_ids = set(unlocked_ids)
+    catalogue = get_catalogue()
+
+    while True:
+        newly_earned = [
+            achievement for achievement in catalogue
+            if achievement.id not in unlocked_ids
+            and is_unlocked(achievement, profile, longest_session)
+        ]
+        if not newly_earned:
+            return earned
+
+        for achievement in newly_earned:
+            unlocked_ids.add(achievement.id)
+            profile.add_xp(achievement.xp_reward)
+        earned.extend(newly_earned)
+
+
+def evaluate_achievements(user, session=None):
+    """
+    Unlock any achievements the user has earned.
+    Call after a focus session is saved; pass the session so deep focus
+    criteria can be checked without querying past sessions.
+    Returns the list of newly created UserAchievement objects.
+    """
+    profile = user.profile
+    longest_session = session.minutes if session is not None else 0
+    unlocked_ids = UserAchievement.objects.filter(user=user).values_list('achievement_id', flat=True)
+
+    earned = find_new_achievements(profile, unlocked_ids, longest_session)
+    if not earned:
+        return []
+    return unlock_achievements(profile, earned)
+
+
+def unlock_achievements(profile, achievements):
+    """
+    Record achievements as unlocked and award their XP to the profile.
+    Each unlock is inserted on its own, so one a concurrent evaluation
+    recorded first is skipped, and so is its XP bonus.
+    Returns the UserAchievement objects created here.
+    """
+    created = []
+    for achievement in achievements:
+        try:
+            with transaction.atomic():
+                created.append(UserAchievement.objects.create(user_id=profile.user_id, achievement=achievement))
+        except IntegrityError:
+            continue  # Already unlocked by a concurrent evaluation
+
+    # Added in the database rather than saving the XP counted here over
+    # whatever concurrent sessions have added meanwhile
+    bonus = sum(unlock.achievement.xp_reward for unlock in created)
+    if bonus:
+        profile.award_xp(bonus)
+    elif achievements:
+        # Drop the XP find_new_achievements() added to this profile in memory
+        profile.refresh_from_db(fields=['total_xp', 'level'])
+    return created
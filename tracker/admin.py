@@ -2,7 +2,7 @@
 Admin configuration for tracker app.
 """
 from django.contrib import admin
-from .models import StudySession, Task, Achievement, UserAchievement, StudySchedule
+from .models import StudySession, Task, Achievement, UserAchievement, StudySchedule, DailyStudyRollup
 
 
 @admin.register(StudySession)
@@ -58,3 +58,14 @@ class StudyScheduleAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'title']
     date_hierarchy = 'date'
 
+
+@admin.register(DailyStudyRollup)
+class DailyStudyRollupAdmin(admin.ModelAdmin):
+    """
+    Admin interface for DailyStudyRollup model.
+    Rows are maintained automatically; rebuild with `manage.py backfill_rollups`.
+    """
+    list_display = ['user', 'date', 'focus_minutes', 'completed_focus_minutes', 'break_minutes', 'session_count', 'completed_count']
+    list_filter = ['date']
+    search_fields = ['user__username']
+    date_hierarchy = 'date'
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracker'
+    
+    def ready(self):
+        """
+        Import signals when app is ready
+        """
+        import tracker.signals
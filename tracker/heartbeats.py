@@ -0,0 +1,273 @@
+"""
+Study session heartbeats.
+Study pages used to work out minutes in JavaScript and beacon them on every
+tab hide, five-minute tick and unload, so the same time was often saved
+twice and every beacon was a write. Now the page opens a tracking session
+(a random id chosen by the client) and sends numbered heartbeats every
+STUDY_HEARTBEAT_INTERVAL seconds while it is visible:
+
+    {"session_id": "...", "seq": 3, "room_code": "ABC123"}
+    {"session_id": "...", "seq": 4, "final": true}     (tab hidden or closed)
+    {"session_id": "...", "seq": 5, "discard": true}   (time saved another way)
+
+The server keeps each open session's state and adds up the time between
+heartbeats itself, counting at most STUDY_HEARTBEAT_TIMEOUT seconds for any
+gap. A heartbeat whose sequence number isn't higher than the last one seen
+is a duplicate or arrived out of order and is ignored, and ids of closed
+sessions are remembered for a while so late beacons can't reopen them.
+One StudySession is saved (through tracker/ingest.py) when the session is
+closed, or by close_idle_sessions() once nothing has been heard from it
+for STUDY_HEARTBEAT_TIMEOUT seconds.
+
+The state is shared by every worker, since a page's heartbeats can reach
+any of them: in Redis along with room presence (settings.PRESENCE_BACKEND),
+or otherwise in the database (tracker.models.StudyHeartbeat). Either way
+idle sessions are closed by the elected scheduler worker (rooms/scheduler.py).
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Least
+
+from .ingest import session_event, session_ingestor, write_sessions
+
+logger = logging.getLogger(__name__)
+
+
+def interval():
+    """Seconds between heartbeats from an open study page"""
+    return getattr(settings, 'STUDY_HEARTBEAT_INTERVAL', 60)
+
+
+def _timeout():
+    return getattr(settings, 'STUDY_HEARTBEAT_TIMEOUT', interval() * 3)
+
+
+def _closed_ttl():
+    # Long enough to outlive any retry of a session's beacons
+    return _timeout() * 10
+
+
+def _advance(state, seq, now):
+    """
+    Apply heartbeat `seq` received at `now` to a session's state.
+    Returns False (leaving the state alone) for duplicates.
+    """
+    if seq <= state['seq']:
+        return False
+    state['seconds'] += min(now - state['last_seen'], _timeout())
+    state['seq'] = seq
+    state['last_seen'] = now
+    return True
+
+
+class DatabaseHeartbeatStore:
+    """
+    Heartbeat store in the database, shared by all workers.
+    One StudyHeartbeat row per (user, session). Heartbeats are applied with
+    conditional UPDATEs, so of two workers handling the same heartbeat (or
+    a heartbeat and the sweep) only one changes the row.
+    """
+
+    FIELDS = ('user_id', 'seq', 'last_seen', 'seconds', 'session_type', 'room_code')
+
+    @staticmethod
+    def _decode(values):
+        return {**values, 'room_code': values['room_code'] or None}
+
+    def record(self, user_id, session_id, seq, now, close, details):
+        from .models import StudyHeartbeat
+        sessions = StudyHeartbeat.objects.filter(user_id=user_id, session_id=session_id)
+        closed_until = now + _closed_ttl() if close else None
+
+        # Same arithmetic as _advance(), applied only to a later heartbeat of an open session
+        updated = sessions.filter(seq__lt=seq, closed_until__isnull=True).update(
+            seconds=F('seconds') + Least(Value(now) - F('last_seen'), Value(float(_timeout()))),
+            seq=seq,
+            last_seen=now,
+            closed_until=closed_until,
+        )
+        if updated:
+            return True, self._decode(sessions.values(*self.FIELDS).get())
+
+        state = {'user_id': user_id, 'seq': seq, 'last_seen': now, 'seconds': 0.0, **details}
+        try:
+            with transaction.atomic():
+                StudyHeartbeat.objects.create(
+                    session_id=session_id, closed_until=closed_until,
+                    **{**state, 'room_code': state['room_code'] or ''},
+                )
+            return True, state
+        except IntegrityError:
+            pass
+
+        current = sessions.values(*self.FIELDS, 'closed_until').first()
+        if current is None or current.pop('closed_until') is not None:
+            # A late beacon of a closed session
+            return False, None
+        if current['seq'] < seq:
+            # Another worker opened the session just before us; apply ours to its row
+            return self.record(user_id, session_id, seq, now, close, details)
+        return False, self._decode(current)
+
+    def close_idle(self, now):
+        from .models import StudyHeartbeat
+        idle = StudyHeartbeat.objects.filter(closed_until__isnull=True, last_seen__lte=now - _timeout())
+        states = []
+        for values in idle.values('id', *self.FIELDS):
+            # Claim the session: a heartbeat arriving meanwhile moves last_seen past the cutoff
+            if idle.filter(id=values.pop('id')).update(closed_until=now + _closed_ttl()):
+                states.append(self._decode(values))
+        StudyHeartbeat.objects.filter(closed_until__lte=now).delete()
+        return states
+
+
+class RedisHeartbeatStore:
+    """
+    Redis-backed heartbeat store shared by all workers.
+    heartbeat:<user>:<session>         hash with the session's state
+    heartbeat:<user>:<session>:closed  marker for a closed session (expires)
+    heartbeats                         sorted set of open sessions scored by last heartbeat
+    """
+
+    ACTIVE_KEY = 'heartbeats'
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _keys(member):
+        key = f'heartbeat:{member}'
+        return key, f'{key}:closed'
+
+    @staticmethod
+    def _decode(values):
+        return {
+            'user_id': int(values['user_id']),
+            'seq': int(values['seq']),
+            'last_seen': float(values['last_seen']),
+            'seconds': float(values['seconds']),
+            'session_type': values['session_type'],
+            'room_code': values['room_code'] or None,
+        }
+
+    def _finish(self, pipe, member):
+        """Queue the commands that close a session (pipe in MULTI mode)"""
+        key, closed_key = self._keys(member)
+        pipe.delete(key)
+        pipe.zrem(self.ACTIVE_KEY, member)
+        pipe.set(closed_key, 1, ex=int(_closed_ttl()))
+
+    def record(self, user_id, session_id, seq, now, close, details):
+        member = f'{user_id}:{session_id}'
+        key, closed_key = self._keys(member)
+
+        def apply(pipe):
+            # Reads run immediately while WATCHing; the writes only if nothing changed meanwhile
+            if pipe.exists(closed_key):
+                return False, None
+            values = pipe.hgetall(key)
+            if values:
+                state = self._decode(values)
+                accepted = _advance(state, seq, now)
+            else:
+                state = {'user_id': user_id, 'seq': seq, 'last_seen': now, 'seconds': 0.0, **details}
+                accepted = True
+
+            pipe.multi()
+            if accepted and close:
+                self._finish(pipe, member)
+            elif accepted:
+                pipe.hset(key, mapping={
+                    **state, 'room_code': state['room_code'] or '',
+                })
+                pipe.expire(key, int(_closed_ttl()))
+                pipe.zadd(self.ACTIVE_KEY, {member: now})
+            return accepted, state
+
+        return self._redis.transaction(apply, key, closed_key, value_from_callable=True)
+
+    def close_idle(self, now):
+        cutoff = now - _timeout()
+        states = []
+        for member in self._redis.zrangebyscore(self.ACTIVE_KEY, '-inf', cutoff):
+            key, _ = self._keys(member)
+
+            def claim(pipe):
+                values = pipe.hgetall(key)
+                pipe.multi()
+                if not values or float(values['last_seen']) > cutoff:
+                    # Closed by its own final heartbeat, or heard from just now
+                    if not values:
+                        pipe.zrem(self.ACTIVE_KEY, member)
+                    return None
+                self._finish(pipe, member)
+                return self._decode(values)
+
+            state = self._redis.transaction(claim, key, value_from_callable=True)
+            if state:
+                states.append(state)
+        return states
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the configured heartbeat store (created on first use)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if getattr(settings, 'PRESENCE_BACKEND', 'local') == 'redis':
+                    _store = RedisHeartbeatStore(settings.REDIS_URL)
+                else:
+                    _store = DatabaseHeartbeatStore()
+    return _store
+
+
+def _save(state):
+    """Queue the StudySession for a finished tracking session (if it lasted a minute)"""
+    minutes = int(state['seconds'] // 60)
+    if minutes < 1:
+        return
+    event = session_event(
+        state['user_id'], minutes, state['session_type'], True, state['room_code'],
+        ended_at=datetime.fromtimestamp(state['last_seen'], dt_timezone.utc),
+    )
+    if not session_ingestor.submit(event):
+        write_sessions([event])
+
+
+def record_heartbeat(user_id, session_id, seq, final=False, discard=False, session_type='focus', room_code=None):
+    """
+    Record a heartbeat from a study page.
+    Returns (accepted, seconds counted so far); a final heartbeat saves the
+    session, a discarding one closes it without saving.
+    """
+    details = {'session_type': session_type, 'room_code': room_code or None}
+    accepted, state = get_store().record(user_id, session_id, seq, time.time(), final or discard, details)
+    if accepted and final:
+        _save(state)
+    return accepted, state['seconds'] if state else 0
+
+
+def close_idle_sessions():
+    """
+    Save the sessions of study pages that stopped sending heartbeats
+    (crashed, lost connectivity or killed without an unload beacon).
+    Returns the number of sessions closed.
+    """
+    states = get_store().close_idle(time.time())
+    for state in states:
+        _save(state)
+    if states:
+        logger.info(f"Closed {len(states)} idle study sessions")
+    return len(states)
@@ -0,0 +1,257 @@
+"""
+Write-behind ingestion for auto-tracked study sessions.
+Every open study tab beacons its minutes every few minutes and whenever it
+is hidden or closed. save_auto_session used to insert the StudySession and
+re-save the whole UserProfile inside the request; it now validates the
+beacon, queues it here and answers straight away.
+
+Queued sessions are written in batches: one bulk INSERT of the sessions,
+one rollup UPDATE per user and day, and one UPDATE per user adding the
+focus minutes to the profile (UserProfile.add_study_time). A batch is
+written SESSION_INGEST_FLUSH_INTERVAL seconds after the first queued
+session, or as soon as SESSION_INGEST_BATCH_SIZE sessions are waiting.
+
+The queue holds at most SESSION_INGEST_MAX_QUEUED sessions. Beyond that,
+sessions are appended to SESSION_INGEST_SPILL_PATH (JSON lines, picked up
+by the next flush) if it is set, or submit() refuses them and the caller
+writes them itself.
+
+A batch that fails to write is put back (spilled, or at the front of the
+queue) and retried, backing off exponentially. After
+SESSION_INGEST_MAX_RETRIES failures in a row its sessions are written one
+at a time, so a single bad session can't hold up the rest; sessions that
+still fail are dropped, each logged with its data. Sessions still in
+memory when the process dies are lost, as with chat history.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def session_event(user_id, minutes, session_type='focus', completed=True, room_code=None, ended_at=None):
+    """A queued session: what save_auto_session received, plus when"""
+    return {
+        'user_id': user_id,
+        'minutes': minutes,
+        'session_type': session_type,
+        'completed': bool(completed),
+        'room_code': room_code or None,
+        'ended_at': ended_at or timezone.now(),
+    }
+
+
+def write_sessions(events):
+    """
+    Write a batch of session events. Sessions of users deleted since they
+    were queued are dropped and unknown room codes are stored without a
+    room. Returns the number of sessions written.
+    """
+    from accounts.models import UserProfile
+    from rooms.models import Room
+    from tracker.models import StudySession
+    from tracker.rollups import record_sessions
+
+    timezones = dict(
+        UserProfile.objects.filter(user_id__in={event['user_id'] for event in events})
+        .values_list('user_id', 'timezone')
+    )
+    events = [event for event in events if event['user_id'] in timezones]
+    if not events:
+        return 0
+
+    room_codes = {event['room_code'] for event in events if event['room_code']}
+    room_ids = dict(Room.objects.filter(room_code__in=room_codes).values_list('room_code', 'id')) if room_codes else {}
+
+    focus = {}
+    for event in events:
+        if event['session_type'] == 'focus':
+            minutes, sessions = focus.get(event['user_id'], (0, 0))
+            focus[event['user_id']] = (minutes + event['minutes'], sessions + 1)
+
+    with transaction.atomic():
+        sessions = StudySession.objects.bulk_create([
+            StudySession(
+                user_id=event['user_id'],
+                room_id=room_ids.get(event['room_code']),
+                minutes=event['minutes'],
+                session_type=event['session_type'],
+                completed=event['completed'],
+                started_at=event['ended_at'] - timedelta(minutes=event['minutes']),
+                ended_at=event['ended_at'],
+            )
+            for event in events
+        ])
+        # bulk_create skips the post_save signal that keeps the rollups current
+        record_sessions(sessions, timezones)
+        for user_id, (minutes, count) in focus.items():
+            UserProfile.add_study_time(user_id, minutes, count)
+    return len(sessions)
+
+
+class SessionIngestor:
+    """
+    Per-process queue of auto-tracked sessions waiting to be written.
+    """
+
+    def __init__(self, flush_interval=None, batch_size=None, max_queued=None, spill_path=None, max_retries=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'SESSION_INGEST_FLUSH_INTERVAL', 1.0
+        )
+        self.batch_size = batch_size if batch_size is not None else getattr(
+            settings, 'SESSION_INGEST_BATCH_SIZE', 500
+        )
+        self.max_queued = max_queued if max_queued is not None else getattr(
+            settings, 'SESSION_INGEST_MAX_QUEUED', 10000
+        )
+        self.max_retries = max_retries if max_retries is not None else getattr(
+            settings, 'SESSION_INGEST_MAX_RETRIES', 5
+        )
+        spill_path = spill_path if spill_path is not None else getattr(settings, 'SESSION_INGEST_SPILL_PATH', None)
+        # One spill file per worker process
+        self.spill_path = spill_path.replace('{pid}', str(os.getpid())) if spill_path else None
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._timer = None
+        self._failures = 0   # flushes that failed in a row
+
+    def submit(self, event):
+        """
+        Queue a session event. Returns False if the queue is full and there
+        is nowhere to spill it; the caller must then write it itself.
+        """
+        with self._lock:
+            if len(self._queue) >= self.max_queued:
+                if not self.spill_path:
+                    return False
+                self._spill([event])
+            else:
+                self._queue.append(event)
+
+            if len(self._queue) >= self.batch_size:
+                self._schedule(0)
+            elif self._timer is None:
+                self._schedule(self.flush_interval)
+        return True
+
+    def _schedule(self, delay):
+        """Flush on a timer thread after `delay` seconds (call with the lock held)"""
+        if self._timer is not None:
+            if delay > 0:
+                return
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to write study sessions: {str(e)}")
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """
+        Write everything queued (and spilled) so far. Returns the number of
+        sessions written.
+        """
+        with self._lock:
+            batch = list(self._queue)
+            self._queue.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch = self._take_spilled() + batch
+        if not batch:
+            return 0
+
+        try:
+            written = write_sessions(batch)
+        except Exception:
+            return self._retry(batch)
+        self._failures = 0
+        return written
+
+    def _retry(self, batch):
+        """
+        Keep a batch that failed to write for a later flush, or once it has
+        failed max_retries times in a row, write its sessions one at a time
+        and drop those that still fail. Returns the number of sessions written.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._failures <= self.max_retries:
+                if self.spill_path:
+                    self._spill(batch)
+                else:
+                    self._queue.extendleft(reversed(batch))
+                self._schedule(self.flush_interval * 2 ** self._failures)
+                logger.exception(
+                    f"Failed to write {len(batch)} study sessions; retrying "
+                    f"(attempt {self._failures} of {self.max_retries})"
+                )
+                return 0
+            self._failures = 0
+
+        logger.exception(f"Failed to write {len(batch)} study sessions; writing them one at a time")
+        written = 0
+        for event in batch:
+            try:
+                written += write_sessions([event])
+            except Exception:
+                logger.exception(f"Dropping study session that could not be written: {event}")
+        return written
+
+    def pending(self):
+        """Number of sessions waiting in memory"""
+        return len(self._queue)
+
+    def _spill(self, events):
+        """Append events to the spill file (call with the lock held)"""
+        with open(self.spill_path, 'a', encoding='utf-8') as spill:
+            for event in events:
+                spill.write(json.dumps({**event, 'ended_at': event['ended_at'].isoformat()}) + '\n')
+
+    def _take_spilled(self):
+        """Read and remove the spill file (call with the lock held)"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return []
+        with open(self.spill_path, encoding='utf-8') as spill:
+            lines = spill.read().splitlines()
+        os.remove(self.spill_path)
+
+        events = []
+        for line in lines:
+            try:
+                event = json.loads(line)
+                event['ended_at'] = datetime.fromisoformat(event['ended_at'])
+            except (ValueError, KeyError):
+                # A line cut short by a crash mid-write
+                logger.warning(f"Skipping unreadable spilled session: {line[:100]}")
+                continue
+            events.append(event)
+        return events
+
+
+session_ingestor = SessionIngestor()
+
+
+@atexit.register
+def _flush_on_exit():
+    """Write what is still queued when the worker shuts down cleanly"""
+    if session_ingestor.pending():
+        try:
+            session_ingestor.flush()
+        except Exception as e:
+            logger.error(f"Failed to write study sessions on shutdown: {str(e)}")
@@ -0,0 +1,131 @@
+"""
+Leaderboard engine.
+All-time rankings come straight from UserProfile.total_study_minutes, kept
+current on every saved session and indexed in rank order, so a page is an
+index range and "rank of user X" is an indexed count of the users above.
+Today/week/month rankings group the daily rollups of the period, read
+through the (date, user) index: their cost grows with the number of users
+who studied in the period, not with every account.
+Rollup dates are each user's local date, so periods start on the local
+date of the user looking at the board (as on the stats pages).
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from tracker.models import DailyStudyRollup
+
+
+PERIOD_LABELS = {
+    'today': 'Today',
+    'week': 'This Week',
+    'month': 'This Month',
+    'alltime': 'All Time',
+}
+
+
+def get_period_start(period, today=None):
+    """
+    Return the first date included in the period (None for all time)
+    """
+    if today is None:
+        today = timezone.now().date()
+
+    if period == 'today':
+        return today
+    if period == 'week':
+        return today - timedelta(days=today.weekday())
+    if period == 'month':
+        return today.replace(day=1)
+    return None
+
+
+class Leaderboard:
+    """
+    Rankings by focus minutes for one period ('today', 'week', 'month' or
+    'alltime'). All-time rankings include every active user; the other
+    periods only include users who studied during the period. Pass the
+    viewer's local date as `today`.
+    """
+
+    def __init__(self, period='alltime', today=None):
+        if period not in PERIOD_LABELS:
+            period = 'alltime'
+        self.period = period
+        self.label = PERIOD_LABELS[period]
+        self.start_date = get_period_start(period, today)
+
+    def _totals(self):
+        """One row per ranked user, annotated with total_minutes"""
+        users = User.objects.filter(is_active=True)
+        if self.start_date is None:
+            # An inner join, so the rank index can drive the query
+            return users.filter(profile__isnull=False).annotate(total_minutes=F('profile__total_study_minutes'))
+        # Filtering before annotating limits the join (and the sum) to the period's rollups
+        return users.filter(daily_rollups__date__gte=self.start_date).annotate(
+            total_minutes=Sum('daily_rollups__focus_minutes')
+        ).filter(total_minutes__gt=0)
+
+    def ranked(self):
+        """
+        Queryset of ranked users, best first. Ties are broken by user id so
+        positions are stable between pages.
+        """
+        # profile__user is the same value as id, but matches the rank index's order
+        tiebreak = 'profile__user' if self.start_date is None else 'id'
+        return self._totals().select_related('profile').order_by('-total_minutes', tiebreak)
+
+    def entries(self, offset=0, limit=None):
+        """
+        Return leaderboard entries for a slice of the rankings
+        """
+        users = self.ranked()
+        users = users[offset:offset + limit] if limit is not None else users[offset:]
+        return [
+            {
+                'rank': offset + position + 1,
+                'user': user,
+                'total_minutes': user.total_minutes,
+                'total_hours': round(user.total_minutes / 60, 1),
+            }
+            for position, user in enumerate(users)
+        ]
+
+    def podium(self):
+        """Top 3 entries"""
+        return self.entries(limit=3)
+
+    def total_users(self):
+        """Number of ranked users"""
+        return self._totals().count()
+
+    def minutes_for(self, user):
+        """Focus minutes for a single user in this period"""
+        if self.start_date is None:
+            return user.profile.total_study_minutes
+        total = DailyStudyRollup.objects.filter(
+            user=user, date__gte=self.start_date
+        ).aggregate(total=Sum('focus_minutes'))['total']
+        return total or 0
+
+    def rank_of(self, user, minutes=None):
+        """
+        Return the user's 1-based position, or None if they aren't ranked
+        in this period. Counts only the users placed above them.
+        """
+        if minutes is None:
+            minutes = self.minutes_for(user)
+        if not user.is_active or (self.start_date is not None and minutes <= 0):
+            return None
+
+        if self.start_date is None:
+            # Two range scans of the rank index, counted as the profile pages do
+            above = UserProfile.objects.ahead_of(minutes, user.id).count()
+        else:
+            above = self._totals().filter(
+                Q(total_minutes__gt=minutes) | Q(total_minutes=minutes, id__lt=user.id)
+            ).count()
+        return above + 1
@@ -0,0 +1,77 @@
+"""
+Management command to rebuild daily study rollups from raw sessions
+Run with: python manage.py backfill_rollups
+"""
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tracker.models import StudySession, DailyStudyRollup
+from tracker.rollups import get_user_timezone
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DailyStudyRollup rows from StudySession history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users to rebuild per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+
+        rebuilt_rows = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch_ids = user_ids[start:start + batch_size]
+            rebuilt_rows += self.rebuild_batch(batch_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {rebuilt_rows} daily rollups for {len(user_ids)} users')
+        )
+
+    @transaction.atomic
+    def rebuild_batch(self, user_ids):
+        """
+        Recompute the rollups for a batch of users and replace their rows
+        """
+        users = User.objects.filter(id__in=user_ids).select_related('profile')
+        timezones = {user.id: get_user_timezone(user) for user in users}
+
+        totals = defaultdict(lambda: {
+            'focus_minutes': 0,
+            'completed_focus_minutes': 0,
+            'break_minutes': 0,
+            'session_count': 0,
+            'completed_count': 0,
+        })
+        sessions = StudySession.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'created_at', 'session_type', 'minutes', 'completed'
+        ).order_by()
+
+        for user_id, created_at, session_type, minutes, completed in sessions.iterator():
+            day = created_at.astimezone(timezones[user_id]).date()
+            row = totals[(user_id, day)]
+            if session_type == 'focus':
+                row['focus_minutes'] += minutes
+                if completed:
+                    row['completed_focus_minutes'] += minutes
+            else:
+                row['break_minutes'] += minutes
+            row['session_count'] += 1
+            if completed:
+                row['completed_count'] += 1
+
+        DailyStudyRollup.objects.filter(user_id__in=user_ids).delete()
+        DailyStudyRollup.objects.bulk_create([
+            DailyStudyRollup(user_id=user_id, date=day, **values)
+            for (user_id, day), values in totals.items()
+        ])
+
+        return len(totals)
@@ -0,0 +1,84 @@
+"""
+Management command to compare inline and write-behind session saving
+Run with: python manage.py benchmark_session_ingest --users 200 --beacons 5
+Replays --beacons session beacons for each of --users users two ways: the
+old inline path (StudySession insert plus UserProfile.update_study_stats()
+per beacon, all inside the request) and the write-behind path
+(tracker/ingest.py: queue the beacon in the request, write the batch
+later). Reports the time a request spends per beacon and the SQL
+statements the whole replay costs. All data is rolled back afterwards.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from tracker.ingest import SessionIngestor, session_event
+from tracker.models import StudySession
+
+
+class Rollback(Exception):
+    """Raised to undo the synthetic data once the run is measured"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark inline vs write-behind saving of auto-tracked study sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Users beaconing (default: 200)')
+        parser.add_argument('--beacons', type=int, default=5, help='Beacons per user (default: 5)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                users = [User.objects.create(username=f'bench-ingest-{number}') for number in range(options['users'])]
+                beacons = [(user, random.choice([5, 10, 25])) for user in users for _ in range(options['beacons'])]
+                random.shuffle(beacons)
+
+                with transaction.atomic():
+                    self.report('Inline', *self.inline(beacons))
+                    transaction.set_rollback(True)
+                with transaction.atomic():
+                    self.report('Write-behind', *self.write_behind(beacons))
+                    transaction.set_rollback(True)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def inline(self, beacons):
+        """What save_auto_session used to do in every request"""
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for user, minutes in beacons:
+                started_at = time.perf_counter()
+                StudySession.objects.create(user=user, minutes=minutes)
+                user.profile.update_study_stats(minutes)
+                timings.append((time.perf_counter() - started_at) * 1000)
+        return timings, len(queries.captured_queries), 0.0
+
+    def write_behind(self, beacons):
+        """Queue in the request, write one batch afterwards"""
+        ingestor = SessionIngestor(flush_interval=3600, batch_size=len(beacons) + 1, spill_path='')
+        timings = []
+        for user, minutes in beacons:
+            started_at = time.perf_counter()
+            ingestor.submit(session_event(user.id, minutes))
+            timings.append((time.perf_counter() - started_at) * 1000)
+
+        started_at = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            ingestor.flush()
+        return timings, len(queries.captured_queries), (time.perf_counter() - started_at) * 1000
+
+    def report(self, label, timings, statements, flush_ms):
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        flushed = f', batch written in {flush_ms:,.1f}ms' if flush_ms else ''
+        self.stdout.write(
+            f'{label}: {len(timings):,} beacons, request p50 {statistics.median(timings):.3f}ms, '
+            f'p95 {p95:.3f}ms; {statements:,} SQL statements{flushed}'
+        )
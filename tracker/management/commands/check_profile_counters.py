@@ -0,0 +1,92 @@
+"""
+Management command to check that profile counters survive concurrent saves
+Run with: python manage.py check_profile_counters --saves 300 --threads 32
+Fires --saves study session saves at one user's profile from --threads
+threads at once, each through its own copy of the profile (like separate
+browser tabs), with an achievement XP bonus on every fifth. Then checks
+that no increment was lost: total minutes, sessions, XP, level and streak
+must match what the saves add up to. Exits with an error if they don't.
+
+Saves run on several threads, so the data can't be rolled back: the check
+user is created in the database and deleted again afterwards. Run it
+against a migrated database.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from accounts.models import UserProfile
+
+USERNAME = 'check-profile-counters'
+
+# XP bonus awarded with every fifth save
+BONUS_XP = 5
+
+
+class Command(BaseCommand):
+    help = 'Check that concurrent study session saves never lose profile increments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--saves', type=int, default=300, help='Parallel saves (default: 300)')
+        parser.add_argument('--threads', type=int, default=32, help='Threads saving at once (default: 32)')
+
+    def handle(self, *args, **options):
+        User.objects.filter(username=USERNAME).delete()
+        user = User.objects.create(username=USERNAME)
+        try:
+            self.run(user, options['saves'], options['threads'])
+        finally:
+            user.delete()
+
+    def run(self, user, saves, threads):
+        # Studied yesterday, so the first save of today extends the streak
+        UserProfile.objects.filter(user=user).update(
+            total_xp=40, level=1, study_streak=3, longest_streak=3,
+            last_study_date=date.today() - timedelta(days=1),
+        )
+        minutes = [random.randint(1, 60) for _ in range(saves)]
+
+        def save(number):
+            try:
+                profile = UserProfile.objects.get(user=user)
+                profile.update_study_stats(minutes[number])
+                if number % 5 == 0:
+                    profile.award_xp(BONUS_XP)
+            finally:
+                close_old_connections()
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            # list() re-raises the first failed save
+            list(pool.map(save, range(saves)))
+        elapsed = time.perf_counter() - started_at
+
+        profile = UserProfile.objects.get(user=user)
+        xp = 40 + sum(minutes) + BONUS_XP * len(range(0, saves, 5))
+        expected = {
+            'total_study_minutes': sum(minutes),
+            'total_focus_sessions': saves,
+            'total_xp': xp,
+            'level': xp // 100 + 1,
+            'study_streak': 4,
+            'longest_streak': 4,
+            'last_study_date': date.today(),
+        }
+        wrong = {
+            name: (getattr(profile, name), value)
+            for name, value in expected.items() if getattr(profile, name) != value
+        }
+
+        self.stdout.write(f'{saves:,} saves on {threads} threads in {elapsed:.2f}s')
+        if wrong:
+            details = ', '.join(f'{name} {actual} (expected {value})' for name, (actual, value) in wrong.items())
+            raise CommandError(f'Lost profile updates: {details}')
+        self.stdout.write(self.style.SUCCESS(
+            f'No lost updates: {profile.total_study_minutes:,} minutes, {profile.total_xp:,} XP, '
+            f'level {profile.level}, {profile.study_streak} day streak'
+        ))
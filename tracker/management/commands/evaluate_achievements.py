@@ -0,0 +1,70 @@
+"""
+Management command to award achievements users have already earned
+Run with: python manage.py evaluate_achievements
+Useful after adding new achievements to the catalogue.
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from accounts.models import UserProfile
+from tracker.achievements import find_new_achievements, unlock_achievements
+from tracker.models import StudySession, UserAchievement
+
+
+class Command(BaseCommand):
+    help = 'Back-evaluate achievements for all users in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users to evaluate per transaction (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        profile_ids = list(UserProfile.objects.order_by('id').values_list('id', flat=True))
+
+        unlocked_count = 0
+        for start in range(0, len(profile_ids), batch_size):
+            unlocked_count += self.evaluate_batch(profile_ids[start:start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Unlocked {unlocked_count} achievements across {len(profile_ids)} users')
+        )
+
+    @transaction.atomic
+    def evaluate_batch(self, profile_ids):
+        """
+        Evaluate one batch of users with a fixed number of queries, plus an
+        insert per unlock and an atomic XP update per user who earned anything
+        """
+        profiles = list(UserProfile.objects.filter(id__in=profile_ids))
+        user_ids = [profile.user_id for profile in profiles]
+
+        unlocked = defaultdict(set)
+        for user_id, achievement_id in UserAchievement.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'achievement_id'):
+            unlocked[user_id].add(achievement_id)
+
+        longest_sessions = dict(
+            StudySession.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+                longest=Max('minutes')
+            ).order_by().values_list('user_id', 'longest')
+        )
+
+        unlocked_count = 0
+        for profile in profiles:
+            earned = find_new_achievements(
+                profile,
+                unlocked[profile.user_id],
+                longest_sessions.get(profile.user_id, 0)
+            )
+            if earned:
+                unlocked_count += len(unlock_achievements(profile, earned))
+        return unlocked_count
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0004_dailystudyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studyschedule',
+            index=models.Index(fields=['user', 'date', 'start_time'], name='tracker_sched_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studysession',
+            index=models.Index(fields=['user', 'created_at'], name='tracker_sess_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studysession',
+            index=models.Index(fields=['user', 'session_type', 'completed', 'created_at'], name='tracker_sess_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed'], name='tracker_task_user_done_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:20
+
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import migrations, models
+
+
+def fill_completed_focus_minutes(apps, schema_editor):
+    """Sum completed focus sessions into the existing rollups (same local dates)"""
+    StudySession = apps.get_model('tracker', 'StudySession')
+    DailyStudyRollup = apps.get_model('tracker', 'DailyStudyRollup')
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+
+    zones = {}
+    for user_id, tz_name in UserProfile.objects.values_list('user_id', 'timezone'):
+        try:
+            zones[user_id] = ZoneInfo(tz_name or 'UTC')
+        except (ZoneInfoNotFoundError, ValueError):
+            zones[user_id] = dt_timezone.utc
+
+    totals = defaultdict(int)
+    sessions = StudySession.objects.filter(session_type='focus', completed=True).values_list(
+        'user_id', 'created_at', 'minutes'
+    ).order_by()
+    for user_id, created_at, minutes in sessions.iterator():
+        day = created_at.astimezone(zones.get(user_id, dt_timezone.utc)).date()
+        totals[(user_id, day)] += minutes
+
+    for (user_id, day), minutes in totals.items():
+        DailyStudyRollup.objects.filter(user_id=user_id, date=day).update(completed_focus_minutes=minutes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_userprofile_total_focus_sessions'),
+        ('tracker', '0005_studyschedule_tracker_sched_user_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailystudyrollup',
+            name='completed_focus_minutes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_completed_focus_minutes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_dailystudyrollup_completed_focus_minutes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailystudyrollup',
+            index=models.Index(fields=['date', 'user'], name='tracker_rollup_date_user_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracker', '0007_dailystudyrollup_date_user_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudyHeartbeat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=64)),
+                ('seq', models.IntegerField()),
+                ('last_seen', models.FloatField()),
+                ('seconds', models.FloatField(default=0)),
+                ('session_type', models.CharField(default='focus', max_length=10)),
+                ('room_code', models.CharField(blank=True, max_length=10)),
+                ('closed_until', models.FloatField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='study_heartbeats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['closed_until', 'last_seen'], name='tracker_heartbeat_idle_idx')],
+                'unique_together': {('user', 'session_id')},
+            },
+        ),
+    ]
@@ -1,6 +1,8 @@
 """
 Tracker app models.
-Defines StudySession model for tracking study time.
+Defines StudySession model for tracking study time and the
+daily rollups derived from it, plus StudyHeartbeat for the state of
+study pages that are still open.
 """
 from django.db import models
 from django.contrib.auth.models import User
@@ -41,6 +43,15 @@ class StudySession(models.Model):
     
     class Meta:
         ordering = ['-created_at']  # Newest sessions first
+        indexes = [
+            # A user's sessions newest first (stats pages, recent sessions)
+            models.Index(fields=['user', 'created_at'], name='tracker_sess_user_created_idx'),
+            # A user's focus/break and completed sessions (totals, recent focus sessions)
+            models.Index(
+                fields=['user', 'session_type', 'completed', 'created_at'],
+                name='tracker_sess_user_type_idx'
+            ),
+        ]
 
 
 class Task(models.Model):
@@ -77,6 +88,10 @@ class Task(models.Model):
     
     class Meta:
         ordering = ['order', '-created_at']  # Order by position, then newest first
+        indexes = [
+            # Open/completed goals of a user
+            models.Index(fields=['user', 'completed'], name='tracker_task_user_done_idx'),
+        ]
     
     def __str__(self):
         status = "✓" if self.completed else "○"
@@ -164,7 +179,72 @@ class StudySchedule(models.Model):
 
     class Meta:
         ordering = ['date', 'start_time']
+        indexes = [
+            # Calendar range lookups, already in display order
+            models.Index(fields=['user', 'date', 'start_time'], name='tracker_sched_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title} on {self.date}"
 
+
+
+class DailyStudyRollup(models.Model):
+    """
+    Per-user, per-day totals of study sessions.
+    The date is the user's local date (UserProfile.timezone). Rows are kept
+    up to date by tracker.signals whenever a StudySession is created or
+    deleted, so stats pages can read a handful of rows instead of
+    re-aggregating the whole session table.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    
+    focus_minutes = models.IntegerField(default=0)
+    completed_focus_minutes = models.IntegerField(default=0)  # Focus sessions not stopped early
+    break_minutes = models.IntegerField(default=0)
+    session_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('user', 'date')  # Also serves as the (user, date) range index
+        ordering = ['-date']
+        indexes = [
+            # Period leaderboards read every user's rollups from a date on
+            models.Index(fields=['date', 'user'], name='tracker_rollup_date_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.date}: {self.total_minutes} min"
+    
+    @property
+    def total_minutes(self):
+        """Focus and break minutes combined"""
+        return self.focus_minutes + self.break_minutes
+
+
+class StudyHeartbeat(models.Model):
+    """
+    State of an open study tracking session, when heartbeats aren't shared
+    through Redis (see tracker/heartbeats.py). Every worker reads and
+    updates the same rows, whichever one a heartbeat reaches. A closed
+    session keeps its row until closed_until, so late beacons can't reopen it.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='study_heartbeats')
+    session_id = models.CharField(max_length=64)  # Chosen by the study page
+    seq = models.IntegerField()  # Highest heartbeat number seen
+    last_seen = models.FloatField()  # Unix time of the last heartbeat
+    seconds = models.FloatField(default=0)  # Time counted so far
+    session_type = models.CharField(max_length=10, default='focus')
+    room_code = models.CharField(max_length=10, blank=True)
+    closed_until = models.FloatField(null=True, blank=True)  # Unix time; set when the session is closed
+    
+    class Meta:
+        unique_together = ('user', 'session_id')
+        indexes = [
+            # The sweep looks for open sessions not heard from lately
+            models.Index(fields=['closed_until', 'last_seen'], name='tracker_heartbeat_idle_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.session_id} ({self.seconds:.0f}s)"
@@ -0,0 +1,159 @@
+"""
+Daily study rollups.
+Keeps DailyStudyRollup rows in sync with StudySession inserts/deletes and
+provides the read helpers used by the stats views.
+"""
+from datetime import datetime, time, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from tracker.models import DailyStudyRollup
+
+
+def get_user_timezone(user):
+    """
+    Return the tzinfo for the user's profile timezone.
+    Falls back to UTC if the user has no profile or an unknown timezone name.
+    """
+    try:
+        tz_name = user.profile.timezone
+    except Exception:
+        return dt_timezone.utc
+    return zone_for(tz_name)
+
+
+def zone_for(tz_name):
+    """tzinfo for a timezone name, UTC if it is empty or unknown"""
+    try:
+        return ZoneInfo(tz_name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
+
+
+def local_date(user, dt=None):
+    """
+    Convert a datetime (default: now) to the user's local date
+    """
+    if dt is None:
+        dt = timezone.now()
+    return dt.astimezone(get_user_timezone(user)).date()
+
+
+def local_day_start(user, day):
+    """
+    Return the aware datetime at which the user's local `day` begins
+    """
+    return datetime.combine(day, time.min, tzinfo=get_user_timezone(user))
+
+
+def _session_deltas(session, sign):
+    """Build the per-column deltas a single session contributes"""
+    is_focus = session.session_type == 'focus'
+    return {
+        'focus_minutes': sign * session.minutes if is_focus else 0,
+        'completed_focus_minutes': sign * session.minutes if is_focus and session.completed else 0,
+        'break_minutes': 0 if is_focus else sign * session.minutes,
+        'session_count': sign,
+        'completed_count': sign if session.completed else 0,
+    }
+
+
+def _add_to_rollup(user_id, day, deltas):
+    """
+    Add deltas to a user's rollup for a day.
+    Uses an F-expression UPDATE, creating the row on first use.
+    """
+    rollups = DailyStudyRollup.objects.filter(user_id=user_id, date=day)
+    updates = {field: F(field) + value for field, value in deltas.items()}
+
+    if rollups.update(**updates):
+        return
+
+    try:
+        with transaction.atomic():
+            DailyStudyRollup.objects.create(user_id=user_id, date=day, **deltas)
+    except IntegrityError:
+        # Another request created the row first
+        rollups.update(**updates)
+
+
+def record_session(session):
+    """
+    Add a newly created session to its day's rollup.
+    """
+    day = local_date(session.user, session.created_at)
+    _add_to_rollup(session.user_id, day, _session_deltas(session, 1))
+
+
+def record_sessions(sessions, timezones):
+    """
+    Add a batch of sessions created without signals (bulk_create) to their
+    rollups, with one UPDATE per user and day. `timezones` maps user id to
+    the profile's timezone name.
+    """
+    totals = {}
+    for session in sessions:
+        day = session.created_at.astimezone(zone_for(timezones.get(session.user_id))).date()
+        day_totals = totals.setdefault((session.user_id, day), dict.fromkeys(
+            ('focus_minutes', 'completed_focus_minutes', 'break_minutes', 'session_count', 'completed_count'), 0
+        ))
+        for field, value in _session_deltas(session, 1).items():
+            day_totals[field] += value
+
+    for (user_id, day), deltas in totals.items():
+        _add_to_rollup(user_id, day, deltas)
+
+
+def forget_session(session):
+    """
+    Subtract a deleted session from its day's rollup.
+    Never creates rows (the user itself may be in the middle of being deleted).
+    """
+    try:
+        user = session.user
+    except Exception:
+        return
+
+    day = local_date(user, session.created_at)
+    deltas = _session_deltas(session, -1)
+    DailyStudyRollup.objects.filter(user_id=session.user_id, date=day).update(
+        **{field: F(field) + value for field, value in deltas.items()}
+    )
+
+
+def _daily_rollups(user, start_date, end_date):
+    return DailyStudyRollup.objects.filter(
+        user=user,
+        date__gte=start_date,
+        date__lte=end_date
+    )
+
+
+def get_daily_totals(user, start_date, end_date):
+    """
+    Return {date: DailyStudyRollup} for the user's local dates in
+    [start_date, end_date] - a single range scan on (user, date).
+    """
+    return {rollup.date: rollup for rollup in _daily_rollups(user, start_date, end_date)}
+
+
+async def aget_daily_totals(user, start_date, end_date):
+    """Async version of get_daily_totals()"""
+    return {rollup.date: rollup async for rollup in _daily_rollups(user, start_date, end_date)}
+
+
+def get_lifetime_totals(user):
+    """
+    Return lifetime sums (focus_minutes, break_minutes, session_count,
+    completed_count) for the user from their rollups.
+    """
+    totals = DailyStudyRollup.objects.filter(user=user).aggregate(
+        focus_minutes=Sum('focus_minutes'),
+        break_minutes=Sum('break_minutes'),
+        session_count=Sum('session_count'),
+        completed_count=Sum('completed_count'),
+    )
+    return {key: value or 0 for key, value in totals.items()}
@@ -0,0 +1,37 @@
+"""
+Signals for the tracker app.
+Keeps the daily study rollups in sync with StudySession rows and the
+cached achievement catalogue in sync with Achievement rows.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import StudySession, Achievement
+from .achievements import invalidate_catalogue
+from .rollups import record_session, forget_session
+
+
+@receiver(post_save, sender=StudySession)
+def add_session_to_rollup(sender, instance, created, **kwargs):
+    """
+    Count a new session towards its day's rollup.
+    Later saves (e.g. linking a task) don't change the totals.
+    """
+    if created:
+        record_session(instance)
+
+
+@receiver(post_delete, sender=StudySession)
+def remove_session_from_rollup(sender, instance, **kwargs):
+    """
+    Take a deleted session back out of its day's rollup.
+    """
+    forget_session(instance)
+
+
+@receiver(post_save, sender=Achievement)
+@receiver(post_delete, sender=Achievement)
+def reset_achievement_catalogue(sender, **kwargs):
+    """
+    Drop the cached catalogue whenever an achievement is added, edited or removed.
+    """
+    invalidate_catalogue()
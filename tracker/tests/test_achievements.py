@@ -0,0 +1,67 @@
+"""
+Tests for unlocking achievements (tracker/achievements.py).
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from accounts.models import UserProfile
+from tracker import achievements
+from tracker.achievements import evaluate_achievements, invalidate_catalogue
+from tracker.models import Achievement, UserAchievement
+
+
+class UnlockAchievementsTests(TestCase):
+
+    def setUp(self):
+        self.achievement = Achievement.objects.create(
+            name='Ten minutes', description='Study for 10 minutes',
+            criteria_type='total_minutes', criteria_value=10, xp_reward=50,
+        )
+        self.addCleanup(invalidate_catalogue)
+        self.user = User.objects.create_user('achiever')
+        UserProfile.objects.filter(user=self.user).update(total_study_minutes=30, total_xp=30)
+
+    def fresh_user(self):
+        """The user as another request would load it"""
+        return User.objects.select_related('profile').get(pk=self.user.pk)
+
+    def assert_paid_once(self):
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(UserAchievement.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(profile.total_xp, 30 + 50)
+
+    def test_unlocking_again_pays_nothing(self):
+        first = evaluate_achievements(self.fresh_user())
+        second = evaluate_achievements(self.fresh_user())
+
+        self.assertEqual([unlock.achievement for unlock in first], [self.achievement])
+        self.assertEqual(second, [])
+        self.assert_paid_once()
+
+    def test_concurrent_unlock_of_the_same_achievement_is_paid_once(self):
+        find_new_achievements = achievements.find_new_achievements
+
+        def racing(profile, unlocked_ids, longest_session=0):
+            earned = find_new_achievements(profile, unlocked_ids, longest_session)
+            # Another request unlocks the same achievement between our read and our insert
+            with mock.patch.object(achievements, 'find_new_achievements', find_new_achievements):
+                evaluate_achievements(self.fresh_user())
+            return earned
+
+        user = self.fresh_user()
+        with mock.patch.object(achievements, 'find_new_achievements', racing):
+            unlocked = evaluate_achievements(user)
+
+        self.assertEqual(unlocked, [])
+        self.assert_paid_once()
+        # The XP counted in memory for the skipped unlock is dropped too
+        self.assertEqual(user.profile.total_xp, 30 + 50)
+        self.assertEqual(user.profile.get_dirty_fields(), [])
+
+    def test_back_evaluation_skips_achievements_already_unlocked(self):
+        evaluate_achievements(self.fresh_user())
+        call_command('evaluate_achievements', stdout=mock.Mock())
+        self.assert_paid_once()
@@ -0,0 +1,66 @@
+"""
+Tests for study session heartbeats kept in the database (tracker/heartbeats.py).
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from tracker import heartbeats
+from tracker.heartbeats import DatabaseHeartbeatStore, close_idle_sessions
+from tracker.ingest import session_ingestor
+from tracker.models import StudyHeartbeat, StudySession
+
+DETAILS = {'session_type': 'focus', 'room_code': None}
+
+
+@override_settings(STUDY_HEARTBEAT_INTERVAL=60, STUDY_HEARTBEAT_TIMEOUT=180)
+class DatabaseHeartbeatStoreTests(TestCase):
+    """Two workers, each with its own store, receiving heartbeats of the same pages"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('heartbeat')
+        self.workers = [DatabaseHeartbeatStore(), DatabaseHeartbeatStore()]
+
+    def beat(self, worker, seq, now, close=False, session_id='tab-00000001'):
+        return self.workers[worker].record(self.user.id, session_id, seq, now, close, DETAILS)
+
+    def test_heartbeats_split_across_workers_add_up(self):
+        for seq in range(6):
+            accepted, state = self.beat(seq % 2, seq, 1000 + seq * 60)
+            self.assertTrue(accepted)
+        self.assertEqual(state['seconds'], 300)
+
+        # A retried beacon reaching the other worker is a duplicate
+        accepted, state = self.beat(0, 5, 1400)
+        self.assertFalse(accepted)
+        self.assertEqual(state['seconds'], 300)
+
+    def test_idle_session_is_closed_once_with_all_its_time(self):
+        for seq in range(4):
+            self.beat(seq % 2, seq, 1000 + seq * 60)
+
+        # Not idle yet for either worker, however the heartbeats were spread
+        self.assertEqual(self.workers[1].close_idle(1180 + 179), [])
+        closed = self.workers[1].close_idle(1180 + 180)
+        self.assertEqual([state['seconds'] for state in closed], [180])
+        self.assertEqual(self.workers[0].close_idle(1180 + 181), [])
+
+        # A late beacon can't reopen it
+        self.assertEqual(self.beat(0, 4, 1400), (False, None))
+
+    def test_closed_sessions_are_forgotten_after_a_while(self):
+        self.beat(0, 0, 1000)
+        self.beat(1, 1, 1060, close=True)
+        self.workers[0].close_idle(1060 + 1800)
+        self.assertFalse(StudyHeartbeat.objects.exists())
+
+    def test_sweep_saves_the_session(self):
+        store = DatabaseHeartbeatStore()
+        with mock.patch.object(heartbeats, '_store', store), mock.patch('time.time', return_value=2000.0):
+            store.record(self.user.id, 'tab-00000002', 0, 1000, False, DETAILS)
+            store.record(self.user.id, 'tab-00000002', 1, 1120, False, DETAILS)
+            self.assertEqual(close_idle_sessions(), 1)
+        session_ingestor.flush()
+
+        self.assertEqual(list(StudySession.objects.filter(user=self.user).values_list('minutes', flat=True)), [2])
@@ -0,0 +1,65 @@
+"""
+Tests for the write-behind session queue (tracker/ingest.py) when writes fail.
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import TestCase
+
+from tracker import ingest
+from tracker.ingest import SessionIngestor, session_event
+from tracker.models import StudySession
+
+
+class SessionIngestorFailureTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('ingester')
+        # Only explicit flushes: the timer is never left to fire
+        self.ingestor = SessionIngestor(flush_interval=3600, spill_path='', max_retries=2)
+        self.addCleanup(self.cancel_timer)
+
+    def cancel_timer(self):
+        if self.ingestor._timer is not None:
+            self.ingestor._timer.cancel()
+
+    def submit(self, *minutes):
+        for value in minutes:
+            self.ingestor.submit(session_event(self.user.id, value))
+
+    def written_minutes(self):
+        return sorted(StudySession.objects.filter(user=self.user).values_list('minutes', flat=True))
+
+    def test_failed_batch_is_requeued_ahead_of_new_sessions(self):
+        self.submit(10, 20)
+        with mock.patch.object(ingest, 'write_sessions', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('tracker.ingest', 'ERROR'):
+                self.assertEqual(self.ingestor.flush(), 0)
+        self.submit(30)
+
+        self.assertEqual([event['minutes'] for event in self.ingestor._queue], [10, 20, 30])
+        self.assertIsNotNone(self.ingestor._timer)
+        self.assertEqual(self.ingestor.flush(), 3)
+        self.assertEqual(self.written_minutes(), [10, 20, 30])
+        self.assertEqual(self.ingestor._failures, 0)
+
+    def test_batch_is_written_one_at_a_time_after_the_retries(self):
+        write_sessions = ingest.write_sessions
+
+        def failing(events):
+            # One bad session makes every batch it is in fail
+            if any(event['minutes'] == 13 for event in events):
+                raise OperationalError('constraint failed')
+            return write_sessions(events)
+
+        self.submit(10, 13, 20)
+        with mock.patch.object(ingest, 'write_sessions', side_effect=failing):
+            with self.assertLogs('tracker.ingest', 'ERROR') as logs:
+                self.assertEqual(self.ingestor.flush(), 0)
+                self.assertEqual(self.ingestor.flush(), 0)
+                self.assertEqual(self.ingestor.flush(), 2)
+
+        self.assertEqual(self.written_minutes(), [10, 20])
+        self.assertEqual(self.ingestor.pending(), 0)
+        self.assertIn("'minutes': 13", logs.output[-1])
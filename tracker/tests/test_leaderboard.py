@@ -0,0 +1,38 @@
+"""
+Tests for all-time ranks (tracker/leaderboard.py and UserProfile.get_study_rank).
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from accounts.models import UserProfile
+from tracker.leaderboard import Leaderboard
+
+
+class AllTimeRankTests(TestCase):
+
+    def setUp(self):
+        self.users = {}
+        for username, minutes, active in [
+            ('first', 300, True),
+            ('tied-early', 120, True),
+            ('tied-late', 120, True),
+            ('inactive', 500, False),
+            ('last', 0, True),
+        ]:
+            user = User.objects.create_user(username, is_active=active)
+            UserProfile.objects.filter(user=user).update(total_study_minutes=minutes)
+            self.users[username] = User.objects.select_related('profile').get(pk=user.pk)
+
+    def test_profile_rank_matches_the_leaderboard(self):
+        board = Leaderboard('alltime')
+        positions = {entry['user'].username: entry['rank'] for entry in board.entries()}
+
+        self.assertEqual(positions, {'first': 1, 'tied-early': 2, 'tied-late': 3, 'last': 4})
+        for username, rank in positions.items():
+            user = self.users[username]
+            self.assertEqual(board.rank_of(user), rank)
+            self.assertEqual(user.profile.get_study_rank(), rank)
+
+    def test_total_users_counts_only_ranked_users(self):
+        board = Leaderboard('alltime')
+        self.assertEqual(board.total_users(), len(board.entries()))
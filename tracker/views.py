@@ -5,14 +5,19 @@ Handles study progress tracking and saving study sessions.
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
 from .models import StudySession, Achievement
+from .rollups import get_daily_totals, local_date
+from .leaderboard import Leaderboard
 from rooms.models import Room
-from django.contrib.auth.models import User
+from virtualcafe.query_budget import query_budget
 
+# Number of ranked users shown per leaderboard page
+LEADERBOARD_PAGE_SIZE = 50
 
+
+@query_budget(queries=7, time_ms=50)
 @login_required
 def progress_view(request):
     """
@@ -20,23 +25,24 @@ def progress_view(request):
     Shows today's total, this week's total, and last 7 days breakdown.
     """
     user = request.user
-    now = timezone.now()
-    today = now.date()
+    today = local_date(user)
+    week_start = today - timedelta(days=today.weekday())  # Monday of current week
+    
+    # One range scan over the daily rollups covers today, this week and the chart
+    first_day = min(week_start, today - timedelta(days=6))
+    daily_totals = get_daily_totals(user, first_day, today)
+    
+    def minutes_on(day):
+        rollup = daily_totals.get(day)
+        return rollup.total_minutes if rollup else 0
     
     # Calculate today's total minutes
-    today_sessions = StudySession.objects.filter(
-        user=user,
-        created_at__date=today
-    )
-    today_total = today_sessions.aggregate(Sum('minutes'))['minutes__sum'] or 0
+    today_total = minutes_on(today)
     
     # Calculate this week's total minutes
-    week_start = today - timedelta(days=today.weekday())  # Monday of current week
-    week_sessions = StudySession.objects.filter(
-        user=user,
-        created_at__date__gte=week_start
+    week_total = sum(
+        rollup.total_minutes for day, rollup in daily_totals.items() if day >= week_start
     )
-    week_total = week_sessions.aggregate(Sum('minutes'))['minutes__sum'] or 0
     
     # Get last 7 days data for charts
     last_7_days = []
@@ -44,11 +50,7 @@ def progress_view(request):
     
     for i in range(6, -1, -1):  # 6 days ago to today
         day = today - timedelta(days=i)
-        day_sessions = StudySession.objects.filter(
-            user=user,
-            created_at__date=day
-        )
-        day_total = day_sessions.aggregate(Sum('minutes'))['minutes__sum'] or 0
+        day_total = minutes_on(day)
         day_hours = round(day_total / 60, 1)
         
         # Calculate productivity percentage (normalized to 0-100)
@@ -115,6 +117,7 @@ def progress_view(request):
     return render(request, 'tracker/progress.html', context)
 
 
+@query_budget(queries=9, time_ms=50, method='POST', data={'minutes': 25})
 @login_required
 def save_session_view(request):
     """
@@ -167,63 +170,40 @@ def save_session_view(request):
     return redirect('home')
 
 
+@query_budget(queries=10, time_ms=100)
 @login_required
 def leaderboard_view(request):
     """
     Display the leaderboard showing top users by study time.
     """
     period = request.GET.get('period', 'alltime')
-    now = timezone.now()
-    
-    # Determine date filter based on period
-    if period == 'today':
-        start_date = now.date()
-        period_label = "Today"
-    elif period == 'week':
-        start_date = now.date() - timedelta(days=now.weekday())
-        period_label = "This Week"
-    elif period == 'month':
-        start_date = now.date().replace(day=1)
-        period_label = "This Month"
-    else:  # alltime
-        start_date = None
-        period_label = "All Time"
+    # Rollups are kept by local date, so periods start on the viewer's local date
+    board = Leaderboard(period, today=local_date(request.user))
+    period = board.period
+    period_label = board.label
     
-    # Get all users with their study time
-    users_query = User.objects.filter(is_active=True)
-    
-    leaderboard = []
-    for user in users_query:
-        # Calculate total study minutes for this period
-        sessions = StudySession.objects.filter(user=user)
-        if start_date:
-            sessions = sessions.filter(created_at__date__gte=start_date)
-        
-        total_minutes = sessions.aggregate(Sum('minutes'))['minutes__sum'] or 0
-        total_hours = round(total_minutes / 60, 1)
-        
-        if total_hours > 0 or period == 'alltime':  # Show users with study time
-            leaderboard.append({
-                'user': user,
-                'total_minutes': total_minutes,
-                'total_hours': total_hours,
-            })
+    # Page through the rankings instead of rendering every user
+    total_users = board.total_users()
+    total_pages = max(1, (total_users + LEADERBOARD_PAGE_SIZE - 1) // LEADERBOARD_PAGE_SIZE)
+    try:
+        page = min(max(1, int(request.GET.get('page', 1))), total_pages)
+    except (TypeError, ValueError):
+        page = 1
     
-    # Sort by total minutes descending
-    leaderboard.sort(key=lambda x: x['total_minutes'], reverse=True)
+    offset = (page - 1) * LEADERBOARD_PAGE_SIZE
+    leaderboard = board.entries(offset=offset, limit=LEADERBOARD_PAGE_SIZE)
     
-    # Get top 3 for podium
-    top_users = leaderboard[:3]
+    # Get top 3 for podium (already loaded when on the first page)
+    top_users = leaderboard[:3] if page == 1 else board.podium()
     
     # Find current user's rank
-    user_rank = next((i + 1 for i, entry in enumerate(leaderboard) if entry['user'].id == request.user.id), len(leaderboard))
-    user_entry = next((entry for entry in leaderboard if entry['user'].id == request.user.id), {'total_hours': 0})
-    user_hours = user_entry['total_hours']
+    user_minutes = board.minutes_for(request.user)
+    user_hours = round(user_minutes / 60, 1)
+    user_rank = board.rank_of(request.user, minutes=user_minutes) or total_users
     
     # Calculate stats
     top_hours = top_users[0]['total_hours'] if top_users else 0
     hours_to_top = max(0, top_hours - user_hours)
-    total_users = len(leaderboard)
     
     # Get recent achievements for current user
     recent_achievements = []
@@ -258,11 +238,16 @@ def leaderboard_view(request):
         'recent_achievements': recent_achievements,
         'period': period,
         'period_label': period_label,
+        'page': page,
+        'total_pages': total_pages,
+        'has_previous': page > 1,
+        'has_next': page < total_pages,
     }
     
     return render(request, 'tracker/leaderboard.html', context)
 
 
+@query_budget(queries=5, time_ms=50, params={'start': '2000-01-01', 'end': '2100-01-01'})
 @login_required
 def get_schedules(request):
     """
@@ -299,6 +284,10 @@ def get_schedules(request):
     return JsonResponse({'schedules': data})
 
 
+@query_budget(
+    queries=5, time_ms=50, method='POST',
+    json={'title': 'Revision', 'date': '2030-01-01', 'start_time': '09:00', 'end_time': '10:00'}
+)
 @login_required
 def create_schedule(request):
     """
@@ -307,6 +296,7 @@ def create_schedule(request):
     """
     from .models import StudySchedule
     from django.http import JsonResponse
+    from django.utils.dateparse import parse_date, parse_time
     import json
 
     if request.method != 'POST':
@@ -327,6 +317,16 @@ def create_schedule(request):
     if not title or not date or not start_time or not end_time:
         return JsonResponse({'error': 'title, date, start_time, end_time are required'}, status=400)
 
+    # Parse up front so the response below can format them (and bad values are a 400)
+    try:
+        date = parse_date(date)
+        start_time = parse_time(start_time)
+        end_time = parse_time(end_time)
+    except ValueError:
+        date = None
+    if not date or not start_time or not end_time:
+        return JsonResponse({'error': 'Invalid date or time'}, status=400)
+
     schedule = StudySchedule.objects.create(
         user=request.user,
         title=title,
@@ -349,6 +349,7 @@ def create_schedule(request):
     }, status=201)
 
 
+@query_budget(queries=6, time_ms=50, method='POST')
 @login_required
 def delete_schedule(request, schedule_id):
     """
@@ -369,6 +370,7 @@ def delete_schedule(request, schedule_id):
     return JsonResponse({'success': True})
 
 
+@query_budget(queries=6, time_ms=50, method='POST')
 @login_required
 def toggle_schedule(request, schedule_id):
     """
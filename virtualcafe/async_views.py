@@ -0,0 +1,103 @@
+"""
+Helpers for async views and consumers.
+Django 4.2 can run `async def` views natively under ASGI and its ORM has
+async methods (aget, acreate, aaggregate, ...), but the stock view
+decorators (login_required, require_POST, csrf_exempt) wrap views in plain
+functions and request.user can't be loaded from async code. The
+async_* decorators here are drop-in replacements for async views:
+
+    @query_budget(queries=5, time_ms=50)
+    @async_login_required
+    async def get_tasks(request):
+        user = await aget_user(request)
+        ...
+
+Blocking work that has no async API (presence lookups, consumers' database
+writes) goes to run_in_pool(), a thread pool of settings.SYNC_WORKER_THREADS
+threads, instead of the single thread every consumer would otherwise queue on.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+
+from asgiref.sync import sync_to_async
+from channels.db import DatabaseSyncToAsync
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotAllowed
+from django.utils.log import log_response
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def sync_executor():
+    """The shared pool blocking work from async code runs on"""
+    return ThreadPoolExecutor(
+        max_workers=getattr(settings, 'SYNC_WORKER_THREADS', 8),
+        thread_name_prefix='sync-worker'
+    )
+
+
+def run_in_pool(func):
+    """
+    Like channels' database_sync_to_async (usable as a decorator too), but
+    the call runs on the sized pool rather than asgiref's single global
+    thread, so concurrent consumers don't wait on each other.
+    """
+    return DatabaseSyncToAsync(func, thread_sensitive=False, executor=sync_executor())
+
+
+async def aget_user(request):
+    """Load request.user without blocking the event loop (request.auser() in Django 5)"""
+    if not hasattr(request, '_cached_user'):
+        # The lazy request.user set by AuthenticationMiddleware reads the same cache
+        request._cached_user = await sync_to_async(auth.get_user)(request)
+    return request._cached_user
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """Async get_object_or_404() for a model's manager or queryset"""
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+def async_login_required(view):
+    """login_required for async views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_require_POST(view):
+    """require_POST for async views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            response = HttpResponseNotAllowed(['POST'])
+            log_response(
+                'Method Not Allowed (%s): %s', request.method, request.path,
+                response=response, request=request
+            )
+            return response
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_csrf_exempt(view):
+    """csrf_exempt for async views"""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        return await view(*args, **kwargs)
+
+    wrapper.csrf_exempt = True
+    return wrapper
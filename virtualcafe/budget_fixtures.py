@@ -0,0 +1,102 @@
+"""
+Fixture dataset for query budget checks.
+Builds enough of everything (users with study history, rooms, memberships,
+goals, schedules, notifications, chat) that a view doing one query per row
+visibly blows its budget. Data is created through the models, so signals
+(profiles, rollups, search index) run as they would in production; call it
+inside a transaction and roll back afterwards.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+def populate(users=40, rooms_per_user=2, sessions_per_user=12, seed=7):
+    """
+    Create the dataset and return a dict with the signed-in `user` and
+    `url_kwargs` for budgeted views with URL parameters.
+    """
+    from notifications.models import Notification
+    from rooms.models import ChatMessage, Room, RoomMembership
+    from tracker.achievements import evaluate_achievements
+    from tracker.models import Achievement, StudySchedule, StudySession, Task
+
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    people = [User.objects.create_user(f'budget-user-{number}', password='budget') for number in range(users)]
+    user = people[0]
+
+    rooms = []
+    for owner in people:
+        for number in range(rooms_per_user):
+            rooms.append(Room.objects.create(
+                name=f'{owner.username} study room {number}',
+                description='Fixture room for query budget checks',
+                created_by=owner,
+            ))
+
+    # Owners are members of their rooms (as create_room_view makes them);
+    # everyone joins a few rooms and the signed-in user joins more
+    for room in rooms:
+        RoomMembership.objects.create(user=room.created_by, room=room)
+    for member in people:
+        joined = rng.sample(rooms, 10 if member == user else 3)
+        for room in joined:
+            RoomMembership.objects.get_or_create(user=member, room=room)
+    for room in rooms:
+        Room.objects.filter(id=room.id).update(active_member_count=rng.randint(0, 6))
+
+    for member in people:
+        for number in range(sessions_per_user):
+            session = StudySession.objects.create(
+                user=member,
+                room=rng.choice(rooms),
+                minutes=rng.choice([25, 50]),
+                session_type=rng.choice(['focus', 'focus', 'break']),
+                completed=rng.random() > 0.2,
+            )
+            # Spread the history over the last two weeks
+            StudySession.objects.filter(id=session.id).update(
+                created_at=now - timedelta(days=number % 14, hours=rng.randint(0, 12))
+            )
+            if session.session_type == 'focus':
+                member.profile.update_study_stats(session.minutes)
+
+    for criteria_type, value in [('first_session', 1), ('total_minutes', 60), ('total_sessions', 5)]:
+        Achievement.objects.create(
+            name=f'Fixture {criteria_type}', description='Fixture achievement',
+            criteria_type=criteria_type, criteria_value=value,
+        )
+    evaluate_achievements(user)
+
+    for number in range(15):
+        Task.objects.create(user=user, title=f'Fixture goal {number}', completed=number % 3 == 0)
+    for number in range(10):
+        StudySchedule.objects.create(
+            user=user, title=f'Fixture block {number}', date=(now + timedelta(days=number % 7)).date(),
+            start_time=(now + timedelta(hours=number)).time(), end_time=(now + timedelta(hours=number + 1)).time(),
+        )
+
+    own_room = next(room for room in rooms if room.created_by == user)
+    for sender in people[1:16]:
+        Notification.create_new_member_notification(room_owner=user, new_member=sender, room=own_room)
+    Notification.objects.filter(recipient=user, id__in=Notification.objects.filter(
+        recipient=user
+    ).values('id')[:5]).update(is_read=True, read_at=now)
+
+    for number in range(60):
+        ChatMessage.objects.create(room=own_room, user=rng.choice(people[:6]), message=f'Fixture message {number}')
+
+    return {
+        'user': user,
+        'url_kwargs': {
+            'room_code': own_room.room_code,
+            'username': people[1].username,
+            'task_id': Task.objects.filter(user=user).first().id,
+            'schedule_id': StudySchedule.objects.filter(user=user).first().id,
+            'notification_id': Notification.objects.filter(recipient=user).first().id,
+        },
+    }
@@ -0,0 +1,200 @@
+"""
+Query budgets for views.
+Hot views declare how many SQL queries (and optionally how many
+milliseconds of SQL time) one request may cost, right next to the view:
+
+    @query_budget(queries=12, time_ms=50)
+    @login_required
+    def home_view(request):
+        ...
+
+`python manage.py check_query_budgets` requests every budgeted view against
+the fixture dataset in virtualcafe/budget_fixtures.py and fails if any of
+them goes over, so an N+1 regression breaks the check instead of slowly
+degrading production. With DEBUG on, the decorator also logs a warning for
+every request that goes over its budget. It works on async views too.
+
+assert_query_budget() is the same check as a context manager, for use in
+shells and scripts:
+
+    with assert_query_budget(queries=5):
+        leaderboard.entries(limit=50)
+
+Queries are recorded by QueryLog, which times each one itself: Django's
+debug cursor only logs with DEBUG on and rounds times to the millisecond,
+so fast queries would all count as 0ms.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# Literals replaced when grouping queries by shape (to spot N+1 patterns)
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view or block of code ran more (or slower) SQL than its budget allows"""
+
+
+class QueryLog:
+    """
+    Records the queries run on a connection inside the block, each with its
+    SQL and wall time (time.perf_counter() around the database call):
+
+        with QueryLog(connection) as log:
+            ...
+        len(log), log.time_ms
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.queries = []   # {'sql': ..., 'time_ms': ...} in the order they ran
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({'sql': sql, 'time_ms': (time.perf_counter() - started_at) * 1000})
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._wrapper.__exit__(exc_type, exc_value, traceback)
+        self._wrapper = None
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def time_ms(self):
+        """Total SQL time in milliseconds"""
+        return sum(query['time_ms'] for query in self.queries)
+
+
+class QueryBudget:
+    """
+    Maximum SQL cost of one request to a view, plus how the budget check
+    should request it (method, query string and POST body).
+    """
+
+    def __init__(self, queries, time_ms=None, method='GET', params=None, data=None, json=None):
+        self.queries = queries
+        self.time_ms = time_ms
+        self.method = method
+        self.params = params or {}
+        self.data = data
+        self.json = json
+
+    def __str__(self):
+        if self.time_ms is None:
+            return f'{self.queries} queries'
+        return f'{self.queries} queries / {self.time_ms}ms'
+
+    def overruns(self, log):
+        """What the logged queries exceed, as a list of messages (empty if within budget)"""
+        problems = []
+        count = len(log)
+        if count > self.queries:
+            problems.append(f'{count} queries (budget {self.queries})')
+        if self.time_ms is not None:
+            elapsed = log.time_ms
+            if elapsed > self.time_ms:
+                problems.append(f'{elapsed:.1f}ms of SQL (budget {self.time_ms}ms)')
+        return problems
+
+
+def repeated_queries(log, minimum=2):
+    """[(count, query shape)] for queries run at least `minimum` times with different literals"""
+    shapes = Counter(LITERALS.sub('?', query['sql']) for query in log.queries)
+    return [(count, shape) for shape, count in shapes.most_common() if count >= minimum]
+
+
+def describe(log, problems):
+    """Overrun message listing the queries that repeat"""
+    lines = [', '.join(problems)]
+    for count, shape in repeated_queries(log):
+        lines.append(f'  {count}x {shape}')
+    return '\n'.join(lines)
+
+
+@contextmanager
+def assert_query_budget(queries, time_ms=None, using=DEFAULT_DB_ALIAS):
+    """
+    Raise QueryBudgetExceeded if the block runs more than `queries` queries
+    (or more than `time_ms` milliseconds of SQL).
+    """
+    budget = QueryBudget(queries, time_ms)
+    with QueryLog(connections[using]) as log:
+        yield log
+    problems = budget.overruns(log)
+    if problems:
+        raise QueryBudgetExceeded(describe(log, problems))
+
+
+def query_budget(queries, time_ms=None, method='GET', params=None, data=None, json=None):
+    """
+    Declare a view's query budget. `method`, `params` (query string), `data`
+    (form POST) and `json` (JSON POST body) tell check_query_budgets how to
+    request the view.
+    """
+    budget = QueryBudget(queries, time_ms, method, params, data, json)
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not settings.DEBUG:
+                    return await view(request, *args, **kwargs)
+
+                # The async ORM runs queries on the request's sync thread (each
+                # thread has its own connection), so capture them there
+                log = await sync_to_async(_start_log)()
+                try:
+                    response = await view(request, *args, **kwargs)
+                finally:
+                    await sync_to_async(log.__exit__)(None, None, None)
+                _warn_if_over(budget, request, log)
+                return response
+
+            async_wrapper.query_budget = budget
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not settings.DEBUG:
+                return view(request, *args, **kwargs)
+
+            with QueryLog(connections[DEFAULT_DB_ALIAS]) as log:
+                response = view(request, *args, **kwargs)
+            _warn_if_over(budget, request, log)
+            return response
+
+        wrapper.query_budget = budget
+        return wrapper
+
+    return decorator
+
+
+def _start_log():
+    return QueryLog(connections[DEFAULT_DB_ALIAS]).__enter__()
+
+
+def _warn_if_over(budget, request, log):
+    problems = budget.overruns(log)
+    if problems:
+        logger.warning(f"{request.method} {request.path} is over its query budget: {describe(log, problems)}")
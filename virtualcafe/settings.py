@@ -100,15 +100,112 @@ ASGI_APPLICATION = 'virtualcafe.asgi.application'
 # ========================================
 
 # Django Channels Layer Configuration
-# This uses Redis as the messaging backend for WebSocket communication
-# Development: Using InMemoryChannelLayer (no Redis needed)
-# Production: Use RedisChannelLayer with proper Redis server
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+# CHANNEL_LAYER_BACKEND selects how WebSocket group messages are delivered:
+#   memory       -> InMemoryChannelLayer (default, single process only, no Redis needed)
+#   redis        -> RedisChannelLayer (required when running more than one Daphne worker)
+#   redis_pubsub -> RedisPubSubChannelLayer (lower-latency group fan-out over Redis pub/sub)
+CHANNEL_LAYER_BACKEND = os.environ.get('CHANNEL_LAYER_BACKEND', 'memory').lower()
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379')
+
+if CHANNEL_LAYER_BACKEND == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+                'capacity': int(os.environ.get('CHANNEL_LAYER_CAPACITY', 1500)),
+                'expiry': 10,
+            },
+        }
+    }
+elif CHANNEL_LAYER_BACKEND == 'redis_pubsub':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+            },
+        }
+    }
+else:
+    if CHANNEL_LAYER_BACKEND != 'memory':
+        logger.warning(f"Unknown CHANNEL_LAYER_BACKEND '{CHANNEL_LAYER_BACKEND}', using in-memory layer")
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer'
+        }
     }
-}
 
+# Room presence registry (see rooms/presence.py)
+# Shared through Redis whenever the channel layer is, so every worker sees the same members
+PRESENCE_BACKEND = os.environ.get(
+    'PRESENCE_BACKEND',
+    'redis' if CHANNEL_LAYER_BACKEND.startswith('redis') else 'local'
+)
+# Seconds a connection stays present without a heartbeat (clients ping every 30s)
+PRESENCE_TTL = int(os.environ.get('PRESENCE_TTL', 90))
+
+# Django's cache (the achievement catalogue, see tracker/achievements.py) is shared through
+# Redis along with presence, so invalidating an entry in one process reaches every worker.
+# Otherwise each process has its own copy and cached entries must expire quickly.
+if PRESENCE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'virtualcafe',
+        }
+    }
+    ACHIEVEMENT_CATALOGUE_TTL = 60 * 60
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    ACHIEVEMENT_CATALOGUE_TTL = 60
+
+# Typing indicators are broadcast at most once per interval per room (0 disables coalescing)
+TYPING_COALESCE_INTERVAL = float(os.environ.get('TYPING_COALESCE_INTERVAL', 0.5))
+# Seconds without a typing event before a user is shown as no longer typing
+TYPING_IDLE_TIMEOUT = 5.0
+
+# Chat history is buffered per worker and written in batches (see rooms/history.py)
+CHAT_HISTORY_FLUSH_INTERVAL = float(os.environ.get('CHAT_HISTORY_FLUSH_INTERVAL', 0.5))
+CHAT_HISTORY_BATCH_SIZE = 200
+# Messages replayed on connect and returned per page by the history endpoint
+CHAT_HISTORY_PAGE_SIZE = 50
+
+# Rooms per page of the dashboard/browse listings (further pages load as the user scrolls)
+ROOM_LIST_PAGE_SIZE = 24
+
+# Rooms deleted per statement batch by the cleanup pass (see rooms/cleanup.py)
+ROOM_CLEANUP_CHUNK_SIZE = 500
+# Rooms are deleted at their expires_at by rooms/expiry.py; the full cleanup only reconciles
+ROOM_CLEANUP_RECONCILE_MINUTES = int(os.environ.get('ROOM_CLEANUP_RECONCILE_MINUTES', 30))
+# Seconds between picking up expiry changes made by other processes
+ROOM_EXPIRY_RESYNC_SECONDS = 60
+# Room activity (last_activity/expires_at) is buffered and written in batches this often
+ROOM_ACTIVITY_FLUSH_INTERVAL = 1.0
+# Minutes between checks of Room.active_member_count against the presence registry
+ROOM_MEMBER_COUNT_RECONCILE_MINUTES = 5
+# Auto-tracked study sessions are queued and written in batches (see tracker/ingest.py)
+SESSION_INGEST_FLUSH_INTERVAL = 1.0
+SESSION_INGEST_BATCH_SIZE = 500
+# Sessions held in memory; beyond that they spill to SESSION_INGEST_SPILL_PATH ('{pid}' is
+# replaced by the worker's process id) or, if it is unset, are written by the request itself
+SESSION_INGEST_MAX_QUEUED = 10000
+SESSION_INGEST_SPILL_PATH = os.environ.get('SESSION_INGEST_SPILL_PATH') or None
+# Failed batches are retried this many times (backing off exponentially), then written one session at a time
+SESSION_INGEST_MAX_RETRIES = 5
+# Study pages send a heartbeat this often; a session not heard from for the timeout is
+# closed and saved (see tracker/heartbeats.py)
+STUDY_HEARTBEAT_INTERVAL = 60
+STUDY_HEARTBEAT_TIMEOUT = 180
+# Threads for blocking work from async views and consumers (presence, consumers' DB writes)
+SYNC_WORKER_THREADS = int(os.environ.get('SYNC_WORKER_THREADS', 8))
+# Seconds the elected scheduler worker's lease lasts without renewal (renewed every third of it)
+SCHEDULER_LEASE_TTL = int(os.environ.get('SCHEDULER_LEASE_TTL', 30))
 
 
 DATABASES = {
@@ -0,0 +1,73 @@
+"""
+Tests for the view query budgets (virtualcafe/query_budget.py).
+"""
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from virtualcafe.query_budget import QueryBudgetExceeded, QueryLog, assert_query_budget, query_budget
+
+# Counts through a few hundred thousand generated rows: tens of milliseconds on SQLite
+SLOW_QUERY = '''
+    WITH RECURSIVE numbers(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM numbers WHERE n < 300000)
+    SELECT count(*) FROM numbers
+'''
+
+
+def run(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchone()
+
+
+class QueryLogTests(TestCase):
+
+    def test_times_queries_without_debug(self):
+        with QueryLog(connection) as log:
+            run('SELECT 1')
+            run(SLOW_QUERY)
+
+        self.assertEqual(len(log), 2)
+        self.assertGreater(log.queries[0]['time_ms'], 0)
+        self.assertGreater(log.queries[1]['time_ms'], 1)
+        self.assertAlmostEqual(log.time_ms, sum(query['time_ms'] for query in log.queries))
+
+    def test_stops_recording_after_the_block(self):
+        with QueryLog(connection) as log:
+            run('SELECT 1')
+        run('SELECT 2')
+        self.assertEqual(len(log), 1)
+
+
+class AssertQueryBudgetTests(TestCase):
+
+    def test_slow_query_goes_over_the_time_budget(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'ms of SQL (budget 1ms)'):
+            with assert_query_budget(queries=5, time_ms=1):
+                run(SLOW_QUERY)
+
+    def test_fast_queries_stay_within_the_time_budget(self):
+        with assert_query_budget(queries=5, time_ms=1000) as log:
+            run('SELECT 1')
+        self.assertEqual(len(log), 1)
+
+    def test_too_many_queries_go_over_the_budget(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, '3 queries (budget 2)'):
+            with assert_query_budget(queries=2):
+                for number in range(3):
+                    run(f'SELECT {number}')
+
+
+@override_settings(DEBUG=True)
+class QueryBudgetDecoratorTests(TestCase):
+
+    def test_warns_about_a_view_over_its_time_budget(self):
+        @query_budget(queries=5, time_ms=1)
+        def slow_view(request):
+            run(SLOW_QUERY)
+            return HttpResponse()
+
+        with self.assertLogs('virtualcafe.query_budget', 'WARNING') as logs:
+            slow_view(RequestFactory().get('/slow/'))
+        self.assertIn('GET /slow/ is over its query budget', logs.output[0])
+        self.assertIn('ms of SQL (budget 1ms)', logs.output[0])